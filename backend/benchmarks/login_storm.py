@@ -0,0 +1,102 @@
+"""
+Test de charge : latence d'un endpoint sans rapport pendant une rafale de logins.
+
+Mesure GET /api/categories seul, puis pendant que N clients enchaînent des
+POST /api/auth/login (bcrypt). Si le hachage bloquait la boucle d'événements,
+la latence des catégories exploserait pendant la rafale ; avec le pool dédié
+(PASSWORD_HASH_WORKERS) elle doit rester stable.
+
+Prérequis : API démarrée avec RATE_LIMIT_ENABLED=false (sinon les logins sont
+limités par email et la rafale ne hache plus rien) et compte de test existant
+(python seed_users.py).
+Usage: python benchmarks/login_storm.py [--base-url http://localhost:8001] [--logins 16] [--duration 15]
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def _percentile(values, ratio):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, int(len(ordered) * ratio) - 1)]
+
+
+def probe(base_url: str, duration: float, stop: threading.Event):
+    """Interroge /api/categories en boucle et retourne les latences (ms)."""
+    session = requests.Session()
+    timings = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline and not stop.is_set():
+        started = time.perf_counter()
+        response = session.get(f"{base_url}/api/categories", timeout=30)
+        response.raise_for_status()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def login_worker(base_url: str, email: str, password: str, stop: threading.Event, counter: list):
+    session = requests.Session()
+    while not stop.is_set():
+        response = session.post(
+            f"{base_url}/api/auth/login",
+            json={"email": email, "password": password},
+            timeout=60
+        )
+        if response.status_code == 200:
+            counter.append(1)
+
+
+def report(label: str, timings, duration: float):
+    print(
+        f"  {label:<18} {len(timings) / duration:7.1f} req/s  "
+        f"p50={statistics.median(timings):6.1f} ms  p95={_percentile(timings, 0.95):6.1f} ms  "
+        f"max={max(timings):6.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence de l'API pendant une rafale de logins")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--email", default="test@downpricer.com")
+    parser.add_argument("--password", default="test123")
+    parser.add_argument("--logins", type=int, default=16, help="Clients de login concurrents")
+    parser.add_argument("--duration", type=float, default=15.0, help="Durée de chaque phase (s)")
+    args = parser.parse_args()
+
+    check = requests.post(
+        f"{args.base_url}/api/auth/login",
+        json={"email": args.email, "password": args.password},
+        timeout=30
+    )
+    if check.status_code != 200:
+        print(f"❌ Login de test impossible ({check.status_code}) : lancez d'abord seed_users.py")
+        return
+
+    print(f"⏱️  Phase 1 : /api/categories seul ({args.duration:.0f}s)")
+    baseline = probe(args.base_url, args.duration, threading.Event())
+
+    print(f"🔥 Phase 2 : /api/categories pendant {args.logins} clients de login ({args.duration:.0f}s)")
+    stop = threading.Event()
+    logins = []
+    with ThreadPoolExecutor(max_workers=args.logins) as pool:
+        for _ in range(args.logins):
+            pool.submit(login_worker, args.base_url, args.email, args.password, stop, logins)
+        try:
+            storm = probe(args.base_url, args.duration, stop)
+        finally:
+            stop.set()
+
+    print("📊 Résultats :")
+    report("sans rafale", baseline, args.duration)
+    report("pendant rafale", storm, args.duration)
+    print(f"  logins réussis     {len(logins) / args.duration:7.1f} /s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Débit d'envoi d'emails : une connexion par email contre pool + file d'envoi.
+
+Démarre un serveur SMTP local minimal (EHLO, AUTH, MAIL/RCPT/DATA, sans TLS) qui
+simule le coût d'ouverture de session d'un vrai fournisseur (--session-delay :
+poignée de main TLS + LOGIN, ~100-300 ms chez un fournisseur distant) puis mesure :
+- l'ancien chemin : connexion, authentification, envoi, QUIT pour chaque email ;
+- utils.mailer.mail_queue : connexions réutilisées, envois par lots.
+
+Aucun prérequis (ni MongoDB ni SMTP réel).
+Usage: python benchmarks/mail_throughput.py [--messages 200] [--session-delay 0.1] [--latency 0.005]
+"""
+import argparse
+import asyncio
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.mailer import MailQueue, SMTPConnectionPool, build_message, open_smtp_connection  # noqa: E402
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Sous-ensemble de SMTP suffisant pour smtplib (AUTH PLAIN/LOGIN acceptés)."""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        server = self.server
+        self.reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250-stand-in")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command.startswith("AUTH"):
+                # Coût de session d'un fournisseur réel (TLS + vérification du compte)
+                time.sleep(server.session_delay)
+                if command.startswith("AUTH LOGIN"):
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                time.sleep(server.latency)
+                with server.lock:
+                    server.received += 1
+                self.reply("250 OK queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, session_delay: float, latency: float):
+        super().__init__(("127.0.0.1", 0), StandInSMTPHandler)
+        self.session_delay = session_delay
+        self.latency = latency
+        self.received = 0
+        self.lock = threading.Lock()
+
+
+def smtp_config(port: int) -> dict:
+    return {
+        "enabled": True,
+        "smtp_host": "127.0.0.1",
+        "smtp_port": port,
+        "smtp_user": "bench@downpricer.local",
+        "smtp_pass": "bench",
+        "smtp_from": "bench@downpricer.local",
+        "smtp_tls_mode": "none",
+    }
+
+
+def send_one_connection_per_email(config: dict, count: int) -> None:
+    """Ancien send_email_sync : une session SMTP complète par email."""
+    for i in range(count):
+        server = open_smtp_connection(config)
+        server.send_message(build_message(config, f"user{i}@example.com", f"Test {i}", "<p>Bonjour</p>"))
+        server.quit()
+
+
+async def send_through_queue(config: dict, count: int) -> None:
+    queue = MailQueue(pool=SMTPConnectionPool())
+    queue.start()
+    for i in range(count):
+        await queue.enqueue(config, f"user{i}@example.com", f"Test {i}", "<p>Bonjour</p>")
+    await queue.stop(timeout=600)
+
+
+def measure(label: str, server: StandInSMTPServer, count: int, run) -> float:
+    server.received = 0
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    rate = server.received / elapsed
+    print(f"  {label:<32} {server.received:>5} emails en {elapsed:6.2f}s  → {rate:8.1f} emails/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit d'envoi d'emails sur un serveur SMTP local")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--session-delay", type=float, default=0.1, help="Coût d'ouverture de session SMTP (s)")
+    parser.add_argument("--latency", type=float, default=0.005, help="Latence d'acceptation d'un message (s)")
+    args = parser.parse_args()
+
+    server = StandInSMTPServer(args.session_delay, args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config = smtp_config(server.server_address[1])
+
+    print(f"📧 {args.messages} emails, session SMTP {args.session_delay * 1000:.0f} ms, message {args.latency * 1000:.0f} ms")
+    try:
+        before = measure("Une connexion par email", server, args.messages,
+                         lambda: send_one_connection_per_email(config, args.messages))
+        after = measure("Pool + file (mail_queue)", server, args.messages,
+                        lambda: asyncio.run(send_through_queue(config, args.messages)))
+    except smtplib.SMTPException as e:
+        print(f"❌ Erreur SMTP : {str(e)}")
+        sys.exit(1)
+    finally:
+        server.shutdown()
+    print(f"📊 Gain : x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
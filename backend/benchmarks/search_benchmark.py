@@ -0,0 +1,173 @@
+"""
+Benchmark de la recherche catalogue sur une base MongoDB réelle.
+
+Crée une base temporaire (<DB_NAME>_search_bench), y insère N articles
+synthétiques (catalogue général + mini-sites Premium), puis mesure la latence
+de GET /articles?search=... (fetch_public_catalog) comparée à l'ancien filtre
+$regex non ancré.
+
+Usage: python benchmarks/search_benchmark.py [--count 100000] [--runs 200] [--keep]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+load_dotenv(BACKEND_DIR / '.env')
+
+from catalog import fetch_public_catalog  # noqa: E402
+from database import close_client, get_client, get_db  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from utils.search import search_fields  # noqa: E402
+
+PRODUCTS = [
+    "chaussures", "baskets", "veste", "manteau", "pantalon", "robe", "sac", "montre",
+    "console", "manette", "casque", "téléphone", "ordinateur", "écran", "clavier",
+    "vélo", "trottinette", "lunettes", "parfum", "bijoux", "jeux", "tablette",
+]
+QUALIFIERS = [
+    "cuir", "électrique", "sans fil", "reconditionné", "neuf", "vintage", "sport",
+    "enfant", "femme", "homme", "noir", "blanc", "rouge", "édition limitée", "pro",
+]
+BRANDS = ["Nike", "Adidas", "Apple", "Samsung", "Sony", "Nintendo", "Decathlon", "Zara", "Levi's", "Rolex"]
+DESCRIPTION_WORDS = [
+    "très", "bon", "état", "livraison", "rapide", "garantie", "facture", "original",
+    "taille", "couleur", "utilisé", "quelques", "fois", "emballage", "d'origine",
+    "remise", "main", "propre", "accessoires", "inclus", "chargeur", "boîte",
+]
+QUERIES = [
+    "chaussure", "chaussures nike", "veste cuir", "console", "montre", "vélo électrique",
+    "sac femme", "ordi", "casque sans fil", "tel", "bijou", "jeux nintendo",
+]
+LEGACY_PUBLIC_MATCH = {"status": "active", "visible_public": {"$ne": False}}
+
+
+def _random_article(now: datetime, index: int) -> dict:
+    name = f"{random.choice(PRODUCTS)} {random.choice(BRANDS)} {random.choice(QUALIFIERS)}"
+    description = " ".join(random.choices(DESCRIPTION_WORDS, k=random.randint(8, 30)))
+    price = round(random.uniform(5, 900), 2)
+    doc = {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "description": description,
+        "photos": [],
+        "price": price,
+        "reference_price": round(price * random.uniform(1.1, 1.8), 2),
+        "stock": random.randint(0, 5),
+        "status": "active",
+        "created_at": (now - timedelta(minutes=index)).isoformat(),
+        "views": random.randint(0, 5000),
+    }
+    doc.update(search_fields(name, description))
+    return doc
+
+
+async def seed(db, count: int) -> None:
+    now = datetime.now(timezone.utc)
+    minisite_ids = [str(uuid.uuid4()) for _ in range(50)]
+    await db.minisites.insert_many([
+        {"id": minisite_id, "status": "active", "plan_id": "SITE_PLAN_3", "site_name": f"Boutique {i}", "slug": f"boutique-{i}"}
+        for i, minisite_id in enumerate(minisite_ids)
+    ])
+
+    batch_general, batch_minisite = [], []
+    for index in range(count):
+        doc = _random_article(now, index)
+        if index % 10 == 0:
+            doc.update({"minisite_id": random.choice(minisite_ids), "show_in_public_catalog": True})
+            batch_minisite.append(doc)
+        else:
+            doc.update({"visible_public": True, "visible_seller": True})
+            batch_general.append(doc)
+        if len(batch_general) >= 5000:
+            await db.articles.insert_many(batch_general)
+            batch_general = []
+        if len(batch_minisite) >= 5000:
+            await db.minisite_articles.insert_many(batch_minisite)
+            batch_minisite = []
+    if batch_general:
+        await db.articles.insert_many(batch_general)
+    if batch_minisite:
+        await db.minisite_articles.insert_many(batch_minisite)
+
+    await ensure_indexes(db)
+
+
+async def _legacy_search(db, search: str) -> None:
+    # Ancien comportement : $regex non ancré sur name/description, puis comptage
+    query = dict(LEGACY_PUBLIC_MATCH)
+    query["$or"] = [
+        {"name": {"$regex": search, "$options": "i"}},
+        {"description": {"$regex": search, "$options": "i"}},
+    ]
+    await asyncio.gather(
+        db.articles.find(query, {"_id": 0}).sort("created_at", -1).limit(20).to_list(20),
+        db.articles.count_documents(query),
+    )
+
+
+async def _indexed_search(db, search: str) -> None:
+    await fetch_public_catalog(db, search=search, sort="relevance", skip=0, limit=20)
+
+
+async def measure(label: str, db, runner, runs: int) -> None:
+    timings = []
+    for run in range(runs):
+        search = QUERIES[run % len(QUERIES)]
+        started = time.perf_counter()
+        await runner(db, search)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(
+        f"  {label:<10} p50={statistics.median(timings):7.1f} ms  "
+        f"p95={p95:7.1f} ms  p99={p99:7.1f} ms  max={timings[-1]:7.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche catalogue")
+    parser.add_argument("--count", type=int, default=100_000, help="Nombre d'articles à générer")
+    parser.add_argument("--runs", type=int, default=200, help="Nombre de requêtes mesurées par mode")
+    parser.add_argument("--keep", action="store_true", help="Conserver la base de benchmark")
+    args = parser.parse_args()
+
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    client = get_client()
+    db_name = f"{get_db().name}_search_bench"
+    db = get_db(db_name)
+
+    try:
+        await client.drop_database(db_name)
+        print(f"📦 Génération de {args.count} articles dans {db_name}...")
+        started = time.perf_counter()
+        await seed(db, args.count)
+        print(f"✅ Données prêtes en {time.perf_counter() - started:.1f} s")
+
+        # Préchauffage du cache WiredTiger pour les deux modes
+        for search in QUERIES:
+            await _legacy_search(db, search)
+            await _indexed_search(db, search)
+
+        print(f"⏱️  {args.runs} requêtes par mode :")
+        await measure("regex", db, _legacy_search, args.runs)
+        await measure("index", db, _indexed_search, args.runs)
+    finally:
+        if not args.keep:
+            await client.drop_database(db_name)
+        close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
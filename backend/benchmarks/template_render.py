@@ -0,0 +1,127 @@
+"""
+Micro-benchmark du rendu des templates email.
+
+Compare l'ancien rendu (lecture du fichier, regex {% if %}, puis deux
+str.replace sur tout le document par clé du contexte) au rendu compilé et mis
+en cache de notifications/templates.py, sur les templates du dépôt et un
+contexte de notification typique. Vérifie aussi que les deux rendus sont identiques.
+
+Aucun prérequis (ni MongoDB ni SMTP).
+Usage: python benchmarks/template_render.py [--iterations 2000]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from notifications.templates import HTML_VARS, TEMPLATES_DIR, TemplateCache, render_compiled  # noqa: E402
+
+TEMPLATES = [
+    "admin_generic.html",
+    "admin_new_user.html",
+    "admin_new_client_request.html",
+    "user_generic.html",
+    "user_request_received.html",
+    "user_request_status_changed.html",
+]
+
+CONTEXT = {
+    "title": "Nouvelle demande client",
+    "message": "Un client a déposé une nouvelle demande <urgente> & détaillée.",
+    "details": "<table class='details-table'><tr><td>Demande</td><td>Console</td></tr></table>",
+    "action_button": "<a href='https://downpricer.com/admin'>Voir</a>",
+    "brand_name": "DownPricer",
+    "support_email": "support@downpricer.com",
+    "base_url": "https://downpricer.com",
+    "user_name": "Jeanne Martin",
+    "user_email": "jeanne@example.com",
+    "client_name": "Jeanne Martin",
+    "client_email": "jeanne@example.com",
+    "created_at": "2026-10-18T10:00:00+00:00",
+    "demande_id": "3f2c9a1e-0000-4000-8000-000000000000",
+    "demande_name": "Console \"édition limitée\"",
+    "description": "Version japonaise, boîte d'origine",
+    "max_price": 350,
+    "reference_price": 420.5,
+    "deposit_amount": 140,
+    "status": "IN_ANALYSIS",
+    "status_label": "En analyse",
+    "status_box": "<div class='status'>En analyse</div>",
+    "status_message": "<p>Votre demande est en cours d'analyse.</p>",
+    "footer_message": "",
+    "reason_message": None,
+}
+
+
+def legacy_render(template_name: str, context: dict) -> str:
+    """Ancien render_template de notifier.py (sans fallback ni gestion d'erreur)."""
+    with open(TEMPLATES_DIR / template_name, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    if_pattern = r'\{%\s*if\s+(\w+)\s*%\}(.*?)\{%\s*endif\s*%\}'
+
+    def process_condition(match):
+        var_value = context.get(match.group(1))
+        if var_value and str(var_value).strip() and str(var_value).lower() not in ['false', 'none', 'null']:
+            return match.group(2)
+        return ""
+
+    content = re.sub(if_pattern, process_condition, content, flags=re.DOTALL)
+
+    for key, value in context.items():
+        if value is None:
+            value = ""
+        if key in HTML_VARS and isinstance(value, str):
+            safe_value = value
+        elif isinstance(value, str):
+            safe_value = (
+                value.replace("&", "&amp;")
+                     .replace("<", "&lt;")
+                     .replace(">", "&gt;")
+                     .replace('"', "&quot;")
+                     .replace("'", "&#x27;")
+            )
+        else:
+            safe_value = str(value)
+        content = content.replace(f"{{{{ {key} }}}}", safe_value)
+        content = content.replace(f"{{{{{key}}}}}", safe_value)
+    return content
+
+
+def measure(label: str, iterations: int, render) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for name in TEMPLATES:
+            render(name)
+    elapsed = time.perf_counter() - started
+    rate = iterations * len(TEMPLATES) / elapsed
+    print(f"  {label:<34} {rate:10.0f} rendus/s  ({elapsed * 1e6 / (iterations * len(TEMPLATES)):7.1f} µs/rendu)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de rendu des templates email")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    cache = TemplateCache(hot_reload=False)
+    reload_cache = TemplateCache(hot_reload=True)
+
+    for name in TEMPLATES:
+        if legacy_render(name, CONTEXT) != render_compiled(cache.get(name), CONTEXT):
+            print(f"❌ Rendu différent pour {name}")
+            sys.exit(1)
+    print(f"✅ Rendus identiques sur {len(TEMPLATES)} templates")
+
+    print(f"⏱️  {args.iterations} itérations × {len(TEMPLATES)} templates, contexte de {len(CONTEXT)} clés")
+    before = measure("Ancien rendu (disque + replace)", args.iterations, lambda n: legacy_render(n, CONTEXT))
+    after = measure("Compilé, en cache (production)", args.iterations, lambda n: render_compiled(cache.get(n), CONTEXT))
+    measure("Compilé, rechargement à chaud", args.iterations, lambda n: render_compiled(reload_cache.get(n), CONTEXT))
+    print(f"📊 Gain : x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark de montée en charge multi-workers sur le catalogue.
+
+Démarre successivement gunicorn (gunicorn.conf.py) avec 1, 2, 4... workers sur
+un port dédié, puis mesure le débit de GET /api/articles et /api/seller/articles
+sous N clients concurrents. L'efficacité compare le débit à celui d'un worker
+multiplié par le nombre de workers (100 % = montée en charge linéaire).
+
+Prérequis : MongoDB accessible (backend/.env) avec un catalogue peuplé, et
+compte vendeur de test (python seed_users.py) pour /api/seller/articles.
+Usage: python benchmarks/worker_scaling.py [--workers 1,2,4] [--clients 32] [--duration 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+ENDPOINTS = [
+    "/api/articles?limit=20",
+    "/api/articles?limit=20&sort=price_low",
+    "/api/seller/articles?limit=20",
+]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=2).status_code == 200:
+                # Laisser tous les workers terminer leur démarrage
+                time.sleep(2)
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"gunicorn ({workers} workers) n'a pas démarré")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def login(base_url: str, email: str, password: str):
+    response = requests.post(f"{base_url}/api/auth/login", json={"email": email, "password": password}, timeout=30)
+    if response.status_code != 200:
+        return None
+    return response.json().get("access_token")
+
+
+def client_loop(base_url: str, token, stop: threading.Event, timings: list):
+    session = requests.Session()
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    index = 0
+    while not stop.is_set():
+        path = ENDPOINTS[index % len(ENDPOINTS)]
+        index += 1
+        if path.startswith("/api/seller") and not token:
+            continue
+        started = time.perf_counter()
+        response = session.get(f"{base_url}{path}", timeout=60)
+        if response.status_code == 200:
+            timings.append((time.perf_counter() - started) * 1000)
+
+
+def run_load(base_url: str, token, clients: int, duration: float) -> list:
+    stop = threading.Event()
+    timings: list = []
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client_loop, base_url, token, stop, timings)
+        time.sleep(duration)
+        stop.set()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit du catalogue selon le nombre de workers gunicorn")
+    parser.add_argument("--workers", default="1,2,4", help="Nombres de workers à tester (séparés par des virgules)")
+    parser.add_argument("--clients", type=int, default=32, help="Clients HTTP concurrents")
+    parser.add_argument("--duration", type=float, default=15.0, help="Durée de chaque mesure (s)")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--email", default="vendeur@downpricer.com")
+    parser.add_argument("--password", default="vendeur123")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for workers in (int(value) for value in args.workers.split(",")):
+        print(f"🚀 {workers} worker(s) : {args.clients} clients pendant {args.duration:.0f}s")
+        process = start_server(workers, args.port)
+        try:
+            token = login(base_url, args.email, args.password)
+            if token is None:
+                print("⚠️  Login vendeur impossible : /api/seller/articles ignoré (lancez seed_users.py)")
+            run_load(base_url, token, args.clients, 2.0)  # Préchauffage
+            timings = run_load(base_url, token, args.clients, args.duration)
+        finally:
+            stop_server(process)
+        throughput = len(timings) / args.duration
+        results.append((workers, throughput, timings))
+
+    print("📊 Résultats :")
+    baseline = results[0][1] / results[0][0] if results and results[0][1] else 0
+    for workers, throughput, timings in results:
+        efficiency = throughput / (baseline * workers) * 100 if baseline else 0
+        p50 = statistics.median(timings) if timings else 0
+        print(f"  {workers:>2} worker(s)  {throughput:8.1f} req/s  p50={p50:6.1f} ms  efficacité={efficiency:5.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Moteur du catalogue public DownPricer.
+Le filtrage, l'éligibilité Premium des mini-sites, le tri et la pagination
+sont exécutés côté MongoDB (agrégation $unionWith + $lookup).
+"""
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.pagination import keyset_filter, merge_filters
+from utils.search import SEARCH_HIDDEN_FIELDS, SEARCH_SCORE_FIELD, SearchQuery
+
+# Plan mini-site autorisé à publier dans le catalogue public
+PUBLIC_CATALOG_PLAN = "SITE_PLAN_3"
+
+# Options de tri exposées par GET /api/articles
+PUBLIC_CATALOG_SORTS = {
+    "recent": ("created_at", -1),
+    "price_low": ("price", 1),
+    "views": ("views", -1),
+    # Pertinence : uniquement si une recherche est fournie (sinon "recent")
+    "relevance": (SEARCH_SCORE_FIELD, -1),
+}
+
+# Champs internes à ne jamais exposer dans le catalogue public
+PUBLIC_HIDDEN_FIELDS = ["discord_contact", "is_third_party", "posted_by"]
+
+# Plans mini-site autorisés dans le catalogue revendeur
+RESELLER_CATALOG_PLANS = ["SITE_PLAN_2", "SITE_PLAN_3"]
+
+# Champs du mini-site nécessaires pour construire les infos vendeur
+VENDOR_MINISITE_FIELDS = {
+    "_id": 0, "id": 1, "status": 1, "plan_id": 1, "user_id": 1, "site_name": 1,
+    "slug": 1, "logo_url": 1, "rating_avg": 1, "rating_count": 1, "sales_count": 1
+}
+
+# Champs utilisateur nécessaires pour vendor / posted_by_info
+VENDOR_USER_FIELDS = {"_id": 0, "id": 1, "email": 1, "avatar_url": 1, "first_name": 1, "last_name": 1}
+
+
+def _search_filter(search: Optional[str]) -> Dict[str, Any]:
+    return SearchQuery(search).filter()
+
+
+def build_public_general_match(category_id: Optional[str], search: Optional[str]) -> Dict[str, Any]:
+    """Filtre des articles du catalogue général visibles publiquement."""
+    query = {"status": "active", "visible_public": {"$ne": False}}
+    if category_id:
+        query["category_id"] = category_id
+    query.update(_search_filter(search))
+    return query
+
+
+def build_public_minisite_match(search: Optional[str]) -> Dict[str, Any]:
+    """Filtre des articles de mini-site publiés dans le catalogue public."""
+    query = {"show_in_public_catalog": True, "status": {"$nin": ["sold", "suspended"]}}
+    query.update(_search_filter(search))
+    return query
+
+
+def build_reseller_general_match(search: Optional[str]) -> Dict[str, Any]:
+    """Filtre des articles du catalogue général visibles par les revendeurs."""
+    query = {"status": "active", "stock": {"$gt": 0}, "visible_seller": {"$ne": False}}
+    query.update(_search_filter(search))
+    return query
+
+
+def build_reseller_minisite_match(search: Optional[str]) -> Dict[str, Any]:
+    """Filtre des articles de mini-site publiés dans le catalogue revendeur."""
+    query = {"show_in_reseller_catalog": True, "status": {"$nin": ["sold", "suspended"]}}
+    query.update(_search_filter(search))
+    return query
+
+
+def _eligible_minisite_stages(plans: List[str], exclude_reserved: bool = False) -> List[Dict[str, Any]]:
+    """
+    Jointure sur le mini-site propriétaire : ne garde que les articles dont le
+    mini-site est actif et à l'un des `plans`. Le mini-site est conservé dans
+    `_minisite` pour construire les infos vendeur sans requête supplémentaire.
+    Avec `exclude_reserved`, écarte aussi les articles ayant une transaction acceptée.
+    """
+    stages: List[Dict[str, Any]] = [
+        {"$lookup": {
+            "from": "minisites",
+            "localField": "minisite_id",
+            "foreignField": "id",
+            "pipeline": [
+                {"$match": {"status": "active", "plan_id": {"$in": plans}}},
+                {"$project": VENDOR_MINISITE_FIELDS},
+                {"$limit": 1},
+            ],
+            "as": "_minisite",
+        }},
+        {"$unwind": "$_minisite"},
+    ]
+    if exclude_reserved:
+        stages.extend([
+            {"$lookup": {
+                "from": "marketplace_transactions",
+                "localField": "id",
+                "foreignField": "article_id",
+                "pipeline": [
+                    {"$match": {"status": "accepted"}},
+                    {"$project": {"_id": 0, "id": 1}},
+                    {"$limit": 1},
+                ],
+                "as": "_reserved",
+            }},
+            {"$match": {"_reserved": {"$size": 0}}},
+            {"$project": {"_reserved": 0}},
+        ])
+    return stages
+
+
+def _branch_head(
+    match: Dict[str, Any],
+    seek: Dict[str, Any],
+    score_expression: Optional[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    # Le seek porte sur le score calculé quand on trie par pertinence : il doit suivre le $addFields
+    if score_expression is None:
+        return [{"$match": merge_filters(match, seek)}]
+    stages = [{"$match": match}, {"$addFields": {SEARCH_SCORE_FIELD: score_expression}}]
+    if seek:
+        stages.append({"$match": seek})
+    return stages
+
+
+def _merged_catalog_pipeline(
+    general_match: Dict[str, Any],
+    general_projection: Dict[str, Any],
+    minisite_match: Optional[Dict[str, Any]],
+    minisite_stages: List[Dict[str, Any]],
+    sort_field: str,
+    sort_order: int,
+    skip: int,
+    limit: int,
+    after: Optional[Dict[str, Any]] = None,
+    score_expression: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Pipeline (sur la collection `articles`) fusionnant articles généraux et
+    articles mini-site. Chaque branche est triée et tronquée à skip + limit avant
+    la fusion, ce qui permet à MongoDB d'utiliser les index de tri au lieu de
+    trier tout le catalogue. `after` (position de curseur) remplace le skip par un seek.
+    """
+    sort_spec = {sort_field: sort_order, "id": 1}
+    window = skip + limit
+    seek = keyset_filter(after, sort_field, sort_order)
+
+    pipeline: List[Dict[str, Any]] = [
+        *_branch_head(general_match, seek, score_expression),
+        {"$sort": sort_spec},
+        {"$limit": window},
+        {"$project": general_projection},
+    ]
+
+    if minisite_match is not None:
+        pipeline.append({"$unionWith": {
+            "coll": "minisite_articles",
+            "pipeline": [
+                *_branch_head(minisite_match, seek, score_expression),
+                {"$sort": sort_spec},
+                *minisite_stages,
+                {"$limit": window},
+                {"$project": {"_id": 0, **{field: 0 for field in SEARCH_HIDDEN_FIELDS}}},
+                {"$addFields": {"source": "minisite", "is_third_party": True}},
+            ],
+        }})
+
+    pipeline.append({"$sort": sort_spec})
+    if skip:
+        pipeline.append({"$skip": skip})
+    pipeline.append({"$limit": limit})
+    return pipeline
+
+
+def public_catalog_sort(sort: Optional[str], search: Optional[str] = None) -> Tuple[str, int]:
+    if sort == "relevance" and not SearchQuery(search):
+        sort = "recent"
+    return PUBLIC_CATALOG_SORTS.get(sort, PUBLIC_CATALOG_SORTS["recent"])
+
+
+def reseller_catalog_sort(search: Optional[str]) -> Tuple[str, int]:
+    """Catalogue revendeur : par pertinence si recherche, sinon plus récents d'abord."""
+    if SearchQuery(search):
+        return SEARCH_SCORE_FIELD, -1
+    return "created_at", -1
+
+
+def _score_expression(sort_field: str, search: Optional[str]) -> Optional[Dict[str, Any]]:
+    if sort_field != SEARCH_SCORE_FIELD:
+        return None
+    return SearchQuery(search).score_expression()
+
+
+def build_public_catalog_pipeline(
+    category_id: Optional[str],
+    search: Optional[str],
+    sort: Optional[str],
+    skip: int,
+    limit: int,
+    after: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    sort_field, sort_order = public_catalog_sort(sort, search)
+    # Les articles mini-site n'ont pas de catégorie : exclus dès qu'un filtre catégorie est demandé
+    return _merged_catalog_pipeline(
+        general_match=build_public_general_match(category_id, search),
+        general_projection={"_id": 0, **{field: 0 for field in PUBLIC_HIDDEN_FIELDS + SEARCH_HIDDEN_FIELDS}},
+        minisite_match=None if category_id else build_public_minisite_match(search),
+        minisite_stages=_eligible_minisite_stages([PUBLIC_CATALOG_PLAN]),
+        sort_field=sort_field,
+        sort_order=sort_order,
+        skip=skip,
+        limit=limit,
+        after=after,
+        score_expression=_score_expression(sort_field, search)
+    )
+
+
+def build_reseller_catalog_pipeline(
+    search: Optional[str],
+    skip: int,
+    limit: int,
+    after: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    sort_field, sort_order = reseller_catalog_sort(search)
+    return _merged_catalog_pipeline(
+        general_match=build_reseller_general_match(search),
+        general_projection={"_id": 0, **{field: 0 for field in SEARCH_HIDDEN_FIELDS}},
+        minisite_match=build_reseller_minisite_match(search),
+        minisite_stages=_eligible_minisite_stages(RESELLER_CATALOG_PLANS, exclude_reserved=True),
+        sort_field=sort_field,
+        sort_order=sort_order,
+        skip=skip,
+        limit=limit,
+        after=after,
+        score_expression=_score_expression(sort_field, search)
+    )
+
+
+async def count_public_catalog(db, category_id: Optional[str], search: Optional[str]) -> int:
+    """Total exact du catalogue public (articles généraux + articles mini-site éligibles)."""
+    general_count = db.articles.count_documents(build_public_general_match(category_id, search))
+    if category_id:
+        return await general_count
+
+    async def _minisite_count() -> int:
+        result = await db.minisite_articles.aggregate([
+            {"$match": build_public_minisite_match(search)},
+            *_eligible_minisite_stages([PUBLIC_CATALOG_PLAN]),
+            {"$count": "count"},
+        ]).to_list(1)
+        return result[0]["count"] if result else 0
+
+    counts = await asyncio.gather(general_count, _minisite_count())
+    return sum(counts)
+
+
+async def fetch_public_catalog(
+    db,
+    category_id: Optional[str] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = "recent",
+    skip: int = 0,
+    limit: int = 20,
+    after: Optional[Dict[str, Any]] = None,
+    with_total: bool = True
+) -> Tuple[List[dict], Optional[int]]:
+    """
+    Retourne (articles de la page, total). Le total n'est calculé que si `with_total`.
+    Les articles mini-site portent une clé `_minisite` avec le mini-site joint.
+    """
+    pipeline = build_public_catalog_pipeline(category_id, search, sort, skip, limit, after)
+    page_query = db.articles.aggregate(pipeline, allowDiskUse=True).to_list(limit)
+    if not with_total:
+        return await page_query, None
+    articles, total = await asyncio.gather(page_query, count_public_catalog(db, category_id, search))
+    return articles, total
+
+
+async def fetch_reseller_catalog(
+    db,
+    search: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20,
+    after: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """
+    Page du catalogue revendeur, triée par date de création décroissante.
+    Les articles mini-site portent une clé `_minisite` avec le mini-site joint.
+    """
+    pipeline = build_reseller_catalog_pipeline(search, skip, limit, after)
+    return await db.articles.aggregate(pipeline, allowDiskUse=True).to_list(limit)
+
+
+# ============================================================================
+# ENRICHISSEMENT VENDEUR (requêtes groupées par $in)
+# ============================================================================
+
+async def fetch_by_ids(collection, ids: Iterable[str], projection: Dict[str, Any]) -> Dict[str, dict]:
+    """Charge en une requête les documents dont le champ `id` est dans `ids`."""
+    unique_ids = list({i for i in ids if i})
+    if not unique_ids:
+        return {}
+    docs = await collection.find({"id": {"$in": unique_ids}}, projection).to_list(len(unique_ids))
+    return {doc["id"]: doc for doc in docs if doc.get("id")}
+
+
+async def fetch_reserved_article_ids(db, article_ids: Iterable[str]) -> Set[str]:
+    """Ids des articles ayant une transaction marketplace acceptée (réservés)."""
+    unique_ids = list({i for i in article_ids if i})
+    if not unique_ids:
+        return set()
+    return set(await db.marketplace_transactions.distinct(
+        "article_id",
+        {"article_id": {"$in": unique_ids}, "status": "accepted"}
+    ))
+
+
+def build_vendor_info(minisite: Optional[dict], user_doc: Optional[dict] = None) -> dict:
+    if not minisite:
+        return {}
+    seller_name = ""
+    avatar_url = None
+    if user_doc:
+        avatar_url = user_doc.get("avatar_url")
+        seller_name = f"{user_doc.get('first_name', '')} {user_doc.get('last_name', '')}".strip()
+    return {
+        "user_id": minisite.get("user_id"),
+        "minisite_id": minisite.get("id"),
+        "minisite_slug": minisite.get("slug"),
+        "minisite_name": minisite.get("site_name"),
+        "logo_url": minisite.get("logo_url"),
+        "rating_avg": minisite.get("rating_avg", 0),
+        "rating_count": minisite.get("rating_count", 0),
+        "sales_count": minisite.get("sales_count", 0),
+        "avatar_url": avatar_url,
+        "seller_name": seller_name
+    }
+
+
+def build_posted_by_info(user_id: str, user_doc: dict, fallback_name: Optional[str] = None) -> dict:
+    username = user_doc.get("email", "").split("@")[0]
+    name = f"{user_doc.get('first_name', '')} {user_doc.get('last_name', '')}".strip() or username
+    if not name and fallback_name:
+        name = fallback_name
+    return {"id": user_id, "username": username, "name": name}
+
+
+async def enrich_minisite_articles(
+    db,
+    articles: List[dict],
+    minisites: Dict[str, dict],
+    include_posted_by: bool = False,
+    include_reserved: bool = False
+) -> List[dict]:
+    """
+    Ajoute `vendor` (et optionnellement `posted_by_info` / `reserved`) à une page
+    d'articles mini-site. `minisites` est indexé par id de mini-site.
+    Coût : une requête users + une requête marketplace_transactions, quelle que soit la taille de la page.
+    """
+    if not articles:
+        return articles
+
+    owner_ids = [
+        minisites[a.get("minisite_id")].get("user_id")
+        for a in articles if a.get("minisite_id") in minisites
+    ]
+    users = await fetch_by_ids(db.users, owner_ids, VENDOR_USER_FIELDS)
+    reserved_ids: Set[str] = set()
+    if include_reserved:
+        reserved_ids = await fetch_reserved_article_ids(db, [a.get("id") for a in articles])
+
+    for article in articles:
+        minisite = minisites.get(article.get("minisite_id"))
+        user_id = minisite.get("user_id") if minisite else None
+        user_doc = users.get(user_id) if user_id else None
+        article["vendor"] = build_vendor_info(minisite, user_doc)
+        if include_posted_by and user_doc:
+            article["posted_by_info"] = build_posted_by_info(
+                user_id,
+                user_doc,
+                fallback_name=minisite.get("site_name", "Vendeur")
+            )
+        if include_reserved:
+            article["reserved"] = article.get("id") in reserved_ids
+    return articles
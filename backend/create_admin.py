@@ -3,40 +3,30 @@ Script pour créer un compte administrateur
 Usage: python create_admin.py
 """
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
 from auth import get_password_hash
-import os
-from dotenv import load_dotenv
-from pathlib import Path
+from database import close_client, get_db
 from datetime import datetime, timezone
 import uuid
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
 async def create_admin():
-    mongo_url = os.environ.get('MONGO_URL')
-    db_name = os.environ.get('DB_NAME')
-    
-    if not mongo_url or not db_name:
+    try:
+        db = get_db()
+    except ValueError:
         print("❌ Erreur: MONGO_URL et DB_NAME doivent être définis dans backend/.env")
         return
     
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[db_name]
-    
     print("=== Création d'un compte administrateur ===\n")
     
     email = input("Email de l'admin: ").strip()
     if not email:
         print("❌ L'email est requis")
-        client.close()
+        close_client()
         return
     
     password = input("Mot de passe: ").strip()
     if not password:
         print("❌ Le mot de passe est requis")
-        client.close()
+        close_client()
         return
     
     first_name = input("Prénom (optionnel): ").strip() or "Admin"
@@ -58,7 +48,7 @@ async def create_admin():
                 print(f"✅ Rôle ADMIN ajouté avec succès à {email}!")
             else:
                 print(f"ℹ️  L'utilisateur {email} a déjà le rôle ADMIN.")
-        client.close()
+        close_client()
         return
     
     # Créer le nouvel utilisateur admin
@@ -79,7 +69,7 @@ async def create_admin():
     print(f"   Rôles: {user_doc['roles']}")
     print(f"\n💡 Vous pouvez maintenant vous connecter avec ces identifiants.")
     
-    client.close()
+    close_client()
 
 if __name__ == "__main__":
     asyncio.run(create_admin())
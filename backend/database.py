@@ -0,0 +1,169 @@
+"""
+Client MongoDB partagé.
+
+Un seul AsyncIOMotorClient par processus (donc un seul pool de connexions et un
+seul jeu de threads de monitoring), configuré par variables d'environnement et
+partagé par server.py, pro_router.py et les scripts CLI :
+
+    MONGO_MAX_POOL_SIZE                 (50)     connexions max par processus
+    MONGO_MIN_POOL_SIZE                 (0)      connexions gardées ouvertes
+    MONGO_SERVER_SELECTION_TIMEOUT_MS   (5000)   échec rapide si Mongo est injoignable
+    MONGO_CONNECT_TIMEOUT_MS            (10000)
+    MONGO_SOCKET_TIMEOUT_MS             (30000)  0 = pas de timeout
+    MONGO_COMPRESSORS                   (zstd,snappy,zlib) retenus s'ils sont installés
+    MONGO_READ_PREFERENCE               (primary)
+
+Les écritures et lectures sont rejouables (retryWrites / retryReads).
+Le client ne se connecte qu'à la première opération (connect=False) : il peut
+être créé dans le processus maître gunicorn (preload) avant le fork des workers.
+"""
+import importlib.util
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = "downpricer-api"
+
+# Module Python requis par pymongo pour chaque compresseur réseau
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def resolve_mongo_settings() -> Tuple[str, str]:
+    """
+    (URL du serveur, nom de la base) depuis MONGO_URL / DB_NAME.
+    Si MONGO_URL contient déjà le nom de la base
+    (format mongodb://localhost:27017/downpricer), il est extrait de l'URL.
+    """
+    mongo_url = os.environ.get('MONGO_URL')
+    if not mongo_url:
+        raise ValueError(
+            "❌ MONGO_URL n'est pas défini dans backend/.env\n"
+            "Créez le fichier backend/.env avec :\n"
+            "MONGO_URL=mongodb://localhost:27017\n"
+            "DB_NAME=downpricer\n"
+            "JWT_SECRET_KEY=votre-cle-secrete\n"
+            "CORS_ORIGINS=http://localhost:3000\n"
+            "BACKEND_PUBLIC_URL=http://localhost:8001"
+        )
+
+    if mongo_url.count('/') >= 3:
+        url_parts = mongo_url.split('/')
+        # Le dernier élément après le dernier / est le nom de la base
+        db_name_from_url = url_parts[-1].split('?')[0]  # Enlever les paramètres de requête
+        mongo_url = '/'.join(url_parts[:3])  # mongodb://localhost:27017
+        return mongo_url, db_name_from_url or os.environ.get('DB_NAME', 'downpricer')
+
+    db_name = os.environ.get('DB_NAME')
+    if not db_name:
+        raise ValueError(
+            "❌ DB_NAME n'est pas défini dans backend/.env\n"
+            "Ajoutez DB_NAME=downpricer dans votre fichier backend/.env"
+        )
+    return mongo_url, db_name
+
+
+def _available_compressors() -> List[str]:
+    requested = os.environ.get("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+    compressors = []
+    for name in (item.strip() for item in requested.split(",")):
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            compressors.append(name)
+    return compressors
+
+
+def client_options() -> Dict[str, Any]:
+    """Options du pool de connexions et du protocole (voir l'en-tête du module)."""
+    options: Dict[str, Any] = {
+        "appname": APP_NAME,
+        "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", "50")),
+        "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+        "serverSelectionTimeoutMS": int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "connectTimeoutMS": int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+        "socketTimeoutMS": int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "30000")) or None,
+        "readPreference": os.environ.get("MONGO_READ_PREFERENCE", "primary"),
+        "retryWrites": True,
+        "retryReads": True,
+        "connect": False,
+    }
+    compressors = _available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Client partagé du processus, créé au premier appel."""
+    global _client
+    if _client is None:
+        mongo_url, _ = resolve_mongo_settings()
+        _client = AsyncIOMotorClient(mongo_url, **client_options())
+    return _client
+
+
+def get_db(name: Optional[str] = None) -> AsyncIOMotorDatabase:
+    """Base applicative (ou la base `name`) sur le client partagé."""
+    return get_client()[name or resolve_mongo_settings()[1]]
+
+
+def close_client() -> None:
+    """Ferme le client partagé (arrêt de l'API, fin d'un script CLI)."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def _lock_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def acquire_lock(db, name: str, ttl_seconds: float) -> bool:
+    """
+    Verrou partagé entre workers/processus (collection `locks`) : True si ce
+    processus l'obtient. Le verrou expire après `ttl_seconds` s'il n'est ni
+    renouvelé (renew_lock) ni libéré (release_lock), ce qui couvre aussi un
+    worker arrêté brutalement.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await db.locks.update_one(
+            {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"expires_at": {"$exists": False}}]},
+            {"$set": {
+                "expires_at": now + timedelta(seconds=ttl_seconds),
+                "owner": _lock_owner(),
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Le document existe et n'est pas expiré : un autre processus détient le verrou
+        return False
+    return True
+
+
+async def renew_lock(db, name: str, ttl_seconds: float) -> bool:
+    """Prolonge un verrou détenu par ce processus ; False s'il a été perdu (expiré et repris)."""
+    result = await db.locks.update_one(
+        {"_id": name, "owner": _lock_owner()},
+        {"$set": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)}}
+    )
+    return result.matched_count == 1
+
+
+async def release_lock(db, name: str) -> None:
+    """Libère un verrou détenu par ce processus (sans effet s'il a été repris par un autre)."""
+    await db.locks.delete_one({"_id": name, "owner": _lock_owner()})
@@ -0,0 +1,51 @@
+"""
+Configuration gunicorn : mode production multi-workers.
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Chaque worker est un processus uvicorn indépendant (boucle asyncio, pool
+MongoDB, pools d'images et de hachage propres). Les réglages IMAGE_WORKERS,
+IMAGE_QUEUE_LIMIT et PASSWORD_HASH_WORKERS s'entendent par worker (l'hôte
+en exécute WEB_CONCURRENCY fois plus) ; leurs valeurs par défaut partagent les
+cœurs entre les workers (cœurs / WEB_CONCURRENCY). L'état partagé entre workers
+vit dans MongoDB (paramètres, verrous, uploads) ; les caches en mémoire
+(paramètres, utilisateurs) sont bornés par leur TTL.
+
+Variables d'environnement :
+    WEB_CONCURRENCY            nombre de workers (défaut : nombre de cœurs)
+    PORT                       port d'écoute (8001)
+    GUNICORN_TIMEOUT           délai max d'une requête avant redémarrage du worker (120 s)
+    GUNICORN_GRACEFUL_TIMEOUT  délai laissé aux requêtes en cours à l'arrêt (120 s) :
+                               exports et emails en tâche de fond se terminent avant la sortie
+    GUNICORN_MAX_REQUESTS      recyclage d'un worker après N requêtes (0 = jamais)
+"""
+import multiprocessing
+import os
+import uuid
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+workers = int(os.environ.get("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+# Exposé à l'application (importée après la configuration) pour dimensionner ses pools
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Application importée une fois dans le maître puis partagée (copy-on-write) par les workers
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "120"))
+keepalive = 5
+
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+# Derrière nginx : IP client depuis X-Forwarded-For
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "*")
+
+
+def on_starting(server):
+    # Jeton commun à tous les workers de ce maître (y compris les workers recyclés) :
+    # la maintenance de démarrage n'est exécutée qu'une fois (server.start_startup_maintenance)
+    os.environ["STARTUP_MAINTENANCE_TOKEN"] = uuid.uuid4().hex
@@ -0,0 +1,227 @@
+"""
+Registre déclaratif des index MongoDB.
+
+Chaque collection liste les index nécessaires à ses requêtes chaudes. Le registre
+est appliqué au démarrage de l'API (ensure_indexes) et peut être appliqué ou
+contrôlé à la main :
+
+    python indexes.py            # crée les index manquants puis affiche le rapport
+    python indexes.py --check    # rapport seul (code retour 1 si des index manquent)
+
+Les noms suivent la convention MongoDB (`champ_1_autre_-1`) pour rester
+compatibles avec les index déjà créés sans nom explicite.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, List, Tuple
+
+from utils.search import SEARCH_TERMS_FIELD
+
+logger = logging.getLogger(__name__)
+
+IndexKeys = List[Tuple[str, int]]
+
+# Tri keyset commun aux listes paginées par curseur (voir utils/pagination.py)
+RECENT_FIRST: IndexKeys = [("created_at", -1), ("id", 1)]
+
+
+def _index(keys: IndexKeys, **options: Any) -> Dict[str, Any]:
+    return {"keys": keys, "options": options}
+
+
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        _index([("email", 1)], unique=True),
+        _index([("id", 1)], unique=True),
+        _index(RECENT_FIRST),
+    ],
+    "articles": [
+        _index([("id", 1)], unique=True),
+        _index([("status", 1), *RECENT_FIRST]),
+        _index([("category_id", 1), ("created_at", -1)]),
+        _index([("posted_by", 1)]),
+        _index([(SEARCH_TERMS_FIELD, 1)]),
+    ],
+    "minisite_articles": [
+        _index([("id", 1)], unique=True),
+        _index([("minisite_id", 1), ("created_at", -1)]),
+        _index([("show_in_public_catalog", 1), *RECENT_FIRST]),
+        _index([("show_in_reseller_catalog", 1), *RECENT_FIRST]),
+        _index([(SEARCH_TERMS_FIELD, 1)]),
+    ],
+    "minisites": [
+        _index([("id", 1)], unique=True),
+        _index([("slug", 1)], unique=True),
+        _index([("user_id", 1)]),
+    ],
+    "marketplace_transactions": [
+        _index([("id", 1)], unique=True),
+        _index([("article_id", 1), ("status", 1)]),
+        _index([("buyer_user_id", 1), *RECENT_FIRST]),
+        _index([("seller_user_id", 1), *RECENT_FIRST]),
+        _index([("buyer_user_id", 1), ("status", 1)]),
+    ],
+    "reviews": [
+        _index([("to_minisite_id", 1), ("visibility", 1), *RECENT_FIRST]),
+        _index([("to_user_id", 1), ("visibility", 1), *RECENT_FIRST]),
+        _index([("transaction_id", 1), ("from_user_id", 1)]),
+    ],
+    "seller_sales": [
+        _index([("id", 1)], unique=True),
+        _index([("seller_id", 1), ("created_at", -1)]),
+        _index(RECENT_FIRST),
+    ],
+    "demandes": [
+        _index([("id", 1)], unique=True),
+        _index([("client_id", 1), ("created_at", -1)]),
+        _index(RECENT_FIRST),
+    ],
+    "categories": [
+        _index([("id", 1)], unique=True),
+    ],
+    "settings": [
+        _index([("key", 1)], unique=True),
+    ],
+    "subscriptions": [
+        _index([("id", 1)], unique=True),
+        _index([("user_id", 1)]),
+        _index([("product", 1), ("created_at", -1)]),
+    ],
+    "password_resets": [
+        _index([("token_hash", 1)], unique=True),
+        _index([("expires_at", 1)], expireAfterSeconds=0),
+        _index([("user_id", 1)]),
+    ],
+    "pro_articles": [
+        _index([("id", 1)], unique=True),
+        _index([("user_id", 1), *RECENT_FIRST]),
+    ],
+    "pro_transactions": [
+        _index([("user_id", 1)]),
+    ],
+    "locks": [
+        _index([("expires_at", 1)], expireAfterSeconds=0),
+    ],
+    "notification_outbox": [
+        # Réclamation des emails dus (notifications/outbox.py) et reprise des baux expirés
+        _index([("status", 1), ("next_attempt_at", 1)]),
+        _index([("status", 1), ("locked_until", 1)]),
+        _index([("status", 1), ("created_at", -1)]),
+        # Emails envoyés supprimés après la rétention (expires_at absent sinon)
+        _index([("expires_at", 1)], expireAfterSeconds=0),
+    ],
+    "notification_digests": [
+        # Résumés dont la fenêtre est écoulée (notifications/digest.py)
+        _index([("flush_at", 1)]),
+    ],
+    "rate_limits": [
+        _index([("expires_at", 1)], expireAfterSeconds=0),
+    ],
+    "uploads": [
+        _index([("filename", 1)], unique=True),
+        # Un seul fichier par contenu, même pour deux uploads simultanés (upload_store.record_upload)
+        _index([("content_key", 1)], unique=True, partialFilterExpression={"content_key": {"$type": "string"}}),
+    ],
+}
+
+
+def index_name(keys: IndexKeys) -> str:
+    """Nom généré par MongoDB pour ces clés (ex. `seller_id_1_created_at_-1`)."""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    Crée les index du registre absents de la base (create_index est idempotent).
+    Un index existant dont l'option `unique` diffère du registre est reconstruit.
+    Un échec (doublons empêchant un index unique, options en conflit...) est
+    journalisé sans bloquer les autres index ni le démarrage.
+    Retourne {"created": [...], "failed": [...]}.
+    """
+    result: Dict[str, List[str]] = {"created": [], "failed": []}
+    for collection_name, specs in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        try:
+            existing = await collection.index_information()
+        except Exception:
+            # Collection inexistante : tous ses index sont à créer
+            existing = {}
+        for spec in specs:
+            name = index_name(spec["keys"])
+            current = existing.get(name)
+            if current is not None and bool(current.get("unique")) == bool(spec["options"].get("unique")):
+                continue
+            try:
+                if current is not None:
+                    await collection.drop_index(name)
+                await collection.create_index(spec["keys"], name=name, **spec["options"])
+                result["created"].append(f"{collection_name}.{name}")
+            except Exception as e:
+                result["failed"].append(f"{collection_name}.{name}")
+                logger.warning(f"Index {collection_name}.{name} non créé: {str(e)}")
+    if result["created"]:
+        logger.info(f"Index créés: {', '.join(result['created'])}")
+    return result
+
+
+async def index_report(db) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compare le registre aux index présents en base.
+    Retourne {collection: {"missing": [...], "extra": [...]}} pour les collections
+    présentant un écart (les index `_id_` sont ignorés).
+    """
+    report: Dict[str, Dict[str, List[str]]] = {}
+    existing_collections = set(await db.list_collection_names())
+    for collection_name in sorted(existing_collections | set(INDEX_REGISTRY)):
+        expected = {index_name(spec["keys"]) for spec in INDEX_REGISTRY.get(collection_name, [])}
+        if collection_name in existing_collections:
+            present = set(await db[collection_name].index_information()) - {"_id_"}
+        else:
+            present = set()
+        missing = sorted(expected - present)
+        extra = sorted(present - expected)
+        if missing or extra:
+            report[collection_name] = {"missing": missing, "extra": extra}
+    return report
+
+
+async def main() -> int:
+    from database import close_client, get_db
+
+    parser = argparse.ArgumentParser(description="Applique ou contrôle les index MongoDB du registre")
+    parser.add_argument("--check", action="store_true", help="N'applique rien, affiche seulement le rapport")
+    args = parser.parse_args()
+
+    try:
+        db = get_db()
+    except ValueError as e:
+        print(str(e))
+        return 1
+
+    try:
+        if not args.check:
+            result = await ensure_indexes(db)
+            print(f"✅ {len(result['created'])} index créé(s)")
+            for name in result["failed"]:
+                print(f"❌ Échec: {name}")
+
+        report = await index_report(db)
+        missing_total = 0
+        for collection_name, diff in report.items():
+            for name in diff["missing"]:
+                print(f"⚠️  Manquant: {collection_name}.{name}")
+            for name in diff["extra"]:
+                print(f"ℹ️  Hors registre: {collection_name}.{name}")
+            missing_total += len(diff["missing"])
+        if not report:
+            print("✅ Index conformes au registre")
+        return 1 if missing_total else 0
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
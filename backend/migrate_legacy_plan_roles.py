@@ -2,28 +2,20 @@
 Script de migration pour corriger les rôles legacy SITE_PLAN_10 et SITE_PLAN_15
 Remplace SITE_PLAN_10 par SITE_PLAN_2 et SITE_PLAN_15 par SITE_PLAN_3
 """
-import os
 import sys
-from pathlib import Path
-from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
 import asyncio
 
-# Charger les variables d'environnement
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+from database import close_client, get_db
 
-MONGO_URL = os.environ.get('MONGO_URL')
-DB_NAME = os.environ.get('DB_NAME', 'downpricer')
-
-if not MONGO_URL:
-    print("❌ MONGO_URL n'est pas défini dans backend/.env")
+try:
+    get_db()
+except ValueError as e:
+    print(str(e))
     sys.exit(1)
 
 async def migrate_legacy_plan_roles():
     """Migre les rôles legacy vers les nouveaux rôles"""
-    client = AsyncIOMotorClient(MONGO_URL)
-    db = client[DB_NAME]
+    db = get_db()
     
     print("🔄 Démarrage de la migration des rôles legacy...")
     
@@ -72,7 +64,7 @@ async def migrate_legacy_plan_roles():
     print(f"✅ Migré {result_site_plan_15.modified_count} utilisateur(s) avec site_plan=SITE_PLAN_15 vers SITE_PLAN_3")
     
     print("\n✅ Migration terminée !")
-    client.close()
+    close_client()
 
 if __name__ == "__main__":
     asyncio.run(migrate_legacy_plan_roles())
@@ -0,0 +1,80 @@
+"""
+Script de migration des photos du module Pro
+Déplace les photos base64 stockées dans pro_articles vers le store d'uploads
+(même traitement que /api/upload/image) et ne garde que l'URL dans le document.
+
+Usage: python migrate_pro_photos.py [--dry-run]
+"""
+import argparse
+import sys
+import asyncio
+
+from database import close_client, get_db
+from notifications import get_base_url
+from upload_store import UPLOAD_DIR, adjust_photo_refs, store_data_uri
+from utils.images import image_pool
+
+# Documents lus par lot : chacun peut peser plusieurs centaines de KB
+MIGRATION_BATCH_SIZE = 20
+
+
+async def migrate_pro_photos(dry_run: bool = False):
+    """Remplace les photos base64 des articles Pro par des URL du store d'uploads"""
+    db = get_db()
+    UPLOAD_DIR.mkdir(exist_ok=True)
+
+    print("🔄 Démarrage de la migration des photos Pro...")
+
+    base_url = await get_base_url(db)
+    migrated = 0
+    failed = 0
+    inline_bytes = 0
+    cursor = db.pro_articles.find(
+        {"photo": {"$regex": "^data:"}},
+        {"_id": 0, "id": 1, "photo": 1},
+        batch_size=MIGRATION_BATCH_SIZE
+    )
+    try:
+        async for article in cursor:
+            photo = article["photo"]
+            inline_bytes += len(photo)
+            if dry_run:
+                migrated += 1
+                continue
+            try:
+                stored = await store_data_uri(db, photo, base_url)
+            except Exception as e:
+                failed += 1
+                print(f"❌ Article {article['id']} : photo non migrée ({str(e)})")
+                continue
+            # Condition sur la photo : ne pas écraser une modification faite entre-temps
+            result = await db.pro_articles.update_one(
+                {"id": article["id"], "photo": photo},
+                {"$set": {"photo": stored["url"]}}
+            )
+            if result.modified_count:
+                await adjust_photo_refs(db, [], [stored["url"]])
+                migrated += 1
+    finally:
+        image_pool.shutdown()
+        close_client()
+
+    size_mb = inline_bytes / (1024 * 1024)
+    if dry_run:
+        print(f"ℹ️  Dry-run : {migrated} photo(s) base64 à migrer ({size_mb:.1f} MB dans MongoDB)")
+        return
+    print(f"✅ Migré {migrated} photo(s) ({size_mb:.1f} MB retirés de pro_articles)")
+    if failed:
+        print(f"⚠️  {failed} photo(s) en échec, conservées en base64")
+    print("\n✅ Migration terminée !")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migre les photos base64 du module Pro vers le store d'uploads")
+    parser.add_argument("--dry-run", action="store_true", help="Compte les photos à migrer sans rien modifier")
+    args = parser.parse_args()
+    try:
+        get_db()
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+    asyncio.run(migrate_pro_photos(args.dry_run))
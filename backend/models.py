@@ -115,6 +115,8 @@ class Article(BaseModel):
     discord_contact: Optional[str] = None  # Pseudo Discord du vendeur (ex: "pseudo", "@pseudo", "pseudo#1234")
     posted_by: Optional[str] = None  # ID de l'utilisateur qui a posté l'article
     is_third_party: Optional[bool] = None  # True si posté par un seller S_PLAN_3 non-admin
+    # Déclinaisons responsive alignées sur photos (voir upload_store.attach_photo_variants)
+    photo_variants: Optional[List[Optional[Dict[str, Any]]]] = None
 
 class ArticleCreate(BaseModel):
     name: str
@@ -259,6 +261,8 @@ class MiniSiteArticle(BaseModel):
     contact_email: Optional[str] = None
     # Pseudo Discord pour articles B2B (plan 3)
     discord_tag: Optional[str] = None
+    # Déclinaisons responsive alignées sur photos (voir upload_store.attach_photo_variants)
+    photo_variants: Optional[List[Optional[Dict[str, Any]]]] = None
 
 class MiniSiteArticleCreate(BaseModel):
     name: str
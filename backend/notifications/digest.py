@@ -0,0 +1,215 @@
+"""
+Résumés (digests) des notifications admin.
+
+Les événements EventType.ADMIN_* configurés en mode digest ne déclenchent pas
+un email chacun : ils sont ajoutés au résumé de leur fenêtre (collection
+`notification_digests`, un document par type d'événement et par fenêtre), puis
+`digest_worker` rend un seul email par fenêtre écoulée et le met dans l'outbox.
+
+Le mode digest est optionnel : sans paramètre `admin_notif_digest` dans la
+collection settings (PUT /api/admin/settings/admin_notif_digest), chaque
+événement est envoyé immédiatement. Le paramètre donne la fenêtre (minutes) des
+types d'événements à regrouper ; absent ou 0 = envoi immédiat. Les événements
+urgents (URGENT_ADMIN_EVENTS) sont toujours envoyés immédiatement.
+
+    {"value": {"admin_new_user": 60, "admin_new_sale": 15}}
+
+Un résumé est réclamé par un seul worker (bail), mis en outbox avec une clé
+d'idempotence dérivée de la fenêtre, puis supprimé : une reprise après un arrêt
+brutal ne produit pas de doublon.
+"""
+import asyncio
+import html
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from utils.mailer import get_email_config
+from utils.settings_cache import settings_cache
+
+from .outbox import enqueue_email
+
+logger = logging.getLogger(__name__)
+
+DIGEST_COLLECTION = "notification_digests"
+DIGEST_SETTINGS_KEY = "admin_notif_digest"
+
+# Toujours immédiats, quelle que soit la configuration (action admin attendue)
+URGENT_ADMIN_EVENTS = frozenset(["admin_deposit_paid"])
+
+# Détails conservés par résumé (les suivants sont seulement comptés)
+DIGEST_MAX_ITEMS = int(os.environ.get("DIGEST_MAX_ITEMS", "50"))
+# Délai après la fin d'une fenêtre avant l'envoi (événements en cours d'écriture)
+DIGEST_FLUSH_GRACE_SECONDS = 30
+DIGEST_LEASE_SECONDS = 120
+DIGEST_POLL_SECONDS = float(os.environ.get("DIGEST_POLL_SECONDS", "30"))
+
+
+async def digest_window_minutes(db, event_type: str) -> int:
+    """Fenêtre de résumé (minutes) de ce type d'événement, 0 si envoi immédiat."""
+    if event_type in URGENT_ADMIN_EVENTS:
+        return 0
+    windows = await settings_cache.get(db, DIGEST_SETTINGS_KEY, {}) or {}
+    if not isinstance(windows, dict):
+        return 0
+    try:
+        return max(0, int(windows.get(event_type, 0) or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+async def record_admin_event(
+    db,
+    event_type: str,
+    payload: Dict[str, Any],
+    idempotency_key: Optional[str] = None
+) -> bool:
+    """
+    Ajoute l'événement au résumé de sa fenêtre. False si l'événement doit être
+    notifié immédiatement (pas de mode digest pour ce type).
+    Un événement rejoué avec la même clé d'idempotence n'est compté qu'une fois
+    dans une fenêtre.
+    """
+    window_minutes = await digest_window_minutes(db, event_type)
+    if window_minutes <= 0:
+        return False
+
+    now = datetime.now(timezone.utc)
+    window_seconds = window_minutes * 60
+    window_start = int(now.timestamp() // window_seconds) * window_seconds
+    window_end = datetime.fromtimestamp(window_start + window_seconds, tz=timezone.utc)
+    item = {
+        "title": payload.get("title", ""),
+        "message": payload.get("message", ""),
+        "details": payload.get("details", ""),
+        "created_at": now,
+    }
+    digest_filter: Dict[str, Any] = {"_id": f"{event_type}:{window_start}"}
+    update: Dict[str, Any] = {
+        "$setOnInsert": {
+            "event_type": event_type,
+            "window_start": datetime.fromtimestamp(window_start, tz=timezone.utc),
+            "window_end": window_end,
+            "flush_at": window_end + timedelta(seconds=DIGEST_FLUSH_GRACE_SECONDS),
+        },
+        "$inc": {"count": 1},
+        "$push": {"items": {"$each": [item], "$slice": DIGEST_MAX_ITEMS}},
+    }
+    if idempotency_key:
+        digest_filter["keys"] = {"$ne": idempotency_key}
+        update["$addToSet"] = {"keys": idempotency_key}
+    try:
+        await db[DIGEST_COLLECTION].update_one(digest_filter, update, upsert=True)
+    except DuplicateKeyError:
+        # Le résumé contient déjà cet événement (le filtre sur `keys` n'a pas trouvé le document)
+        logger.info(f"Événement {idempotency_key} déjà présent dans le résumé, ignoré")
+    return True
+
+
+def _render_items(digest: Dict[str, Any]) -> str:
+    """Détails des événements du résumé (le HTML de `details` est déjà formaté par l'appelant)."""
+    sections = []
+    for item in digest.get("items", []):
+        created_at = item.get("created_at")
+        when = created_at.strftime("%d/%m %H:%M") if isinstance(created_at, datetime) else ""
+        sections.append(
+            f"<h3>{html.escape(str(item.get('title') or ''))} <small>{when} UTC</small></h3>"
+            f"<p>{html.escape(str(item.get('message') or ''))}</p>"
+            f"{item.get('details') or ''}"
+        )
+    hidden = digest.get("count", 0) - len(digest.get("items", []))
+    if hidden > 0:
+        sections.append(f"<p>… et {hidden} autre(s) événement(s).</p>")
+    return "".join(sections)
+
+
+async def _claim_due_digest(db) -> Optional[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    return await db[DIGEST_COLLECTION].find_one_and_update(
+        {
+            "flush_at": {"$lte": now},
+            "$or": [{"locked_until": {"$exists": False}}, {"locked_until": {"$lt": now}}],
+        },
+        {"$set": {"locked_until": now + timedelta(seconds=DIGEST_LEASE_SECONDS)}},
+        sort=[("flush_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def flush_due_digests(db) -> int:
+    """Met en outbox un email par résumé dont la fenêtre est écoulée ; retourne le nombre envoyé."""
+    from .notifier import get_base_url, render_template
+
+    flushed = 0
+    while True:
+        digest = await _claim_due_digest(db)
+        if digest is None:
+            return flushed
+
+        email_config = await get_email_config(db)
+        admin_email = email_config.get("admin_email")
+        if email_config.get("enabled", False) and admin_email:
+            brand_name = await settings_cache.get(db, "brand_name", "DownPricer")
+            count = digest.get("count", 0)
+            window_start = digest["window_start"].strftime("%d/%m/%Y %H:%M")
+            window_end = digest["window_end"].strftime("%H:%M")
+            last_title = digest["items"][-1].get("title") if digest.get("items") else "Notification"
+            title = f"Résumé : {count} × {last_title}"
+            html_body = render_template("admin_generic.html", {
+                "title": title,
+                "message": f"{count} événement(s) entre {window_start} et {window_end} (UTC).",
+                "details": _render_items(digest),
+                "action_button": "",
+                "brand_name": brand_name,
+                "support_email": await settings_cache.get(db, "support_email", "support@downpricer.com"),
+                "base_url": await get_base_url(db),
+            })
+            if html_body:
+                await enqueue_email(
+                    db,
+                    admin_email,
+                    f"[{brand_name}] {title}",
+                    html_body,
+                    event_type=digest["event_type"],
+                    idempotency_key=f"digest:{digest['_id']}"
+                )
+                flushed += 1
+        else:
+            logger.info(f"Notifications email désactivées, résumé {digest['_id']} ignoré")
+
+        await db[DIGEST_COLLECTION].delete_one({"_id": digest["_id"]})
+
+
+class DigestWorker:
+    """Tâche de fond qui envoie les résumés dont la fenêtre est écoulée."""
+
+    def __init__(self, poll_seconds: float = DIGEST_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def _run(self, db) -> None:
+        while True:
+            try:
+                await flush_due_digests(db)
+            except PyMongoError as e:
+                logger.warning(f"Résumés de notifications indisponibles: {str(e)}")
+            except Exception as e:
+                logger.error(f"Erreur lors de l'envoi des résumés de notifications: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.poll_seconds)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+digest_worker = DigestWorker()
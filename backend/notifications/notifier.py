@@ -6,15 +6,15 @@ import os
 import logging
 from enum import Enum
 from typing import Dict, Any, Optional
-from pathlib import Path
 from fastapi import BackgroundTasks
-from utils.mailer import get_email_config, send_email_sync
+from utils.mailer import get_email_config
+from .digest import record_admin_event
+from .outbox import enqueue_email
+from .templates import render_compiled, template_cache
+from utils.settings_cache import settings_cache
 
 logger = logging.getLogger(__name__)
 
-# Chemin vers les templates
-TEMPLATES_DIR = Path(__file__).parent / "email_templates"
-
 
 async def get_base_url(db) -> str:
     """
@@ -26,11 +26,9 @@ async def get_base_url(db) -> str:
     
     Retire toujours le slash final.
     """
-    base_url_setting = await db.settings.find_one({"key": "base_url"}, {"_id": 0})
+    base_url = await settings_cache.get(db, "base_url")
     
-    if base_url_setting and base_url_setting.get("value"):
-        base_url = base_url_setting.get("value")
-    else:
+    if not base_url:
         base_url = os.environ.get("BACKEND_PUBLIC_URL", "https://downpricer.com")
     
     # Retirer le slash final
@@ -89,72 +87,24 @@ def render_template(template_name: str, context: Dict[str, Any]) -> str:
     Rend un template HTML avec les variables du contexte
     Gère les variables {{ variable }} et les conditions {% if variable %}
     Échappe automatiquement les valeurs pour éviter XSS (sauf pour HTML déjà formaté)
+    Les templates sont compilés une fois et gardés en cache (voir templates.py)
     """
-    template_path = TEMPLATES_DIR / template_name
-    
-    if not template_path.exists():
-        # Fallback sur template générique
-        if "admin" in template_name:
-            template_path = TEMPLATES_DIR / "admin_generic.html"
-        else:
-            template_path = TEMPLATES_DIR / "user_generic.html"
+    try:
+        segments = template_cache.get(template_name)
+        if segments is None:
+            # Fallback sur template générique
+            fallback = "admin_generic.html" if "admin" in template_name else "user_generic.html"
+            segments = template_cache.get(fallback)
         
-        if not template_path.exists():
+        if segments is None:
             logger.error(f"Template non trouvé: {template_name}")
             return ""
-    
-    try:
-        with open(template_path, "r", encoding="utf-8") as f:
-            content = f.read()
         
         # Convertir les statuts en libellés lisibles si nécessaire
         if "status" in context and isinstance(context["status"], str):
             context["status_label"] = get_status_label(context["status"])
         
-        # Gérer les conditions {% if variable %} ... {% endif %}
-        import re
-        if_pattern = r'\{%\s*if\s+(\w+)\s*%\}(.*?)\{%\s*endif\s*%\}'
-        
-        def process_condition(match):
-            var_name = match.group(1)
-            inner_content = match.group(2)
-            var_value = context.get(var_name)
-            
-            # Vérifier si la variable existe et n'est pas vide/False
-            if var_value and str(var_value).strip() and str(var_value).lower() not in ['false', 'none', 'null']:
-                return inner_content
-            return ""
-        
-        content = re.sub(if_pattern, process_condition, content, flags=re.DOTALL)
-        
-        # Remplacement des variables {{ variable }}
-        # Variables qui ne doivent PAS être échappées (déjà du HTML)
-        html_vars = ["details", "action_button", "status_message", "status_box", "footer_message", "reason_message"]
-        
-        for key, value in context.items():
-            if value is None:
-                value = ""
-            
-            # Ne pas échapper les variables HTML
-            if key in html_vars and isinstance(value, str):
-                safe_value = value  # HTML déjà formaté
-            elif isinstance(value, str):
-                # Échapper HTML pour éviter XSS (sauf pour HTML déjà formaté)
-                safe_value = (
-                    value.replace("&", "&amp;")
-                         .replace("<", "&lt;")
-                         .replace(">", "&gt;")
-                         .replace('"', "&quot;")
-                         .replace("'", "&#x27;")
-                )
-            else:
-                safe_value = str(value)
-            
-            # Remplacer avec et sans espaces
-            content = content.replace(f"{{{{ {key} }}}}", safe_value)
-            content = content.replace(f"{{{{{key}}}}}", safe_value)
-        
-        return content
+        return render_compiled(segments, context)
     except Exception as e:
         logger.error(f"Erreur lors du rendu du template {template_name}: {str(e)}", exc_info=True)
         return ""
@@ -164,10 +114,13 @@ async def notify_admin(
     db,
     event_type: EventType,
     payload: Dict[str, Any],
-    background_tasks: BackgroundTasks
+    background_tasks: Optional[BackgroundTasks] = None,
+    idempotency_key: Optional[str] = None
 ):
     """
     Notifie l'admin d'un événement
+    (background_tasks n'est plus utilisé : l'envoi passe par l'outbox ;
+    idempotency_key évite un doublon si l'événement est rejoué)
     """
     try:
         # Récupérer la config email
@@ -182,12 +135,15 @@ async def notify_admin(
             logger.warning("Email admin non configuré, impossible d'envoyer la notification")
             return
         
-        # Récupérer les settings pour le contexte
-        brand_name_setting = await db.settings.find_one({"key": "brand_name"}, {"_id": 0})
-        support_email_setting = await db.settings.find_one({"key": "support_email"}, {"_id": 0})
+        # Mode digest : l'événement rejoint le résumé de sa fenêtre (voir digest.py)
+        event_name = event_type.value if isinstance(event_type, EventType) else str(event_type)
+        if await record_admin_event(db, event_name, payload, idempotency_key):
+            logger.info(f"Notification admin {event_type} ajoutée au résumé")
+            return
         
-        brand_name = brand_name_setting.get("value", "DownPricer") if brand_name_setting else "DownPricer"
-        support_email = support_email_setting.get("value", "support@downpricer.com") if support_email_setting else "support@downpricer.com"
+        # Récupérer les settings pour le contexte
+        brand_name = await settings_cache.get(db, "brand_name", "DownPricer")
+        support_email = await settings_cache.get(db, "support_email", "support@downpricer.com")
         base_url = await get_base_url(db)
         
         # Déterminer le template à utiliser
@@ -227,16 +183,17 @@ async def notify_admin(
         # Préparer le sujet
         subject = payload.get("subject", f"[{brand_name}] {context.get('title', 'Nouvelle notification')}")
         
-        # Ajouter la tâche d'envoi en arrière-plan
-        background_tasks.add_task(
-            send_email_sync,
-            email_config,
+        # Outbox MongoDB : l'email survit à la requête et au worker (voir outbox.py)
+        await enqueue_email(
+            db,
             admin_email,
             subject,
-            html_body
+            html_body,
+            event_type=event_type.value if isinstance(event_type, EventType) else str(event_type),
+            idempotency_key=idempotency_key
         )
         
-        logger.info(f"Notification admin {event_type} programmée pour {admin_email}")
+        logger.info(f"Notification admin {event_type} mise en outbox pour {admin_email}")
         
     except Exception as e:
         logger.error(f"Erreur lors de la notification admin {event_type}: {str(e)}", exc_info=True)
@@ -247,10 +204,13 @@ async def notify_user(
     event_type: EventType,
     user_email: str,
     payload: Dict[str, Any],
-    background_tasks: BackgroundTasks
+    background_tasks: Optional[BackgroundTasks] = None,
+    idempotency_key: Optional[str] = None
 ):
     """
     Notifie un utilisateur d'un événement
+    (background_tasks n'est plus utilisé : l'envoi passe par l'outbox ;
+    idempotency_key évite un doublon si l'événement est rejoué)
     """
     try:
         # Récupérer la config email
@@ -265,11 +225,8 @@ async def notify_user(
             return
         
         # Récupérer les settings pour le contexte
-        brand_name_setting = await db.settings.find_one({"key": "brand_name"}, {"_id": 0})
-        support_email_setting = await db.settings.find_one({"key": "support_email"}, {"_id": 0})
-        
-        brand_name = brand_name_setting.get("value", "DownPricer") if brand_name_setting else "DownPricer"
-        support_email = support_email_setting.get("value", "support@downpricer.com") if support_email_setting else "support@downpricer.com"
+        brand_name = await settings_cache.get(db, "brand_name", "DownPricer")
+        support_email = await settings_cache.get(db, "support_email", "support@downpricer.com")
         base_url = await get_base_url(db)
         
         # Déterminer le template à utiliser
@@ -309,16 +266,17 @@ async def notify_user(
         # Préparer le sujet
         subject = payload.get("subject", f"[{brand_name}] {context.get('title', 'Notification')}")
         
-        # Ajouter la tâche d'envoi en arrière-plan
-        background_tasks.add_task(
-            send_email_sync,
-            email_config,
+        # Outbox MongoDB : l'email survit à la requête et au worker (voir outbox.py)
+        await enqueue_email(
+            db,
             user_email,
             subject,
-            html_body
+            html_body,
+            event_type=event_type.value if isinstance(event_type, EventType) else str(event_type),
+            idempotency_key=idempotency_key
         )
         
-        logger.info(f"Notification user {event_type} programmée pour {user_email}")
+        logger.info(f"Notification user {event_type} mise en outbox pour {user_email}")
         
     except Exception as e:
         logger.error(f"Erreur lors de la notification user {event_type}: {str(e)}", exc_info=True)
@@ -0,0 +1,238 @@
+"""
+Outbox MongoDB des emails de notification.
+
+Les notifications sont rendues pendant la requête puis écrites dans la
+collection `notification_outbox` (enqueue_email) ; l'envoi SMTP est fait par
+`outbox_worker`, tâche de fond de chaque worker API :
+
+- réclamation atomique (find_one_and_update) : plusieurs workers/conteneurs
+  drainent la même outbox sans double envoi ;
+- bail (OUTBOX_LEASE_SECONDS) : un email réclamé par un worker arrêté en cours
+  d'envoi est repris à l'expiration du bail (livraison au moins une fois) ;
+- échec temporaire : nouvel essai avec backoff exponentiel
+  (OUTBOX_BASE_BACKOFF_SECONDS * 2^(essais-1), plafonné, avec jitter) ;
+- échec définitif (destinataire refusé, code SMTP 5xx) ou OUTBOX_MAX_ATTEMPTS
+  essais : statut "dead" (lettre morte), visible et relançable par l'admin ;
+- clé d'idempotence (_id) : un même événement (ex. webhook Stripe rejoué)
+  n'est mis en file qu'une fois.
+
+Les emails envoyés sont supprimés après OUTBOX_SENT_RETENTION_DAYS (index TTL).
+"""
+import asyncio
+import logging
+import os
+import random
+import smtplib
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from utils.mailer import MAIL_DRAIN_TIMEOUT, get_email_config, mail_queue
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "notification_outbox"
+
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BASE_BACKOFF_SECONDS = float(os.environ.get("OUTBOX_BASE_BACKOFF_SECONDS", "30"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.environ.get("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+OUTBOX_LEASE_SECONDS = float(os.environ.get("OUTBOX_LEASE_SECONDS", "120"))
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.environ.get("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_SENT_RETENTION_DAYS = int(os.environ.get("OUTBOX_SENT_RETENTION_DAYS", "7"))
+
+
+class OutboxStatus:
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+
+
+async def enqueue_email(
+    db,
+    to: str,
+    subject: str,
+    html_body: str,
+    text_body: Optional[str] = None,
+    event_type: Optional[str] = None,
+    idempotency_key: Optional[str] = None
+) -> bool:
+    """
+    Écrit un email dans l'outbox. False si un email avec la même clé
+    d'idempotence existe déjà (rien n'est ajouté).
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await db[OUTBOX_COLLECTION].insert_one({
+            "_id": idempotency_key or str(uuid.uuid4()),
+            "to": to,
+            "subject": subject,
+            "html_body": html_body,
+            "text_body": text_body,
+            "event_type": event_type,
+            "status": OutboxStatus.PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        })
+    except DuplicateKeyError:
+        logger.info(f"Email déjà en outbox (clé {idempotency_key}), ignoré")
+        return False
+    outbox_worker.wake()
+    return True
+
+
+def _backoff_seconds(attempts: int) -> float:
+    delay = min(OUTBOX_MAX_BACKOFF_SECONDS, OUTBOX_BASE_BACKOFF_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _is_permanent(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600 \
+        and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+async def _claim(db) -> Optional[Dict[str, Any]]:
+    """Réclame un email dû (ou dont le bail a expiré) pour ce worker."""
+    now = datetime.now(timezone.utc)
+    return await db[OUTBOX_COLLECTION].find_one_and_update(
+        {"$or": [
+            {"status": OutboxStatus.PENDING, "next_attempt_at": {"$lte": now}},
+            {"status": OutboxStatus.SENDING, "locked_until": {"$lt": now}},
+        ]},
+        {
+            "$set": {"status": OutboxStatus.SENDING, "locked_until": now + timedelta(seconds=OUTBOX_LEASE_SECONDS)},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def _process(db, doc: Dict[str, Any], config: Dict[str, Any]) -> None:
+    error = await mail_queue.deliver(config, doc["to"], doc["subject"], doc["html_body"], doc.get("text_body"))
+    now = datetime.now(timezone.utc)
+    if error is None:
+        update = {
+            "$set": {
+                "status": OutboxStatus.SENT,
+                "sent_at": now,
+                "expires_at": now + timedelta(days=OUTBOX_SENT_RETENTION_DAYS),
+            },
+            "$unset": {"locked_until": "", "last_error": ""},
+        }
+    elif _is_permanent(error) or doc["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+        logger.error(f"Email {doc['_id']} à {doc['to']} abandonné après {doc['attempts']} essai(s): {str(error)}")
+        update = {
+            "$set": {"status": OutboxStatus.DEAD, "dead_at": now, "last_error": str(error)},
+            "$unset": {"locked_until": ""},
+        }
+    else:
+        update = {
+            "$set": {
+                "status": OutboxStatus.PENDING,
+                "next_attempt_at": now + timedelta(seconds=_backoff_seconds(doc["attempts"])),
+                "last_error": str(error),
+            },
+            "$unset": {"locked_until": ""},
+        }
+    # Condition sur le bail : ne pas écraser un email repris entre-temps par un autre worker
+    await db[OUTBOX_COLLECTION].update_one(
+        {"_id": doc["_id"], "status": OutboxStatus.SENDING, "locked_until": doc["locked_until"]},
+        update
+    )
+
+
+async def drain_outbox(db, limit: int = OUTBOX_BATCH_SIZE) -> int:
+    """Réclame et envoie jusqu'à `limit` emails dus ; retourne le nombre traité."""
+    docs = []
+    while len(docs) < limit:
+        doc = await _claim(db)
+        if doc is None:
+            break
+        docs.append(doc)
+    if not docs:
+        return 0
+    # Configuration SMTP lue à l'envoi : les identifiants ne sont pas stockés dans l'outbox.
+    # L'activation des notifications a déjà été vérifiée à la mise en file.
+    config = {**await get_email_config(db), "enabled": True}
+    await asyncio.gather(*(_process(db, doc, config) for doc in docs))
+    return len(docs)
+
+
+async def requeue_dead_letter(db, email_id: str) -> bool:
+    """Remet une lettre morte en file pour un nouvel essai immédiat."""
+    result = await db[OUTBOX_COLLECTION].update_one(
+        {"_id": email_id, "status": OutboxStatus.DEAD},
+        {
+            "$set": {"status": OutboxStatus.PENDING, "attempts": 0, "next_attempt_at": datetime.now(timezone.utc)},
+            "$unset": {"dead_at": ""},
+        }
+    )
+    if result.modified_count:
+        outbox_worker.wake()
+    return bool(result.modified_count)
+
+
+class OutboxWorker:
+    """Tâche de fond qui draine l'outbox (démarrée/arrêtée avec l'API)."""
+
+    def __init__(self, poll_seconds: float = OUTBOX_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(db))
+
+    def wake(self) -> None:
+        """Réveille le worker de ce processus (email mis en file localement)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self, db) -> None:
+        while not self._stopping:
+            try:
+                processed = await drain_outbox(db)
+            except PyMongoError as e:
+                logger.warning(f"Outbox indisponible: {str(e)}")
+                processed = 0
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement de l'outbox: {str(e)}", exc_info=True)
+                processed = 0
+            if processed or self._stopping:
+                continue
+            # Attente d'un nouvel email local, ou du prochain essai / email d'un autre worker
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def stop(self, timeout: float = MAIL_DRAIN_TIMEOUT) -> None:
+        """
+        Termine le lot en cours puis arrête la boucle. Au-delà de `timeout`, les
+        emails réclamés non envoyés sont repris à l'expiration de leur bail.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self.wake()
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            self._task = None
+            self._wakeup = None
+
+
+outbox_worker = OutboxWorker()
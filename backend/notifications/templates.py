@@ -0,0 +1,131 @@
+"""
+Templates HTML des emails, compilés une fois et gardés en mémoire.
+
+Syntaxe (inchangée) :
+    {{ variable }} / {{variable}}         valeur échappée (sauf variables HTML)
+    {% if variable %} ... {% endif %}     bloc rendu si la variable est « vraie »
+                                          (non vide, différente de false/none/null)
+
+Un template est découpé à la compilation en segments (texte, variable, bloc
+conditionnel) ; le rendu assemble les segments en une seule passe au lieu de
+relire le fichier et de remplacer chaque clé dans tout le document.
+
+Rechargement à chaud (EMAIL_TEMPLATES_RELOAD, actif hors production) : la date
+de modification du fichier est vérifiée à chaque rendu et le template recompilé
+s'il a changé. En production (APP_ENV, sinon ENV, comme server.py), le cache
+n'est jamais revalidé.
+"""
+import html
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from utils.environment import is_production_env
+
+TEMPLATES_DIR = Path(__file__).parent / "email_templates"
+
+# Variables qui ne doivent PAS être échappées (déjà du HTML)
+HTML_VARS = frozenset(["details", "action_button", "status_message", "status_box", "footer_message", "reason_message"])
+
+_IF_PATTERN = re.compile(r'\{%\s*if\s+(\w+)\s*%\}(.*?)\{%\s*endif\s*%\}', re.DOTALL)
+_VAR_PATTERN = re.compile(r'\{\{ (\w+) \}\}|\{\{(\w+)\}\}')
+
+EMAIL_TEMPLATES_RELOAD = os.environ.get(
+    "EMAIL_TEMPLATES_RELOAD", "false" if is_production_env() else "true"
+).strip().lower() == "true"
+
+# Segment : texte brut, ("var", nom, placeholder d'origine) ou ("if", nom, segments)
+Segment = Union[str, Tuple[str, str, Any]]
+
+
+def _compile_text(text: str) -> List[Segment]:
+    segments: List[Segment] = []
+    position = 0
+    for match in _VAR_PATTERN.finditer(text):
+        if match.start() > position:
+            segments.append(text[position:match.start()])
+        segments.append(("var", match.group(1) or match.group(2), match.group(0)))
+        position = match.end()
+    if position < len(text):
+        segments.append(text[position:])
+    return segments
+
+
+def compile_template(source: str) -> List[Segment]:
+    """Découpe un template en segments (blocs {% if %} non imbriqués, comme avant)."""
+    segments: List[Segment] = []
+    position = 0
+    for match in _IF_PATTERN.finditer(source):
+        segments.extend(_compile_text(source[position:match.start()]))
+        segments.append(("if", match.group(1), _compile_text(match.group(2))))
+        position = match.end()
+    segments.extend(_compile_text(source[position:]))
+    return segments
+
+
+def _is_truthy(value: Any) -> bool:
+    return bool(value) and bool(str(value).strip()) and str(value).lower() not in ['false', 'none', 'null']
+
+
+def _format(key: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        # Échapper HTML pour éviter XSS (sauf pour HTML déjà formaté)
+        return value if key in HTML_VARS else html.escape(value, quote=True)
+    return str(value)
+
+
+def _render_segments(segments: List[Segment], context: Dict[str, Any], out: List[str]) -> None:
+    for segment in segments:
+        if isinstance(segment, str):
+            out.append(segment)
+        elif segment[0] == "var":
+            _, key, placeholder = segment
+            # Variable absente du contexte : placeholder laissé tel quel
+            out.append(_format(key, context[key]) if key in context else placeholder)
+        elif _is_truthy(context.get(segment[1])):
+            _render_segments(segment[2], context, out)
+
+
+def render_compiled(segments: List[Segment], context: Dict[str, Any]) -> str:
+    out: List[str] = []
+    _render_segments(segments, context, out)
+    return "".join(out)
+
+
+class TemplateCache:
+    def __init__(self, directory: Path = TEMPLATES_DIR, hot_reload: bool = EMAIL_TEMPLATES_RELOAD):
+        self.directory = directory
+        self.hot_reload = hot_reload
+        self._compiled: Dict[str, Tuple[float, List[Segment]]] = {}
+        # Rendus depuis la boucle asyncio et depuis des threads (scripts)
+        self._lock = threading.Lock()
+
+    def get(self, template_name: str) -> Optional[List[Segment]]:
+        """Template compilé, ou None si le fichier n'existe pas."""
+        entry = self._compiled.get(template_name)
+        if entry is not None and not self.hot_reload:
+            return entry[1]
+        path = self.directory / template_name
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            with self._lock:
+                self._compiled.pop(template_name, None)
+            return None
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        segments = compile_template(path.read_text(encoding="utf-8"))
+        with self._lock:
+            self._compiled[template_name] = (mtime, segments)
+        return segments
+
+    def clear(self) -> None:
+        with self._lock:
+            self._compiled.clear()
+
+
+template_cache = TemplateCache()
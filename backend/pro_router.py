@@ -2,45 +2,25 @@
 Router pour le module Pro achat/revente.
 Accessible uniquement aux utilisateurs S-tier (S_PLAN_5, S_PLAN_10, S_PLAN_15, SITE_PLAN_10).
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
+import asyncio
 import uuid
-import base64
-from PIL import Image
-import io
+from PIL import UnidentifiedImageError
 
+from database import get_db
 from dependencies import get_current_user, require_s_tier, require_admin, TokenData
 from models import User, UserRole
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
-from pathlib import Path
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# Connexion MongoDB (réutilise la même logique que server.py)
-mongo_url = os.environ.get('MONGO_URL')
-if not mongo_url:
-    raise ValueError("MONGO_URL n'est pas défini")
-
-# Si MONGO_URL contient déjà le nom de la base, l'extraire
-if mongo_url.count('/') >= 3:
-    url_parts = mongo_url.split('/')
-    if len(url_parts) > 3:
-        db_name_from_url = url_parts[-1].split('?')[0]
-        mongo_url_clean = '/'.join(url_parts[:3])
-        mongo_url = mongo_url_clean
-        db_name = db_name_from_url if db_name_from_url else os.environ.get('DB_NAME', 'downpricer')
-    else:
-        db_name = os.environ.get('DB_NAME', 'downpricer')
-else:
-    db_name = os.environ.get('DB_NAME', 'downpricer')
+from notifications import get_base_url
+from upload_store import adjust_photo_refs, store_data_uri
+from utils.images import ImagePoolSaturated
+from utils.pagination import MAX_CURSOR_LIMIT, decode_cursor, keyset_filter, merge_filters, split_page
+from utils.user_cache import user_cache
 
-client = AsyncIOMotorClient(mongo_url)
-db = client[db_name]
+# Client MongoDB partagé avec server.py (database.py)
+db = get_db()
 
 # Router avec préfixe /api/pro (sera inclus dans api_router qui a déjà /api)
 pro_router = APIRouter(prefix="/pro", tags=["Pro"])
@@ -52,7 +32,7 @@ pro_router = APIRouter(prefix="/pro", tags=["Pro"])
 class ProArticle(BaseModel):
     id: str
     user_id: str
-    photo: Optional[str] = None  # base64 encoded image
+    photo: Optional[str] = None  # URL dans le store d'uploads (data URI base64 acceptée en entrée)
     name: str
     quantity: int = 1
     purchase_platform: str  # Vinted, eBay, Amazon, LeBonCoin, etc.
@@ -113,6 +93,10 @@ class ProArticleLight(BaseModel):
     updated_at: datetime
     has_photo: bool = False
 
+class ProArticleLightPage(BaseModel):
+    items: List[ProArticleLight]
+    next_cursor: Optional[str] = None
+
 class ProArticlePhoto(BaseModel):
     photo: str
 
@@ -131,7 +115,7 @@ class ProTransaction(BaseModel):
 
 async def get_user_from_db(current_user: TokenData) -> User:
     """Récupère l'utilisateur complet depuis MongoDB."""
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0, "password_hash": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email, {"_id": 0, "password_hash": 0})
     if not user_doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -139,42 +123,25 @@ async def get_user_from_db(current_user: TokenData) -> User:
         )
     return User(**user_doc)
 
-def compress_image_base64(base64_image: str, max_width: int = 800, quality: int = 80) -> str:
-    """Compresse une image base64 pour réduire sa taille"""
+async def store_pro_photo(photo: Optional[str], user: User) -> Optional[str]:
+    """
+    Range une photo reçue en data URI base64 dans le store d'uploads et retourne
+    son URL : les documents pro_articles ne contiennent que l'URL.
+    Une URL (photo inchangée) est retournée telle quelle.
+    """
+    if not photo or not photo.startswith("data:"):
+        return photo
     try:
-        if not base64_image.startswith('data:image/'):
-            return base64_image
-        
-        header, data = base64_image.split(',', 1)
-        image_format = header.split('/')[1].split(';')[0].upper()
-        if image_format == 'JPG':
-            image_format = 'JPEG'
-        
-        image_data = base64.b64decode(data)
-        image = Image.open(io.BytesIO(image_data))
-        
-        if image.mode in ('RGBA', 'LA', 'P'):
-            image = image.convert('RGB')
-            image_format = 'JPEG'
-        
-        if image.width > max_width:
-            ratio = max_width / image.width
-            new_height = int(image.height * ratio)
-            image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
-        
-        output = io.BytesIO()
-        image.save(output, format=image_format, quality=quality, optimize=True)
-        compressed_data = output.getvalue()
-        
-        compressed_base64 = base64.b64encode(compressed_data).decode('utf-8')
-        format_lower = image_format.lower()
-        if format_lower == 'jpeg':
-            format_lower = 'jpg'
-        
-        return f"data:image/{format_lower};base64,{compressed_base64}"
-    except Exception as e:
-        print(f"Erreur compression image: {e}")
-        return base64_image
+        stored = await store_data_uri(db, photo, await get_base_url(db), uploaded_by=user.email)
+    except (ValueError, UnidentifiedImageError):
+        raise HTTPException(status_code=400, detail="Invalid photo")
+    except ImagePoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many images being processed, please retry",
+            headers={"Retry-After": "5"}
+        )
+    return stored["url"]
 
 # ============================================================================
 # ENDPOINTS ARTICLES
@@ -192,14 +159,14 @@ async def create_pro_article(
     article_dict["id"] = str(uuid.uuid4())
     article_dict["user_id"] = user.id
     
-    # Compresser l'image si présente
-    if article_dict.get("photo"):
-        article_dict["photo"] = compress_image_base64(article_dict["photo"])
+    # Stocker l'image dans le store d'uploads (le document ne garde que l'URL)
+    article_dict["photo"] = await store_pro_photo(article_dict.get("photo"), user)
     
     article_dict["created_at"] = datetime.utcnow()
     article_dict["updated_at"] = datetime.utcnow()
     
     await db.pro_articles.insert_one(article_dict)
+    await adjust_photo_refs(db, [], [article_dict["photo"]])
     
     # Créer transaction pour l'achat
     transaction = {
@@ -224,29 +191,53 @@ async def get_pro_articles(
     articles = await db.pro_articles.find({"user_id": user.id}).to_list(1000)
     return [ProArticle(**article) for article in articles]
 
-@pro_router.get("/articles-light", response_model=List[ProArticleLight])
+@pro_router.get("/articles-light", response_model=Union[List[ProArticleLight], ProArticleLightPage])
 async def get_pro_articles_light(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
     current_user: TokenData = Depends(require_s_tier())
 ):
-    """Récupérer les articles Pro sans photos (optimisé)."""
+    """
+    Récupérer les articles Pro sans photos (optimisé).
+    Une seule agrégation : `has_photo` est calculé côté MongoDB.
+    
+    Pagination par curseur (opt-in) : passer `cursor` (vide pour la première page)
+    puis le `next_cursor` renvoyé ; la réponse devient {"items", "next_cursor"}.
+    `limit` est borné à MAX_CURSOR_LIMIT dans les deux cas ; sans `limit`, une page
+    fait 100 articles et la liste (appel historique du frontend) au plus 1000.
+    """
     user = await get_user_from_db(current_user)
-    articles = await db.pro_articles.find(
-        {"user_id": user.id},
-        {"photo": 0}
-    ).to_list(1000)
     
-    light_articles = []
-    for article in articles:
-        article_data = article.copy()
-        # Vérifier si l'article a une photo
-        has_photo = await db.pro_articles.find_one(
-            {"id": article["id"], "user_id": user.id, "photo": {"$exists": True, "$ne": None}},
-            {"_id": 1}
-        ) is not None
-        article_data["has_photo"] = has_photo
-        light_articles.append(ProArticleLight(**article_data))
+    page_size = min(limit, MAX_CURSOR_LIMIT) if limit is not None else None
+    match = {"user_id": user.id}
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if position and isinstance(position.get("v"), str):
+            # created_at est stocké en datetime : le curseur le sérialise en texte
+            try:
+                position["v"] = datetime.fromisoformat(position["v"])
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+        match = merge_filters(match, keyset_filter(position))
+        page_limit = (page_size or 100) + 1
+    else:
+        page_limit = page_size or 1000
+    
+    articles = await db.pro_articles.aggregate([
+        {"$match": match},
+        {"$sort": {"created_at": -1, "id": 1}},
+        {"$limit": page_limit},
+        {"$addFields": {"has_photo": {"$and": [
+            {"$eq": [{"$type": "$photo"}, "string"]},
+            {"$ne": ["$photo", ""]}
+        ]}}},
+        {"$project": {"_id": 0, "photo": 0}},
+    ]).to_list(page_limit)
     
-    return light_articles
+    if cursor is None:
+        return [ProArticleLight(**article) for article in articles]
+    articles, next_cursor = split_page(articles, page_limit - 1)
+    return ProArticleLightPage(items=[ProArticleLight(**article) for article in articles], next_cursor=next_cursor)
 
 @pro_router.get("/articles/{article_id}/photo", response_model=ProArticlePhoto)
 async def get_pro_article_photo(
@@ -292,6 +283,8 @@ async def update_pro_article(
         raise HTTPException(status_code=404, detail="Article not found")
     
     update_data = {k: v for k, v in article_update.dict().items() if v is not None}
+    if "photo" in update_data:
+        update_data["photo"] = await store_pro_photo(update_data["photo"], user)
     update_data["updated_at"] = datetime.utcnow()
     
     # Si marqué comme vendu, créer transaction de vente
@@ -312,6 +305,8 @@ async def update_pro_article(
         {"id": article_id, "user_id": user.id},
         {"$set": update_data}
     )
+    if "photo" in update_data:
+        await adjust_photo_refs(db, [article.get("photo")], [update_data["photo"]])
     
     updated_article = await db.pro_articles.find_one({"id": article_id, "user_id": user.id})
     return ProArticle(**updated_article)
@@ -323,9 +318,13 @@ async def delete_pro_article(
 ):
     """Supprimer un article Pro."""
     user = await get_user_from_db(current_user)
-    result = await db.pro_articles.delete_one({"id": article_id, "user_id": user.id})
-    if result.deleted_count == 0:
+    deleted = await db.pro_articles.find_one_and_delete(
+        {"id": article_id, "user_id": user.id},
+        projection={"_id": 0, "photo": 1}
+    )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Article not found")
+    await adjust_photo_refs(db, [deleted.get("photo")], [])
     return {"message": "Article deleted successfully"}
 
 # ============================================================================
@@ -360,33 +359,74 @@ async def get_pro_dashboard_alerts(
     
     return [ProArticle(**article) for article in articles]
 
+def _count_if(condition: dict) -> dict:
+    return {"$sum": {"$cond": [condition, 1, 0]}}
+
+def _sum_if(condition: dict, field: str) -> dict:
+    return {"$sum": {"$cond": [condition, {"$ifNull": [field, 0]}, 0]}}
+
+def _status_is(value: str) -> dict:
+    return {"$eq": ["$status", value]}
+
+# Champs lus par les agrégations de statistiques (jamais la photo)
+STATS_ARTICLE_FIELDS = {
+    "_id": 0, "user_id": 1, "status": 1, "purchase_price": 1,
+    "actual_sale_price": 1, "estimated_sale_price": 1, "return_deadline": 1
+}
+
+async def _aggregate_one(collection, pipeline: list) -> dict:
+    """Premier (unique) résultat d'une agrégation $group / $facet, {} si vide."""
+    results = await collection.aggregate(pipeline).to_list(1)
+    return results[0] if results else {}
+
+async def normalize_return_deadlines(db_conn) -> int:
+    """
+    Convertit en date les `return_deadline` stockés en texte (données anciennes),
+    pour que les filtres et comparaisons de dates s'appliquent côté MongoDB.
+    Les valeurs non convertibles sont laissées telles quelles.
+    """
+    result = await db_conn.pro_articles.update_many(
+        {"return_deadline": {"$type": "string"}},
+        [{"$set": {"return_deadline": {"$convert": {
+            "input": "$return_deadline", "to": "date",
+            "onError": "$return_deadline", "onNull": None
+        }}}}]
+    )
+    return result.modified_count
+
 @pro_router.get("/dashboard/stats")
 async def get_pro_dashboard_stats(
     current_user: TokenData = Depends(require_s_tier())
 ):
-    """Récupérer les statistiques du dashboard Pro."""
+    """Récupérer les statistiques du dashboard Pro (agrégation MongoDB)."""
     user = await get_user_from_db(current_user)
-    articles = await db.pro_articles.find({"user_id": user.id}).to_list(1000)
-    
-    total_articles = len(articles)
-    articles_for_sale = len([a for a in articles if a["status"] == "À vendre"])
-    articles_sold = len([a for a in articles if a["status"] == "Vendu"])
-    articles_to_return = len([a for a in articles if a["status"] == "À renvoyer"])
-    articles_lost = len([a for a in articles if a["status"] == "Perte"])
-    
-    total_invested = sum(a["purchase_price"] for a in articles)
-    total_earned = sum(a.get("actual_sale_price", 0) for a in articles if a.get("actual_sale_price"))
-    potential_revenue = sum(a["estimated_sale_price"] for a in articles if a["status"] == "À vendre")
+    totals = await _aggregate_one(db.pro_articles, [
+        {"$match": {"user_id": user.id}},
+        {"$project": STATS_ARTICLE_FIELDS},
+        {"$group": {
+            "_id": None,
+            "total_articles": {"$sum": 1},
+            "articles_for_sale": _count_if(_status_is("À vendre")),
+            "articles_sold": _count_if(_status_is("Vendu")),
+            "articles_to_return": _count_if(_status_is("À renvoyer")),
+            "articles_lost": _count_if(_status_is("Perte")),
+            "total_invested": {"$sum": "$purchase_price"},
+            "total_earned": {"$sum": {"$ifNull": ["$actual_sale_price", 0]}},
+            "potential_revenue": _sum_if(_status_is("À vendre"), "$estimated_sale_price"),
+        }},
+    ])
     
+    total_invested = totals.get("total_invested", 0)
+    total_earned = totals.get("total_earned", 0)
     return {
-        "total_articles": total_articles,
-        "articles_for_sale": articles_for_sale,
-        "articles_sold": articles_sold,
-        "articles_to_return": articles_to_return,
-        "articles_lost": articles_lost,
+        "total_articles": totals.get("total_articles", 0),
+        "articles_for_sale": totals.get("articles_for_sale", 0),
+        "articles_sold": totals.get("articles_sold", 0),
+        "articles_to_return": totals.get("articles_to_return", 0),
+        "articles_lost": totals.get("articles_lost", 0),
         "total_invested": total_invested,
         "total_earned": total_earned,
-        "potential_revenue": potential_revenue,
+        "potential_revenue": totals.get("potential_revenue", 0),
         "current_margin": total_earned - total_invested
     }
 
@@ -401,106 +441,129 @@ async def get_pro_admin_stats(
     """
     Statistiques globales pour tous les utilisateurs du module Pro.
     Accessible uniquement aux administrateurs.
+    Calculées par agrégation MongoDB : mémoire constante quel que soit le volume.
     """
     db_conn = db  # Utiliser la connexion MongoDB locale
-    
-    # Récupérer tous les articles (tous users)
-    all_articles = await db_conn.pro_articles.find({}).to_list(length=None)
-    
-    # Récupérer toutes les transactions (tous users)
-    all_transactions = await db_conn.pro_transactions.find({}).to_list(length=None)
-    
-    # Calculer les stats globales
-    total_articles = len(all_articles)
-    articles_for_sale = len([a for a in all_articles if a.get("status") == "À vendre"])
-    articles_sold = len([a for a in all_articles if a.get("status") == "Vendu"])
-    articles_lost = len([a for a in all_articles if a.get("status") == "Perte"])
-    
-    # Calculer les montants globaux
-    total_invested = sum(a.get("purchase_price", 0) for a in all_articles)
-    total_earned = sum(a.get("actual_sale_price", 0) for a in all_articles if a.get("status") == "Vendu")
-    potential_revenue = sum(a.get("estimated_sale_price", 0) for a in all_articles if a.get("status") == "À vendre")
-    
-    # Calculer les transactions
-    total_transactions = len(all_transactions)
-    total_purchases = sum(abs(t.get("amount", 0)) for t in all_transactions if t.get("type") == "achat")
-    total_sales = sum(t.get("amount", 0) for t in all_transactions if t.get("type") == "vente")
-    
-    # Alertes retour globales (dans les 3 prochains jours)
     three_days_from_now = datetime.utcnow() + timedelta(days=3)
-    alerts_count = 0
-    for a in all_articles:
-        return_deadline = a.get("return_deadline")
-        if return_deadline and a.get("status") != "Vendu":
-            # Gérer les différents formats de datetime (datetime object ou string)
-            if isinstance(return_deadline, datetime):
-                deadline_dt = return_deadline
-            elif isinstance(return_deadline, str):
-                try:
-                    deadline_dt = datetime.fromisoformat(return_deadline.replace("Z", "+00:00"))
-                except (ValueError, AttributeError):
-                    continue
-            else:
-                continue
-            
-            if deadline_dt <= three_days_from_now:
-                alerts_count += 1
+    # Alertes retour globales (échéance dans les 3 prochains jours ou dépassée, article non vendu)
+    deadline = {"$convert": {"input": "$return_deadline", "to": "date", "onError": None, "onNull": None}}
     
-    # Compter les users uniques
-    unique_user_ids = set()
-    unique_user_ids.update(a.get("user_id") for a in all_articles)
-    unique_user_ids.update(t.get("user_id") for t in all_transactions)
-    total_users = len(unique_user_ids)
+    articles, transactions, users = await asyncio.gather(
+        _aggregate_one(db_conn.pro_articles, [
+            {"$project": STATS_ARTICLE_FIELDS},
+            {"$group": {
+                "_id": None,
+                "total_articles": {"$sum": 1},
+                "articles_for_sale": _count_if(_status_is("À vendre")),
+                "articles_sold": _count_if(_status_is("Vendu")),
+                "articles_lost": _count_if(_status_is("Perte")),
+                "total_invested": {"$sum": "$purchase_price"},
+                "total_earned": _sum_if(_status_is("Vendu"), "$actual_sale_price"),
+                "potential_revenue": _sum_if(_status_is("À vendre"), "$estimated_sale_price"),
+                "alerts_count": _count_if({"$and": [
+                    {"$ne": ["$status", "Vendu"]},
+                    {"$ne": [deadline, None]},
+                    {"$lte": [deadline, three_days_from_now]},
+                ]}),
+            }},
+        ]),
+        _aggregate_one(db_conn.pro_transactions, [
+            {"$group": {
+                "_id": None,
+                "total_transactions": {"$sum": 1},
+                "total_purchases": {"$sum": {"$cond": [
+                    {"$eq": ["$type", "achat"]}, {"$abs": {"$ifNull": ["$amount", 0]}}, 0
+                ]}},
+                "total_sales": _sum_if({"$eq": ["$type", "vente"]}, "$amount"),
+            }},
+        ]),
+        # Users uniques sur les deux collections
+        _aggregate_one(db_conn.pro_articles, [
+            {"$project": {"_id": 0, "user_id": 1}},
+            {"$unionWith": {"coll": "pro_transactions", "pipeline": [{"$project": {"_id": 0, "user_id": 1}}]}},
+            {"$group": {"_id": "$user_id"}},
+            {"$count": "total_users"},
+        ]),
+    )
     
+    total_invested = articles.get("total_invested", 0)
+    total_earned = articles.get("total_earned", 0)
     return {
-        "total_users": total_users,
-        "total_articles": total_articles,
-        "articles_for_sale": articles_for_sale,
-        "articles_sold": articles_sold,
-        "articles_lost": articles_lost,
-        "total_transactions": total_transactions,
+        "total_users": users.get("total_users", 0),
+        "total_articles": articles.get("total_articles", 0),
+        "articles_for_sale": articles.get("articles_for_sale", 0),
+        "articles_sold": articles.get("articles_sold", 0),
+        "articles_lost": articles.get("articles_lost", 0),
+        "total_transactions": transactions.get("total_transactions", 0),
         "total_invested": total_invested,
         "total_earned": total_earned,
         "total_revenue": total_earned,  # Alias pour compatibilité
-        "potential_revenue": potential_revenue,
+        "potential_revenue": articles.get("potential_revenue", 0),
         "current_margin": total_earned - total_invested,
-        "total_purchases": total_purchases,
-        "total_sales": total_sales,
-        "alerts_count": alerts_count
+        "total_purchases": transactions.get("total_purchases", 0),
+        "total_sales": transactions.get("total_sales", 0),
+        "alerts_count": articles.get("alerts_count", 0)
     }
 
+# Tris proposés pour la liste admin des utilisateurs Pro
+PRO_ADMIN_USER_SORTS = {
+    "activity": {"activity_count": -1, "last_activity_at": -1, "_id": 1},
+    "recent": {"last_activity_at": -1, "_id": 1},
+}
+
 @pro_router.get("/admin/users")
 async def get_pro_admin_users(
+    sort: str = Query("activity", description="activity (articles + transactions) ou recent (dernière activité)"),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
     current_user: TokenData = Depends(require_admin())
 ):
     """
     Liste des utilisateurs ayant utilisé le module Pro.
     Accessible uniquement aux administrateurs.
+    Une seule agrégation : comptes par user (articles + transactions via $unionWith)
+    joints à `users` par $lookup, triés par activité. `skip`/`limit` paginent
+    (sans `limit`, tous les utilisateurs sont retournés).
     """
     db_conn = db  # Utiliser la connexion MongoDB locale
+    if sort not in PRO_ADMIN_USER_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort: {sort}")
     
-    # Récupérer tous les user_ids uniques depuis les articles et transactions
-    user_ids_from_articles = await db_conn.pro_articles.distinct("user_id")
-    user_ids_from_transactions = await db_conn.pro_transactions.distinct("user_id")
-    all_user_ids = set(user_ids_from_articles) | set(user_ids_from_transactions)
+    pipeline = [
+        {"$project": {"_id": 0, "user_id": 1, "article": {"$literal": 1}, "at": "$created_at"}},
+        {"$unionWith": {"coll": "pro_transactions", "pipeline": [
+            {"$project": {"_id": 0, "user_id": 1, "article": {"$literal": 0}, "at": "$date"}}
+        ]}},
+        {"$group": {
+            "_id": "$user_id",
+            "articles_count": {"$sum": "$article"},
+            "activity_count": {"$sum": 1},
+            "last_activity_at": {"$max": "$at"},
+        }},
+        {"$sort": PRO_ADMIN_USER_SORTS[sort]},
+        {"$lookup": {
+            "from": "users",
+            "localField": "_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": {"_id": 0, "id": 1, "email": 1, "roles": 1, "created_at": 1}}],
+            "as": "user",
+        }},
+        {"$unwind": "$user"},
+        {"$skip": skip},
+    ]
+    if limit is not None:
+        pipeline.append({"$limit": limit})
     
-    # Récupérer les infos des users depuis la collection users
-    users_list = []
-    for user_id in all_user_ids:
-        user_doc = await db_conn.users.find_one({"id": user_id})
-        if user_doc:
-            # Compter les articles et transactions de cet user
-            user_articles_count = await db_conn.pro_articles.count_documents({"user_id": user_id})
-            user_transactions_count = await db_conn.pro_transactions.count_documents({"user_id": user_id})
-            
-            users_list.append({
-                "id": user_doc.get("id"),
-                "email": user_doc.get("email"),
-                "is_admin": UserRole.ADMIN.value in user_doc.get("roles", []),
-                "created_at": user_doc.get("created_at"),
-                "articles_count": user_articles_count,
-                "transactions_count": user_transactions_count
-            })
-    
-    return users_list
-
+    rows = await db_conn.pro_articles.aggregate(pipeline, allowDiskUse=True).to_list(limit)
+    return [
+        {
+            "id": row["user"].get("id"),
+            "email": row["user"].get("email"),
+            "is_admin": UserRole.ADMIN.value in (row["user"].get("roles") or []),
+            "created_at": row["user"].get("created_at"),
+            "articles_count": row["articles_count"],
+            "transactions_count": row["activity_count"] - row["articles_count"],
+            "last_activity_at": row.get("last_activity_at"),
+        }
+        for row in rows
+    ]
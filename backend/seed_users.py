@@ -3,7 +3,7 @@ Script non-interactif pour créer des comptes de test (admin, vendeur, client)
 Usage: python seed_users.py
 """
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import close_client, get_db
 from auth import get_password_hash
 import os
 from datetime import datetime, timezone
@@ -36,15 +36,13 @@ TEST_USERS = [
 
 async def seed_users():
     # Récupérer les variables d'environnement (depuis Docker ou .env)
-    mongo_url = os.environ.get('MONGO_URL', 'mongodb://mongo:27017')
-    db_name = os.environ.get('DB_NAME', 'downpricer')
+    os.environ.setdefault('MONGO_URL', 'mongodb://mongo:27017')
+    os.environ.setdefault('DB_NAME', 'downpricer')
+    db = get_db()
     
     print("=== Création des comptes de test ===\n")
-    print(f"MongoDB URL: {mongo_url}")
-    print(f"Database: {db_name}\n")
-    
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[db_name]
+    print(f"MongoDB URL: {os.environ['MONGO_URL']}")
+    print(f"Database: {db.name}\n")
     
     created_count = 0
     updated_count = 0
@@ -92,7 +90,7 @@ async def seed_users():
             print(f"✅ Créé: {email} (rôles: {', '.join(user_data['roles'])})")
             created_count += 1
     
-    client.close()
+    close_client()
     
     print(f"\n=== Résumé ===")
     print(f"✅ Créés: {created_count}")
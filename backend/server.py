@@ -3,21 +3,20 @@ from fastapi.responses import JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import acquire_lock, close_client, get_db, release_lock, renew_lock
 import os
+import asyncio
 import logging
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 import hashlib
 import secrets
-import time
 import shutil
 import json
 import zipfile
-from PIL import Image
-import io
+from PIL import UnidentifiedImageError
 
 from models import (
     User, UserCreate, UserLogin, Article, ArticleCreate, Category, CategoryCreate,
@@ -26,12 +25,35 @@ from models import (
     UserRole, DemandeStatus, SaleStatus, BillingMode,
     MarketplaceTransactionCreate, ReviewCreate
 )
-from auth import verify_password, get_password_hash, create_access_token
+from auth import verify_password_async, get_password_hash_async, create_access_token, decode_access_token
 from dependencies import get_current_user, require_roles
 from billing_provider import get_billing_provider
-from pro_router import pro_router
+from catalog import (
+    VENDOR_MINISITE_FIELDS,
+    VENDOR_USER_FIELDS,
+    build_posted_by_info,
+    enrich_minisite_articles,
+    fetch_by_ids,
+    fetch_public_catalog,
+    fetch_reseller_catalog,
+    public_catalog_sort,
+    reseller_catalog_sort,
+)
+from utils.search import SEARCH_FIELDS_EXCLUDED, SearchQuery, backfill_search_fields, search_fields
+from utils.environment import is_production_env
+from utils.settings_cache import settings_cache
+from utils.user_cache import user_cache
+from utils.images import ImagePoolSaturated, image_pool
+from utils.rate_limit import RateLimiter, client_ip
+from upload_store import UPLOAD_DIR, adjust_photo_refs, attach_photo_variants, store_upload
+from utils.uploads import UploadSizeLimitMiddleware, get_upload_max_bytes, sniff_image_format, spool_upload
+from utils.pagination import DEFAULT_CURSOR_LIMIT, MAX_CURSOR_LIMIT, decode_cursor, paginate_keyset, split_page
+from pro_router import normalize_return_deadlines, pro_router
+from indexes import ensure_indexes
 from notifications import EventType, notify_admin, notify_user, get_base_url
-from utils.mailer import send_email_sync
+from utils.mailer import mail_queue
+from notifications.digest import digest_worker
+from notifications.outbox import OUTBOX_COLLECTION, OutboxStatus, enqueue_email, outbox_worker, requeue_dead_letter
 from pydantic import BaseModel, EmailStr
 from stripe_billing import (
     create_checkout_session,
@@ -47,10 +69,13 @@ import stripe
 from utils.exports import (
     build_filename,
     create_temp_dir,
-    create_xlsx_file,
+    export_response,
     format_platform_links,
+    iter_batches,
+    open_export_writer,
     parse_date_range,
     stream_file_response,
+    write_cursor,
     cleanup_paths,
 )
 
@@ -58,12 +83,8 @@ ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Validation stricte du secret JWT en production
-def _is_production_env() -> bool:
-    env = (os.environ.get("APP_ENV") or os.environ.get("ENV") or "").strip().lower()
-    return env == "production"
-
 def _validate_jwt_secret_in_production() -> None:
-    if not _is_production_env():
+    if not is_production_env():
         return
     secret = os.environ.get("JWT_SECRET_KEY", "").strip()
     weak_values = {"change-me", "change-me-in-production"}
@@ -75,40 +96,6 @@ def _validate_jwt_secret_in_production() -> None:
 
 _validate_jwt_secret_in_production()
 
-# Vérification des variables d'environnement obligatoires
-mongo_url = os.environ.get('MONGO_URL')
-if not mongo_url:
-    raise ValueError(
-        "❌ MONGO_URL n'est pas défini dans backend/.env\n"
-        "Créez le fichier backend/.env avec :\n"
-        "MONGO_URL=mongodb://localhost:27017\n"
-        "DB_NAME=downpricer\n"
-        "JWT_SECRET_KEY=votre-cle-secrete\n"
-        "CORS_ORIGINS=http://localhost:3000\n"
-        "BACKEND_PUBLIC_URL=http://localhost:8001"
-    )
-
-# Si MONGO_URL contient déjà le nom de la base, l'extraire
-# Format possible: mongodb://localhost:27017/downpricer
-if mongo_url.count('/') >= 3:
-    # Extraire le nom de la base depuis l'URL
-    url_parts = mongo_url.split('/')
-    if len(url_parts) > 3:
-        # Le dernier élément après le dernier / est le nom de la base
-        db_name_from_url = url_parts[-1].split('?')[0]  # Enlever les paramètres de requête
-        mongo_url_clean = '/'.join(url_parts[:3])  # mongodb://localhost:27017
-        mongo_url = mongo_url_clean
-        db_name = db_name_from_url if db_name_from_url else os.environ.get('DB_NAME', 'downpricer')
-    else:
-        db_name = os.environ.get('DB_NAME', 'downpricer')
-else:
-    db_name = os.environ.get('DB_NAME')
-    if not db_name:
-        raise ValueError(
-            "❌ DB_NAME n'est pas défini dans backend/.env\n"
-            "Ajoutez DB_NAME=downpricer dans votre fichier backend/.env"
-        )
-
 # Configuration du logger AVANT son utilisation
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -118,10 +105,14 @@ PASSWORD_RESET_RATE_LIMIT_WINDOW_SECONDS = 60
 PASSWORD_RESET_RATE_LIMIT_MAX = 5
 PASSWORD_RESET_RATE_LIMIT_EMAIL_MAX = 5
 
-_password_reset_rate_limit = {
-    "ip": {},
-    "email": {}
-}
+# Limites partagées entre workers (utils/rate_limit.py) : requêtes max par fenêtre glissante
+password_reset_ip_limiter = RateLimiter("password-reset-ip", PASSWORD_RESET_RATE_LIMIT_MAX, PASSWORD_RESET_RATE_LIMIT_WINDOW_SECONDS)
+password_reset_email_limiter = RateLimiter("password-reset-email", PASSWORD_RESET_RATE_LIMIT_EMAIL_MAX, PASSWORD_RESET_RATE_LIMIT_WINDOW_SECONDS)
+login_ip_limiter = RateLimiter("login-ip", 30, 300)
+login_email_limiter = RateLimiter("login-email", 10, 300)
+signup_limiter = RateLimiter("signup-ip", 10, 3600)
+upload_limiter = RateLimiter("upload", 60, 60)
+checkout_limiter = RateLimiter("checkout", 10, 600)
 
 class ForgotPasswordRequest(BaseModel):
     email: EmailStr
@@ -130,10 +121,10 @@ class ResetPasswordRequest(BaseModel):
     token: str
     new_password: str
 
+# Client MongoDB partagé avec pro_router et les scripts (database.py)
 try:
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[db_name]
-    logger.info(f"✅ Connexion MongoDB configurée : {db_name}")
+    db = get_db()
+    logger.info(f"✅ Connexion MongoDB configurée : {db.name}")
 except Exception as e:
     logger.error(f"❌ Erreur de connexion MongoDB : {str(e)}")
     raise
@@ -142,36 +133,32 @@ app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 # Chemin relatif au répertoire backend pour les uploads
-UPLOAD_DIR = Path(ROOT_DIR / "uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 # Monte les uploads sous /api/uploads pour être accessible via l'ingress Kubernetes
 app.mount("/api/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 async def get_billing_mode() -> str:
-    setting = await db.settings.find_one({"key": "billing_mode"}, {"_id": 0})
-    if setting:
-        return setting.get("value", BillingMode.FREE_TEST)
-    return BillingMode.FREE_TEST
+    return await settings_cache.get(db, "billing_mode", BillingMode.FREE_TEST)
 
 async def get_deposit_percentage() -> float:
-    setting = await db.settings.find_one({"key": "deposit_percentage"}, {"_id": 0})
-    if setting:
-        return float(setting.get("value", 40))
-    return 40.0
+    return float(await settings_cache.get(db, "deposit_percentage", 40))
 
 def _hash_reset_token(token: str) -> str:
     return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
-def _rate_limit_check(bucket: dict, key: str, window_seconds: int, max_hits: int) -> bool:
-    now_ts = time.time()
-    entries = bucket.get(key, [])
-    entries = [ts for ts in entries if now_ts - ts < window_seconds]
-    if len(entries) >= max_hits:
-        bucket[key] = entries
+def _user_or_ip_key(request: Request) -> str:
+    """Clé de limitation : sujet du JWT si la requête est authentifiée, IP sinon."""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        payload = decode_access_token(authorization[7:].strip())
+        if payload and payload.get("sub"):
+            return f"user:{payload['sub']}"
+    return f"ip:{client_ip(request)}"
+
+async def _password_reset_rate_limited(db, ip: str, email: str) -> bool:
+    if not (await password_reset_ip_limiter.hit(db, ip)).allowed:
         return True
-    entries.append(now_ts)
-    bucket[key] = entries
-    return False
+    return not (await password_reset_email_limiter.hit(db, email)).allowed
 
 def _password_meets_policy(password: str) -> bool:
     return isinstance(password, str) and len(password) >= 8
@@ -200,8 +187,7 @@ def _build_reset_email(reset_link: str, expires_minutes: int) -> Dict[str, str]:
     )
     return {"subject": subject, "html": html_body, "text": text_body}
 
-def _queue_password_reset_email(
-    background_tasks: BackgroundTasks,
+async def _queue_password_reset_email(
     user_email: str,
     token: str
 ) -> None:
@@ -209,38 +195,25 @@ def _queue_password_reset_email(
     reset_link = f"{frontend_url}/reset-password?token={token}"
     email_content = _build_reset_email(reset_link, PASSWORD_RESET_TOKEN_TTL_MINUTES)
 
-    smtp_host = os.environ.get("SMTP_HOST", "").strip()
-    smtp_user = os.environ.get("SMTP_USER", "").strip()
-    smtp_pass = os.environ.get("SMTP_PASS", "").strip()
-    smtp_port = int(os.environ.get("SMTP_PORT", "587"))
-    smtp_from = os.environ.get("SMTP_FROM", "").strip()
-    smtp_tls_mode = os.environ.get("SMTP_TLS_MODE", "starttls")
-
-    smtp_configured = bool(smtp_host and smtp_user and smtp_pass)
-    email_config = {
-        "enabled": smtp_configured,
-        "smtp_host": smtp_host,
-        "smtp_port": smtp_port,
-        "smtp_user": smtp_user,
-        "smtp_pass": smtp_pass,
-        "smtp_from": smtp_from,
-        "smtp_tls_mode": smtp_tls_mode
-    }
+    # Envoi par l'outbox, avec la configuration SMTP de l'environnement (utils/mailer.py)
+    smtp_configured = all(
+        os.environ.get(name, "").strip() for name in ("SMTP_HOST", "SMTP_USER", "SMTP_PASS")
+    )
 
     if not smtp_configured:
-        if not _is_production_env():
+        if not is_production_env():
             logger.info(f"[DEV] Lien de réinitialisation pour {user_email}: {reset_link}")
         else:
             logger.warning("SMTP non configuré en production, email de reset non envoyé")
         return
 
-    background_tasks.add_task(
-        send_email_sync,
-        email_config,
+    await enqueue_email(
+        db,
         user_email,
         email_content["subject"],
         email_content["html"],
-        email_content["text"]
+        email_content["text"],
+        event_type="password_reset"
     )
 
 def _is_reset_token_expired(reset_doc: dict, now: datetime) -> bool:
@@ -259,8 +232,7 @@ def _is_reset_token_expired(reset_doc: dict, now: datetime) -> bool:
 async def _create_password_reset_record(
     user_doc: dict,
     user_email: str,
-    request: Request,
-    background_tasks: BackgroundTasks
+    request: Request
 ) -> None:
     now = datetime.now(timezone.utc)
     expires_at = now + timedelta(minutes=PASSWORD_RESET_TOKEN_TTL_MINUTES)
@@ -283,40 +255,14 @@ async def _create_password_reset_record(
     }
 
     await db.password_resets.insert_one(reset_doc)
-    _queue_password_reset_email(background_tasks, user_email, token)
+    await _queue_password_reset_email(user_email, token)
 
 def _compute_new_avg(current_avg: float, current_count: int, new_rating: int) -> float:
     if current_count <= 0:
         return float(new_rating)
     return ((current_avg * current_count) + new_rating) / (current_count + 1)
 
-async def _build_vendor_info(minisite: dict) -> dict:
-    if not minisite:
-        return {}
-    seller_name = ""
-    avatar_url = None
-    if minisite.get("user_id"):
-        user_doc = await db.users.find_one(
-            {"id": minisite.get("user_id")},
-            {"_id": 0, "avatar_url": 1, "first_name": 1, "last_name": 1}
-        )
-        if user_doc:
-            avatar_url = user_doc.get("avatar_url")
-            seller_name = f"{user_doc.get('first_name', '')} {user_doc.get('last_name', '')}".strip()
-    return {
-        "user_id": minisite.get("user_id"),
-        "minisite_id": minisite.get("id"),
-        "minisite_slug": minisite.get("slug"),
-        "minisite_name": minisite.get("site_name"),
-        "logo_url": minisite.get("logo_url"),
-        "rating_avg": minisite.get("rating_avg", 0),
-        "rating_count": minisite.get("rating_count", 0),
-        "sales_count": minisite.get("sales_count", 0),
-        "avatar_url": avatar_url,
-        "seller_name": seller_name
-    }
-
-@api_router.post("/auth/signup")
+@api_router.post("/auth/signup", dependencies=[Depends(signup_limiter.dependency(db))])
 async def signup(
     background_tasks: BackgroundTasks,
     user_data: UserCreate
@@ -329,7 +275,7 @@ async def signup(
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password_hash": get_password_hash(user_data.password),
+        "password_hash": await get_password_hash_async(user_data.password),
         "first_name": user_data.first_name,
         "last_name": user_data.last_name,
         "phone": user_data.phone,
@@ -366,11 +312,12 @@ async def signup(
         "user": User(**{k: v for k, v in user_doc.items() if k != "password_hash"})
     }
 
-@api_router.post("/auth/login")
+@api_router.post("/auth/login", dependencies=[Depends(login_ip_limiter.dependency(db))])
 async def login(credentials: UserLogin):
+    await login_email_limiter.enforce(db, credentials.email.strip().lower())
     user_doc = await db.users.find_one({"email": credentials.email}, {"_id": 0})
     
-    if not user_doc or not verify_password(credentials.password, user_doc["password_hash"]):
+    if not user_doc or not await verify_password_async(credentials.password, user_doc["password_hash"]):
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
     token = create_access_token(data={"sub": credentials.email, "roles": user_doc["roles"]})
@@ -382,7 +329,7 @@ async def login(credentials: UserLogin):
 
 @api_router.get("/auth/me")
 async def get_me(current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0, "password_hash": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email, {"_id": 0, "password_hash": 0})
     
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -392,45 +339,39 @@ async def get_me(current_user = Depends(get_current_user)):
 @api_router.post("/auth/forgot-password")
 async def forgot_password(
     payload: ForgotPasswordRequest,
-    background_tasks: BackgroundTasks,
     request: Request
 ):
     email = payload.email.strip().lower()
-    ip = request.client.host if request.client else "unknown"
-
-    if _rate_limit_check(_password_reset_rate_limit["ip"], ip, PASSWORD_RESET_RATE_LIMIT_WINDOW_SECONDS, PASSWORD_RESET_RATE_LIMIT_MAX):
-        return {"ok": True}
+    ip = client_ip(request)
 
-    if _rate_limit_check(_password_reset_rate_limit["email"], email, PASSWORD_RESET_RATE_LIMIT_WINDOW_SECONDS, PASSWORD_RESET_RATE_LIMIT_EMAIL_MAX):
+    # Réponse identique si la limite est atteinte : ne révèle pas l'existence du compte
+    if await _password_reset_rate_limited(db, ip, email):
         return {"ok": True}
 
     user_doc = await db.users.find_one({"email": email}, {"_id": 0})
     if not user_doc:
         return {"ok": True}
 
-    await _create_password_reset_record(user_doc, email, request, background_tasks)
+    await _create_password_reset_record(user_doc, email, request)
     return {"ok": True}
 
 @api_router.post("/auth/request-password-reset")
 async def request_password_reset(
-    background_tasks: BackgroundTasks,
     request: Request,
     current_user = Depends(get_current_user)
 ):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     if not user_doc:
         return {"ok": True}
 
     email = user_doc.get("email", "").strip().lower()
-    ip = request.client.host if request.client else "unknown"
+    ip = client_ip(request)
 
-    if _rate_limit_check(_password_reset_rate_limit["ip"], ip, PASSWORD_RESET_RATE_LIMIT_WINDOW_SECONDS, PASSWORD_RESET_RATE_LIMIT_MAX):
+    # Réponse identique si la limite est atteinte : ne révèle pas l'existence du compte
+    if await _password_reset_rate_limited(db, ip, email):
         return {"ok": True}
 
-    if _rate_limit_check(_password_reset_rate_limit["email"], email, PASSWORD_RESET_RATE_LIMIT_WINDOW_SECONDS, PASSWORD_RESET_RATE_LIMIT_EMAIL_MAX):
-        return {"ok": True}
-
-    await _create_password_reset_record(user_doc, email, request, background_tasks)
+    await _create_password_reset_record(user_doc, email, request)
     return {"ok": True}
 
 @api_router.post("/auth/reset-password")
@@ -454,8 +395,9 @@ async def reset_password(payload: ResetPasswordRequest):
 
     await db.users.update_one(
         {"id": user_id},
-        {"$set": {"password_hash": get_password_hash(payload.new_password)}}
+        {"$set": {"password_hash": await get_password_hash_async(payload.new_password)}}
     )
+    user_cache.invalidate(user_id=user_id)
 
     await db.password_resets.update_many(
         {"user_id": user_id, "used_at": None},
@@ -473,16 +415,7 @@ ALLOWED_IMAGE_FORMATS = {
     "HEIC": "heic",
 }
 
-def _detect_image_format(contents: bytes) -> Optional[str]:
-    try:
-        image = Image.open(io.BytesIO(contents))
-        image.verify()
-        return (image.format or "").upper()
-    except Exception:
-        return None
-
-
-@api_router.post("/upload/image")
+@api_router.post("/upload/image", dependencies=[Depends(upload_limiter.dependency(db, _user_or_ip_key))])
 async def upload_image(
     file: UploadFile = File(...), 
     current_user = Depends(get_current_user), 
@@ -494,16 +427,8 @@ async def upload_image(
     Si no_restrictions=True : accepte les formats image autorisés sans compression.
     Sinon : restrictions par défaut (12MB max, formats jpg/jpeg/png/webp/gif).
     """
-    upload_max_mb_env = os.environ.get("UPLOAD_MAX_MB", "24")
-    try:
-        upload_max_mb = int(upload_max_mb_env)
-    except ValueError:
-        upload_max_mb = 24
-    # Toujours au moins 24MB
-    upload_max_mb = max(upload_max_mb, 24)
-    MAX_FILE_SIZE = upload_max_mb * 1024 * 1024
-    COMPRESSION_THRESHOLD = 1 * 1024 * 1024  # 1MB - déclenche compression
-    TARGET_SIZE = 400 * 1024  # 400KB cible après compression
+    MAX_FILE_SIZE = get_upload_max_bytes()
+    spool_path = UPLOAD_DIR / f".{uuid.uuid4()}.part"
     
     try:
         # Vérifier que le fichier est présent
@@ -528,22 +453,11 @@ async def upload_image(
                     detail={"error": "unsupported_format", "detail": f"Format d'image non supporté: .{file_ext}. Formats acceptés: jpg, jpeg, png, webp, gif"}
                 )
         
-        # Lire le contenu du fichier
-        contents = await file.read()
-        file_size = len(contents)
-        
-        # Vérifier la taille maximale (toujours appliquer une limite de sécurité)
-        if file_size > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=413, 
-                detail={
-                    "error": "file_too_large",
-                    "detail": f"Le fichier est trop volumineux. Taille maximale autorisée : {upload_max_mb}MB (fichier reçu : {file_size / (1024*1024):.2f}MB)"
-                }
-            )
+        # Recopie par blocs sur disque : la limite de taille s'applique au fil de la réception
+        file_size, head, sha256 = await spool_upload(file, spool_path, MAX_FILE_SIZE)
         
         # Validation stricte par magic bytes (anti-spoofing)
-        detected_format = _detect_image_format(contents)
+        detected_format = sniff_image_format(head)
         if not detected_format or detected_format not in ALLOWED_IMAGE_FORMATS:
             raise HTTPException(
                 status_code=400,
@@ -553,89 +467,44 @@ async def upload_image(
                 }
             )
 
-        # Si no_restrictions=True, on sauvegarde le fichier tel quel sans compression
-        if no_restrictions:
-            file_ext = ALLOWED_IMAGE_FORMATS.get(detected_format, "jpg")
-            unique_filename = f"{uuid.uuid4()}.{file_ext}"
-            file_path = UPLOAD_DIR / unique_filename
-            
-            # Sauvegarder directement sans traitement
-            with open(file_path, "wb") as f:
-                f.write(contents)
-            
-            # Construire l'URL - utiliser get_base_url pour cohérence
-            base_url = await get_base_url(db)
-            file_url = f"{base_url}/api/uploads/{unique_filename}"
-            
-            return {"success": True, "url": file_url, "filename": unique_filename}
-        
-        # Sinon, traitement normal avec compression
-        # Toujours convertir en WebP pour de meilleures performances
-        unique_filename = f"{uuid.uuid4()}.webp"
-        file_path = UPLOAD_DIR / unique_filename
-        
-        image = Image.open(io.BytesIO(contents))
-        original_size = image.size
-        
-        # Convertir en RGB si nécessaire (pour les PNG avec alpha)
-        if image.mode in ('RGBA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if len(image.split()) == 4 else None)
-            image = background
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Si le fichier dépasse 1MB, appliquer une compression agressive
-        if file_size > COMPRESSION_THRESHOLD:
-            # Calculer un facteur de redimensionnement pour atteindre ~400KB
-            # Estimation: qualité 75 WebP ~= 0.1-0.2 bytes par pixel selon complexité
-            # On vise ~400KB = 400000 bytes, donc ~2-4M pixels max
-            target_pixels = TARGET_SIZE * 8  # Estimation conservatrice
-            current_pixels = image.size[0] * image.size[1]
-            
-            if current_pixels > target_pixels:
-                # Calculer le ratio de redimensionnement
-                scale_factor = (target_pixels / current_pixels) ** 0.5
-                new_size = (int(image.size[0] * scale_factor), int(image.size[1] * scale_factor))
-                # S'assurer que la taille minimale est respectée
-                new_size = (max(new_size[0], 400), max(new_size[1], 400))
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-                logger.info(f"Image redimensionnée de {original_size} à {new_size} pour compression")
-            
-            # Compression agressive avec qualité ajustée
-            quality = 60  # Qualité réduite pour fichiers > 1MB
-            method = 6  # Méthode de compression maximale
-            
-            # Essayer différentes qualités jusqu'à atteindre ~400KB
-            for attempt_quality in [quality, 50, 40, 30]:
-                temp_buffer = io.BytesIO()
-                image.save(temp_buffer, "WEBP", quality=attempt_quality, method=method)
-                temp_size = temp_buffer.tell()
-                
-                if temp_size <= TARGET_SIZE * 1.2:  # Accepter jusqu'à 480KB
-                    image.save(file_path, "WEBP", quality=attempt_quality, method=method)
-                    logger.info(f"Image compressée à {temp_size / 1024:.2f}KB avec qualité {attempt_quality}")
-                    break
-            else:
-                # Si même avec qualité 30 on dépasse, sauvegarder quand même
-                image.save(file_path, "WEBP", quality=30, method=method)
-                logger.warning(f"Image compressée mais taille finale > 400KB")
-        else:
-            # Fichier < 1MB : compression normale
-            max_size = (800, 800)
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            image.save(file_path, "WEBP", quality=75, method=4)
-        
         # Construire l'URL - utiliser get_base_url pour cohérence
         base_url = await get_base_url(db)
-        image_url = f"{base_url}/api/uploads/{unique_filename}"
         
-        return {"success": True, "url": image_url, "filename": unique_filename}
+        # Si no_restrictions=True, on sauvegarde le fichier tel quel sans compression.
+        # Sinon conversion WebP + déclinaisons. Un contenu déjà stocké est réutilisé (upload_store.py).
+        try:
+            stored = await store_upload(
+                db,
+                spool_path,
+                sha256,
+                base_url,
+                uploaded_by=current_user.email,
+                original_ext=ALLOWED_IMAGE_FORMATS.get(detected_format, "jpg") if no_restrictions else None
+            )
+        except ImagePoolSaturated:
+            raise HTTPException(
+                status_code=503,
+                detail={
+                    "error": "server_busy",
+                    "detail": "Trop d'images en cours de traitement. Veuillez réessayer dans quelques secondes."
+                },
+                headers={"Retry-After": "5"}
+            )
+        
+        if no_restrictions:
+            return {"success": True, "url": stored["url"], "filename": stored["filename"]}
+        return {"success": True, **stored}
     
     except HTTPException:
         raise
+    except UnidentifiedImageError:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "invalid_image",
+                "detail": "Format d'image non supporté ou fichier invalide. Formats acceptés: jpg, png, webp, gif"
+            }
+        )
     except Exception as e:
         logger.error(f"Upload error: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -645,13 +514,15 @@ async def upload_image(
                 "detail": f"Erreur lors de l'upload: {str(e)}"
             }
         )
+    finally:
+        spool_path.unlink(missing_ok=True)
 
 @api_router.post("/users/avatar", dependencies=[Depends(get_current_user)])
 async def upload_user_avatar(
     file: UploadFile = File(...),
     current_user = Depends(get_current_user)
 ):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0, "id": 1})
+    user_doc = await user_cache.get_by_email(db, current_user.email, {"_id": 0, "id": 1})
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
@@ -661,13 +532,14 @@ async def upload_user_avatar(
         raise HTTPException(status_code=500, detail="Impossible de sauvegarder l'avatar")
 
     await db.users.update_one({"id": user_doc["id"]}, {"$set": {"avatar_url": avatar_url}})
+    user_cache.invalidate(email=current_user.email)
     return {"avatar_url": avatar_url}
 
 @api_router.get("/settings/public")
 async def get_public_settings():
-    settings_docs = await db.settings.find({"key": {"$in": ["logo_url", "contact_phone", "contact_email", "discord_invite_url", "billing_mode", "payments_enabled"]}}, {"_id": 0}).to_list(100)
-    
-    settings_dict = {s["key"]: s["value"] for s in settings_docs}
+    settings_dict = await settings_cache.get_many(
+        db, ["logo_url", "contact_phone", "contact_email", "discord_invite_url", "billing_mode", "payments_enabled"]
+    )
     
     if "billing_mode" not in settings_dict:
         settings_dict["billing_mode"] = BillingMode.FREE_TEST
@@ -687,92 +559,59 @@ async def get_articles(
     category_id: Optional[str] = None,
     search: Optional[str] = None,
     sort: Optional[str] = "recent",
-    skip: int = 0,
-    limit: int = 20
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None
 ):
     """
     Catalogue public DownPricer (downpricer.com).
     Inclut :
     - Les articles du catalogue général avec visible_public != false
     - Les articles de mini-site avec show_in_public_catalog=True (plan Premium uniquement)
-    """
-    all_articles = []
+    Filtrage, tri et pagination sont faits par MongoDB (voir catalog.py).
+    `search` utilise l'index de recherche (utils/search.py) ; `sort=relevance` classe par pertinence.
     
-    # 1. Articles du catalogue général (visible_public)
-    query_articles = {"status": "active", "visible_public": {"$ne": False}}
-    
-    if category_id:
-        query_articles["category_id"] = category_id
-    
-    if search:
-        query_articles["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
-    
-    general_articles = await db.articles.find(query_articles, {"_id": 0}).to_list(1000)
-    # Ne pas exposer discord_contact, is_third_party, posted_by dans le catalogue public
-    for article in general_articles:
-        if "discord_contact" in article:
-            del article["discord_contact"]
-        if "is_third_party" in article:
-            del article["is_third_party"]
-        if "posted_by" in article:
-            del article["posted_by"]
-    all_articles.extend(general_articles)
-    
-    # 2. Articles de mini-site avec show_in_public_catalog=True (plan Premium uniquement)
-    query_minisite = {"show_in_public_catalog": True, "status": {"$nin": ["sold", "suspended"]}}
-    
-    if search:
-        # Ajouter le filtre de recherche pour les articles mini-site
-        query_minisite["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
-    
-    minisite_articles_raw = await db.minisite_articles.find(query_minisite, {"_id": 0}).to_list(1000)
-    
-    # Filtrer pour ne garder que ceux dont le mini-site est actif et Premium
-    for article in minisite_articles_raw:
-        minisite = await db.minisites.find_one(
-            {"id": article.get("minisite_id")},
-            {"_id": 0, "status": 1, "plan_id": 1, "user_id": 1, "site_name": 1, "slug": 1, "logo_url": 1, "rating_avg": 1, "rating_count": 1, "sales_count": 1}
+    Pagination par curseur (opt-in) : passer `cursor` (vide pour la première page)
+    puis le `next_cursor` renvoyé. `skip` est alors ignoré et `total` vaut null.
+    """
+    # Borne la fenêtre $limit des deux branches du $unionWith (voir catalog.py)
+    page_limit = min(limit, MAX_CURSOR_LIMIT)
+    if cursor is not None:
+        sort_field, _ = public_catalog_sort(sort, search)
+        articles, total = await fetch_public_catalog(
+            db,
+            category_id=category_id,
+            search=search,
+            sort=sort,
+            limit=page_limit + 1,
+            after=decode_cursor(cursor, sort_field),
+            with_total=False
         )
-        if minisite and minisite.get("status") == "active" and minisite.get("plan_id") == "SITE_PLAN_3":
-            # Ajouter la source pour distinguer
-            article["source"] = "minisite"
-            article["minisite_id"] = article.get("minisite_id")
-            # Marquer comme vendeur tiers (créé par un user minisite, pas admin)
-            article["is_third_party"] = True
-            article["vendor"] = await _build_vendor_info(minisite)
-            # Filtrer par recherche si nécessaire (déjà fait dans la query MongoDB)
-            if not search or search.lower() in article.get("name", "").lower() or search.lower() in article.get("description", "").lower():
-                all_articles.append(article)
-    
-    # Trier selon le paramètre sort
-    sort_options = {
-        "recent": ("created_at", -1),
-        "price_low": ("price", 1),
-        "views": ("views", -1)
-    }
-    
-    sort_field, sort_order = sort_options.get(sort, ("created_at", -1))
-    
-    # Trier les articles combinés
-    reverse_order = sort_order == -1
-    all_articles.sort(key=lambda x: x.get(sort_field, ""), reverse=reverse_order)
-    
-    # Filtrer par catégorie si nécessaire (pour les articles mini-site, on ne filtre pas par catégorie car ils n'ont pas ce champ)
-    if category_id:
-        all_articles = [a for a in all_articles if a.get("category_id") == category_id]
-    
-    total = len(all_articles)
+        articles, next_cursor = split_page(articles, page_limit, sort_field)
+    else:
+        articles, total = await fetch_public_catalog(
+            db,
+            category_id=category_id,
+            search=search,
+            sort=sort,
+            skip=skip,
+            limit=page_limit
+        )
+        next_cursor = None
     
-    # Appliquer pagination
-    paginated_articles = all_articles[skip:skip + limit]
+    minisites = {}
+    minisite_articles = []
+    for article in articles:
+        minisite = article.pop("_minisite", None)
+        if minisite is not None:
+            minisites[minisite["id"]] = minisite
+            minisite_articles.append(article)
+    await enrich_minisite_articles(db, minisite_articles, minisites)
+    await attach_photo_variants(db, articles)
     
-    return {"articles": paginated_articles, "total": total}
+    if cursor is not None:
+        return {"articles": articles, "total": total, "next_cursor": next_cursor}
+    return {"articles": articles, "total": total}
 
 @api_router.get("/articles/{article_id}")
 async def get_article(article_id: str):
@@ -786,18 +625,19 @@ async def get_article(article_id: str):
     logger.info(f"GET /articles/{article_id} - Recherche article avec ID: {article_id}")
     
     # 1. Chercher dans le catalogue général
-    article = await db.articles.find_one({"id": article_id}, {"_id": 0})
+    article = await db.articles.find_one({"id": article_id}, {"_id": 0, **SEARCH_FIELDS_EXCLUDED})
     
     if article:
         logger.info(f"Article trouvé dans catalogue général: {article_id}")
         await db.articles.update_one({"id": article_id}, {"$inc": {"views": 1}})
         article["views"] = article.get("views", 0) + 1
         article["source"] = "general"
+        await attach_photo_variants(db, [article])
         return article
     
     # 2. Si pas trouvé, chercher dans les articles mini-site
     logger.info(f"Article non trouvé dans catalogue général, recherche dans minisite_articles: {article_id}")
-    minisite_article = await db.minisite_articles.find_one({"id": article_id}, {"_id": 0})
+    minisite_article = await db.minisite_articles.find_one({"id": article_id}, {"_id": 0, **SEARCH_FIELDS_EXCLUDED})
     
     if minisite_article:
         if minisite_article.get("status") == "sold":
@@ -805,7 +645,7 @@ async def get_article(article_id: str):
         # Vérifier que le mini-site est actif
         minisite = await db.minisites.find_one(
             {"id": minisite_article.get("minisite_id")},
-            {"_id": 0, "status": 1, "plan_id": 1, "user_id": 1, "site_name": 1, "slug": 1, "logo_url": 1, "rating_avg": 1, "rating_count": 1, "sales_count": 1}
+            VENDOR_MINISITE_FIELDS
         )
         
         if not minisite or minisite.get("status") != "active":
@@ -821,22 +661,15 @@ async def get_article(article_id: str):
         # Enrichir avec les infos du vendeur pour les articles B2B
         if minisite_article.get("show_in_reseller_catalog"):
             minisite_article["is_third_party"] = True
-            minisite_article["vendor"] = await _build_vendor_info(minisite)
-            user_id = minisite.get("user_id")
-            if user_id:
-                seller_user = await db.users.find_one({"id": user_id}, {"_id": 0, "email": 1, "first_name": 1, "last_name": 1})
-                if seller_user:
-                    minisite_article["posted_by_info"] = {
-                        "id": user_id,
-                        "username": seller_user.get("email", "").split("@")[0],
-                        "name": f"{seller_user.get('first_name', '')} {seller_user.get('last_name', '')}".strip() or seller_user.get("email", "").split("@")[0] or minisite.get("site_name", "Vendeur")
-                    }
-            reserved_tx = await db.marketplace_transactions.find_one(
-                {"article_id": minisite_article.get("id"), "status": "accepted"},
-                {"_id": 0, "id": 1}
+            await enrich_minisite_articles(
+                db,
+                [minisite_article],
+                {minisite["id"]: minisite},
+                include_posted_by=True,
+                include_reserved=True
             )
-            minisite_article["reserved"] = reserved_tx is not None
         
+        await attach_photo_variants(db, [minisite_article])
         return minisite_article
     
     logger.warning(f"Article non trouvé nulle part: {article_id}")
@@ -848,7 +681,7 @@ async def create_demande(
     demande_data: DemandeCreate,
     current_user = Depends(get_current_user)
 ):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -925,14 +758,14 @@ async def create_demande(
     
     return Demande(**demande_doc)
 
-@api_router.post("/demandes/{demande_id}/pay-deposit", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN]))])
+@api_router.post("/demandes/{demande_id}/pay-deposit", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN])), Depends(checkout_limiter.dependency(db, _user_or_ip_key))])
 async def pay_deposit(demande_id: str, current_user = Depends(get_current_user)):
     demande = await db.demandes.find_one({"id": demande_id}, {"_id": 0})
     
     if not demande:
         raise HTTPException(status_code=404, detail="Demande non trouvée")
     
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     if demande["client_id"] != user_doc["id"] and UserRole.ADMIN not in current_user.roles:
         raise HTTPException(status_code=403, detail="Accès interdit")
@@ -966,7 +799,7 @@ async def pay_deposit(demande_id: str, current_user = Depends(get_current_user))
 
 @api_router.get("/demandes", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN]))])
 async def get_my_demandes(current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     query = {}
     if UserRole.ADMIN not in current_user.roles:
@@ -983,7 +816,7 @@ async def get_demande(demande_id: str, current_user = Depends(get_current_user))
     if not demande:
         raise HTTPException(status_code=404, detail="Demande non trouvée")
     
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     if demande["client_id"] != user_doc["id"] and UserRole.ADMIN not in current_user.roles:
         raise HTTPException(status_code=403, detail="Accès interdit")
@@ -1002,7 +835,7 @@ async def cancel_demande(
     if not demande:
         raise HTTPException(status_code=404, detail="Demande non trouvée")
     
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     is_admin = UserRole.ADMIN in current_user.roles
     
     if demande["client_id"] != user_doc["id"] and not is_admin:
@@ -1021,9 +854,8 @@ async def cancel_demande(
     
     if demande["status"] in blocking_statuses and not is_admin:
         # Récupérer l'email de support depuis les paramètres
-        support_setting = await db.settings.find_one({"key": "support_email"}, {"_id": 0})
-        contact_setting = await db.settings.find_one({"key": "contact_email"}, {"_id": 0})
-        support_email = support_setting["value"] if support_setting else (contact_setting["value"] if contact_setting else "contact@downpricer.com")
+        settings_values = await settings_cache.get_many(db, ["support_email", "contact_email"])
+        support_email = settings_values.get("support_email", settings_values.get("contact_email", "contact@downpricer.com"))
         raise HTTPException(
             status_code=400, 
             detail=f"Il n'est pas possible d'annuler cette commande. Veuillez contacter {support_email}"
@@ -1195,8 +1027,9 @@ async def request_seller_access(
 @api_router.get("/seller/articles", dependencies=[Depends(require_roles([UserRole.SELLER, UserRole.ADMIN]))])
 async def get_seller_articles(
     search: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 20,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_user)
 ):
     """
@@ -1204,93 +1037,55 @@ async def get_seller_articles(
     Inclut :
     - Les articles du catalogue général avec visible_seller=True
     - Les articles de mini-site avec show_in_reseller_catalog=True (plans Standard/Premium)
-    """
-    all_articles = []
-    
-    # 1. Articles du catalogue général (visible_seller)
-    query_articles = {"status": "active", "stock": {"$gt": 0}, "visible_seller": {"$ne": False}}
-    
-    if search:
-        query_articles["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
-    
-    general_articles = await db.articles.find(query_articles, {"_id": 0}).to_list(1000)
-    for article in general_articles:
-        article["potential_profit"] = article["reference_price"] - article["price"]
-        article["source"] = "general"  # Marquer la source
-        
-        # Enrichir avec les infos posted_by si présent
-        if article.get("posted_by"):
-            posted_by_user = await db.users.find_one({"id": article["posted_by"]}, {"_id": 0, "email": 1, "first_name": 1, "last_name": 1})
-            if posted_by_user:
-                article["posted_by_info"] = {
-                    "id": article["posted_by"],
-                    "username": posted_by_user.get("email", "").split("@")[0],  # Pseudo basé sur email
-                    "name": f"{posted_by_user.get('first_name', '')} {posted_by_user.get('last_name', '')}".strip() or posted_by_user.get("email", "").split("@")[0]
-                }
-        
-        all_articles.append(article)
-    
-    # 2. Articles de mini-site avec show_in_reseller_catalog=True
-    query_minisite = {"show_in_reseller_catalog": True, "status": {"$nin": ["sold", "suspended"]}}
+    Tri par pertinence si `search` est fourni, sinon par date de création décroissante.
+    Filtrage et pagination faits par MongoDB.
     
-    # Vérifier que le mini-site est actif
-    minisite_articles_raw = await db.minisite_articles.find(query_minisite, {"_id": 0}).to_list(1000)
-    
-    # Filtrer pour ne garder que ceux dont le mini-site est actif
-    for article in minisite_articles_raw:
-        minisite = await db.minisites.find_one(
-            {"id": article.get("minisite_id")},
-            {"_id": 0, "status": 1, "plan_id": 1, "user_id": 1, "site_name": 1, "slug": 1, "logo_url": 1, "rating_avg": 1, "rating_count": 1, "sales_count": 1}
+    Avec `cursor` (vide pour la première page), retourne {"items", "next_cursor"}.
+    """
+    page_limit = min(limit, MAX_CURSOR_LIMIT)
+    if cursor is not None:
+        sort_field, _ = reseller_catalog_sort(search)
+        articles = await fetch_reseller_catalog(
+            db,
+            search=search,
+            limit=page_limit + 1,
+            after=decode_cursor(cursor, sort_field)
         )
-        if minisite and minisite.get("status") == "active":
-            # Vérifier que le plan permet le catalogue revendeur (SITE_PLAN_2 ou SITE_PLAN_3)
-            plan_id = minisite.get("plan_id")
-            if plan_id in ["SITE_PLAN_2", "SITE_PLAN_3"]:
-                reserved_tx = await db.marketplace_transactions.find_one(
-                    {"article_id": article.get("id"), "status": "accepted"},
-                    {"_id": 0, "id": 1}
-                )
-                if reserved_tx:
-                    continue
-                article["potential_profit"] = article["reference_price"] - article["price"]
-                article["source"] = "minisite"  # Marquer la source
-                article["minisite_id"] = article.get("minisite_id")
-                
-                # Marquer comme vendeur tiers (créé par un user minisite, pas admin)
-                article["is_third_party"] = True
-                article["vendor"] = await _build_vendor_info(minisite)
-                
-                # Enrichir avec les infos du vendeur (propriétaire du minisite)
-                user_id = minisite.get("user_id")
-                if user_id:
-                    seller_user = await db.users.find_one({"id": user_id}, {"_id": 0, "email": 1, "first_name": 1, "last_name": 1})
-                    if seller_user:
-                        article["posted_by_info"] = {
-                            "id": user_id,
-                            "username": seller_user.get("email", "").split("@")[0],
-                            "name": f"{seller_user.get('first_name', '')} {seller_user.get('last_name', '')}".strip() or seller_user.get("email", "").split("@")[0] or minisite.get("site_name", "Vendeur")
-                        }
-                
-                # Ajouter le discord_tag si présent dans l'article
-                # (déjà dans l'article depuis le modèle)
-                
-                if search:
-                    # Filtrer par recherche si nécessaire
-                    search_lower = search.lower()
-                    if search_lower not in article.get("name", "").lower() and search_lower not in article.get("description", "").lower():
-                        continue
-                all_articles.append(article)
+        articles, next_cursor = split_page(articles, page_limit, sort_field)
+    else:
+        articles = await fetch_reseller_catalog(db, search=search, skip=skip, limit=page_limit)
+        next_cursor = None
     
-    # Trier par date de création (plus récent en premier)
-    all_articles.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+    general_articles = []
+    minisite_articles = []
+    minisites = {}
+    for article in articles:
+        article["potential_profit"] = article["reference_price"] - article["price"]
+        minisite = article.pop("_minisite", None)
+        if minisite is not None:
+            minisites[minisite["id"]] = minisite
+            minisite_articles.append(article)
+        else:
+            article["source"] = "general"  # Marquer la source
+            general_articles.append(article)
+    
+    # Enrichir avec les infos posted_by si présent (une requête pour toute la page)
+    posted_by_users = await fetch_by_ids(
+        db.users,
+        [article.get("posted_by") for article in general_articles],
+        VENDOR_USER_FIELDS
+    )
+    for article in general_articles:
+        posted_by_user = posted_by_users.get(article.get("posted_by"))
+        if posted_by_user:
+            article["posted_by_info"] = build_posted_by_info(article["posted_by"], posted_by_user)
     
-    # Appliquer pagination
-    paginated_articles = all_articles[skip:skip + limit]
+    await enrich_minisite_articles(db, minisite_articles, minisites, include_posted_by=True)
+    await attach_photo_variants(db, articles)
     
-    return paginated_articles
+    if cursor is not None:
+        return {"items": articles, "next_cursor": next_cursor}
+    return articles
 
 @api_router.post("/seller/sales", dependencies=[Depends(require_roles([UserRole.SELLER, UserRole.ADMIN]))])
 async def create_seller_sale(
@@ -1305,7 +1100,7 @@ async def create_seller_sale(
             detail="Le bordereau d'expédition est obligatoire. Veuillez uploader une image du bordereau."
         )
     
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     article = await db.articles.find_one({"id": sale_data.article_id}, {"_id": 0})
     
     if not article:
@@ -1369,7 +1164,7 @@ async def create_seller_sale(
 
 @api_router.get("/seller/sales", dependencies=[Depends(require_roles([UserRole.SELLER, UserRole.ADMIN]))])
 async def get_seller_sales(current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     query = {}
     if UserRole.ADMIN not in current_user.roles:
@@ -1381,7 +1176,7 @@ async def get_seller_sales(current_user = Depends(get_current_user)):
 
 @api_router.get("/seller/stats", dependencies=[Depends(require_roles([UserRole.SELLER, UserRole.ADMIN]))])
 async def get_seller_stats(current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     query = {"seller_id": user_doc["id"]}
     
@@ -1423,7 +1218,7 @@ async def create_seller_article(article_data: ArticleCreate, current_user = Depe
     Permet aux sellers S_PLAN_3 de créer des articles B2B.
     Le champ discord_contact est obligatoire pour S_PLAN_3.
     """
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -1485,8 +1280,10 @@ async def create_seller_article(article_data: ArticleCreate, current_user = Depe
         "posted_by": user_doc["id"],
         "is_third_party": is_third_party
     }
+    article_doc.update(search_fields(article_doc["name"], article_doc["description"]))
     
     await db.articles.insert_one(article_doc)
+    await adjust_photo_refs(db, [], article_doc["photos"])
     
     return Article(**article_doc)
 
@@ -1512,8 +1309,10 @@ async def create_article(article_data: ArticleCreate):
         "posted_by": None,  # Admin n'a pas de posted_by
         "is_third_party": False  # Admin n'est jamais vendeur tiers
     }
+    article_doc.update(search_fields(article_doc["name"], article_doc["description"]))
     
     await db.articles.insert_one(article_doc)
+    await adjust_photo_refs(db, [], article_doc["photos"])
     
     return Article(**article_doc)
 
@@ -1524,10 +1323,13 @@ async def update_article(article_id: str, article_data: ArticleCreate):
     if not article:
         raise HTTPException(status_code=404, detail="Article non trouvé")
     
+    update_data = article_data.model_dump()
+    update_data.update(search_fields(article_data.name, article_data.description))
     await db.articles.update_one(
         {"id": article_id},
-        {"$set": article_data.model_dump()}
+        {"$set": update_data}
     )
+    await adjust_photo_refs(db, article.get("photos"), update_data["photos"])
     
     return {"success": True, "message": "Article mis à jour"}
 
@@ -1919,13 +1721,7 @@ async def admin_request_deposit(
 
 @api_router.get("/admin/settings", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def admin_get_all_settings():
-    settings = await db.settings.find({}, {"_id": 0}).to_list(1000)
-    
-    settings_dict = {}
-    for setting in settings:
-        settings_dict[setting["key"]] = setting["value"]
-    
-    return settings_dict
+    return await settings_cache.all(db)
 
 @api_router.put("/admin/settings/{key}", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def admin_update_setting(key: str, data: dict):
@@ -1934,18 +1730,7 @@ async def admin_update_setting(key: str, data: dict):
     if value is None:
         raise HTTPException(status_code=400, detail="Valeur requise")
     
-    existing = await db.settings.find_one({"key": key}, {"_id": 0})
-    
-    if existing:
-        await db.settings.update_one(
-            {"key": key},
-            {"$set": {"value": value}}
-        )
-    else:
-        await db.settings.insert_one({
-            "key": key,
-            "value": value
-        })
+    await settings_cache.set(db, key, value)
     
     return {"success": True, "message": f"Paramètre {key} mis à jour"}
 
@@ -2009,7 +1794,7 @@ async def create_marketplace_transaction(
     payload: MarketplaceTransactionCreate,
     current_user = Depends(get_current_user)
 ):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
@@ -2063,65 +1848,61 @@ async def create_marketplace_transaction(
     
     return transaction_doc
 
-@api_router.get("/marketplace/transactions/my", dependencies=[Depends(get_current_user)])
-async def get_my_marketplace_transactions(
-    role: str = Query("buyer"),
-    article_id: Optional[str] = None,
-    current_user = Depends(get_current_user)
-):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
-    if not user_doc:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    
-    if role not in ["buyer", "seller"]:
-        raise HTTPException(status_code=400, detail="Rôle invalide")
-    
-    query = {"buyer_user_id": user_doc.get("id")} if role == "buyer" else {"seller_user_id": user_doc.get("id")}
-    if article_id:
-        query["article_id"] = article_id
-    
-    transactions = await db.marketplace_transactions.find(query, {"_id": 0}).sort("created_at", -1).to_list(200)
+async def _enrich_marketplace_transactions(transactions: List[dict]) -> List[dict]:
+    """
+    Ajoute article, mini-site, acheteur/vendeur et état des avis à une page de
+    transactions. Chaque collection n'est interrogée qu'une fois pour toute la page.
+    """
+    if not transactions:
+        return transactions
     
-    enriched = []
+    articles = await fetch_by_ids(
+        db.minisite_articles,
+        [tx.get("article_id") for tx in transactions],
+        {"_id": 0, "id": 1, "name": 1, "price": 1, "reference_price": 1, "photos": 1, "platform_links": 1, "minisite_id": 1, "discord_tag": 1, "status": 1}
+    )
+    minisite_ids = []
     for tx in transactions:
-        article = await db.minisite_articles.find_one(
-            {"id": tx.get("article_id")},
-            {"_id": 0, "id": 1, "name": 1, "price": 1, "reference_price": 1, "photos": 1, "platform_links": 1, "minisite_id": 1, "discord_tag": 1, "status": 1}
-        )
-        minisite = await db.minisites.find_one(
-            {"id": tx.get("seller_minisite_id") or (article.get("minisite_id") if article else None)},
-            {"_id": 0, "id": 1, "site_name": 1, "slug": 1, "logo_url": 1, "rating_avg": 1, "rating_count": 1, "sales_count": 1, "show_reviews": 1}
-        )
-        buyer_user = await db.users.find_one(
-            {"id": tx.get("buyer_user_id")},
-            {"_id": 0, "id": 1, "email": 1, "first_name": 1, "last_name": 1, "rating_avg": 1, "rating_count": 1}
-        )
-        seller_user = await db.users.find_one(
-            {"id": tx.get("seller_user_id")},
-            {"_id": 0, "id": 1, "email": 1, "first_name": 1, "last_name": 1, "rating_avg": 1, "rating_count": 1}
-        )
-        
-        buyer_completed_count = await db.marketplace_transactions.count_documents(
-            {"buyer_user_id": tx.get("buyer_user_id"), "status": "completed"}
-        )
-        
-        buyer_review = await db.reviews.find_one(
-            {"transaction_id": tx.get("id"), "from_user_id": tx.get("buyer_user_id")},
-            {"_id": 0, "id": 1}
-        )
-        seller_review = await db.reviews.find_one(
-            {"transaction_id": tx.get("id"), "from_user_id": tx.get("seller_user_id")},
-            {"_id": 0, "id": 1}
-        )
+        article = articles.get(tx.get("article_id"))
+        minisite_ids.append(tx.get("seller_minisite_id") or (article.get("minisite_id") if article else None))
+    minisites = await fetch_by_ids(
+        db.minisites,
+        minisite_ids,
+        {"_id": 0, "id": 1, "site_name": 1, "slug": 1, "logo_url": 1, "rating_avg": 1, "rating_count": 1, "sales_count": 1, "show_reviews": 1}
+    )
+    buyer_ids = [tx.get("buyer_user_id") for tx in transactions]
+    users = await fetch_by_ids(
+        db.users,
+        buyer_ids + [tx.get("seller_user_id") for tx in transactions],
+        {"_id": 0, "id": 1, "email": 1, "first_name": 1, "last_name": 1, "rating_avg": 1, "rating_count": 1}
+    )
+    
+    completed_counts = {}
+    async for row in db.marketplace_transactions.aggregate([
+        {"$match": {"buyer_user_id": {"$in": list({bid for bid in buyer_ids if bid})}, "status": "completed"}},
+        {"$group": {"_id": "$buyer_user_id", "count": {"$sum": 1}}},
+    ]):
+        completed_counts[row["_id"]] = row["count"]
+    
+    reviewed = set()
+    async for review in db.reviews.find(
+        {"transaction_id": {"$in": [tx.get("id") for tx in transactions]}},
+        {"_id": 0, "transaction_id": 1, "from_user_id": 1}
+    ):
+        reviewed.add((review.get("transaction_id"), review.get("from_user_id")))
+    
+    for tx, minisite_id in zip(transactions, minisite_ids):
+        buyer_user = users.get(tx.get("buyer_user_id"))
+        seller_user = users.get(tx.get("seller_user_id"))
         
-        tx["article"] = article
-        tx["minisite"] = minisite
+        tx["article"] = articles.get(tx.get("article_id"))
+        tx["minisite"] = minisites.get(minisite_id)
         tx["buyer"] = {
             "id": buyer_user.get("id") if buyer_user else None,
             "name": f"{buyer_user.get('first_name', '')} {buyer_user.get('last_name', '')}".strip() if buyer_user else "Revendeur",
             "rating_avg": buyer_user.get("rating_avg", 0) if buyer_user else 0,
             "rating_count": buyer_user.get("rating_count", 0) if buyer_user else 0,
-            "completed_transactions": buyer_completed_count,
+            "completed_transactions": completed_counts.get(tx.get("buyer_user_id"), 0),
             "avatar": buyer_user.get("avatar_url") if buyer_user else None
         }
         tx["seller"] = {
@@ -2131,11 +1912,42 @@ async def get_my_marketplace_transactions(
             "rating_count": seller_user.get("rating_count", 0) if seller_user else 0,
             "avatar": seller_user.get("avatar_url") if seller_user else None
         }
-        tx["buyer_reviewed"] = buyer_review is not None
-        tx["seller_reviewed"] = seller_review is not None
-        enriched.append(tx)
+        tx["buyer_reviewed"] = (tx.get("id"), tx.get("buyer_user_id")) in reviewed
+        tx["seller_reviewed"] = (tx.get("id"), tx.get("seller_user_id")) in reviewed
     
-    return enriched
+    return transactions
+
+@api_router.get("/marketplace/transactions/my", dependencies=[Depends(get_current_user)])
+async def get_my_marketplace_transactions(
+    role: str = Query("buyer"),
+    article_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_CURSOR_LIMIT, ge=1, le=MAX_CURSOR_LIMIT),
+    current_user = Depends(get_current_user)
+):
+    """
+    Transactions marketplace de l'utilisateur (côté acheteur ou vendeur).
+    Avec `cursor` (vide pour la première page), retourne {"items", "next_cursor"}.
+    """
+    user_doc = await user_cache.get_by_email(db, current_user.email)
+    if not user_doc:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    
+    if role not in ["buyer", "seller"]:
+        raise HTTPException(status_code=400, detail="Rôle invalide")
+    
+    query = {"buyer_user_id": user_doc.get("id")} if role == "buyer" else {"seller_user_id": user_doc.get("id")}
+    if article_id:
+        query["article_id"] = article_id
+    
+    if cursor is not None:
+        transactions, next_cursor = await paginate_keyset(
+            db.marketplace_transactions, query, {"_id": 0}, cursor, limit
+        )
+        return {"items": await _enrich_marketplace_transactions(transactions), "next_cursor": next_cursor}
+    
+    transactions = await db.marketplace_transactions.find(query, {"_id": 0}).sort("created_at", -1).to_list(200)
+    return await _enrich_marketplace_transactions(transactions)
 
 @api_router.patch("/marketplace/transactions/{transaction_id}/accept", dependencies=[Depends(get_current_user)])
 async def accept_marketplace_transaction(
@@ -2144,7 +1956,7 @@ async def accept_marketplace_transaction(
     payload: dict = Body(...),
     current_user = Depends(get_current_user)
 ):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
@@ -2215,7 +2027,7 @@ async def confirm_marketplace_transaction(
     payload: dict = Body(...),
     current_user = Depends(get_current_user)
 ):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
@@ -2271,7 +2083,7 @@ async def create_review(
     review_data: ReviewCreate,
     current_user = Depends(get_current_user)
 ):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
@@ -2330,6 +2142,7 @@ async def create_review(
             {"id": to_user_id},
             {"$set": {"rating_avg": new_avg}, "$inc": {"rating_count": 1}}
         )
+        user_cache.invalidate(user_id=to_user_id)
     
     if to_minisite_id:
         target_site = await db.minisites.find_one({"id": to_minisite_id}, {"_id": 0, "rating_avg": 1, "rating_count": 1})
@@ -2343,11 +2156,42 @@ async def create_review(
     
     return review_doc
 
+async def _attach_review_authors(reviews: List[dict]) -> None:
+    authors = await fetch_by_ids(
+        db.users,
+        [review.get("from_user_id") for review in reviews],
+        {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+    )
+    for review in reviews:
+        author = authors.get(review.get("from_user_id"))
+        review["from_user"] = {
+            "id": author.get("id") if author else None,
+            "name": f"{author.get('first_name', '')} {author.get('last_name', '')}".strip() if author else "Utilisateur"
+        }
+
+async def _list_public_reviews(query: dict, skip: int, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Page d'avis publics. En mode curseur (`cursor` renseigné), le total n'est pas
+    recalculé et la réponse contient `next_cursor`.
+    """
+    if cursor is not None:
+        reviews, next_cursor = await paginate_keyset(db.reviews, query, {"_id": 0}, cursor, min(limit, MAX_CURSOR_LIMIT))
+        await _attach_review_authors(reviews)
+        return {"items": reviews, "total": None, "next_cursor": next_cursor}
+    
+    reviews, total = await asyncio.gather(
+        db.reviews.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit),
+        db.reviews.count_documents(query)
+    )
+    await _attach_review_authors(reviews)
+    return {"items": reviews, "total": total}
+
 @api_router.get("/reviews/minisite/{minisite_id}")
 async def get_minisite_reviews(
     minisite_id: str,
-    skip: int = 0,
-    limit: int = 10
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1),
+    cursor: Optional[str] = None
 ):
     minisite = await db.minisites.find_one({"id": minisite_id}, {"_id": 0, "show_reviews": 1})
     if not minisite:
@@ -2355,43 +2199,18 @@ async def get_minisite_reviews(
     if not minisite.get("show_reviews", True):
         return {"items": [], "total": 0, "hidden": True}
     
-    reviews = await db.reviews.find(
-        {"to_minisite_id": minisite_id, "visibility": "public"},
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    
-    total = await db.reviews.count_documents({"to_minisite_id": minisite_id, "visibility": "public"})
-    
-    for review in reviews:
-        author = await db.users.find_one({"id": review.get("from_user_id")}, {"_id": 0, "first_name": 1, "last_name": 1, "email": 1})
-        review["from_user"] = {
-            "id": author.get("id") if author else None,
-            "name": f"{author.get('first_name', '')} {author.get('last_name', '')}".strip() if author else "Utilisateur"
-        }
-    
-    return {"items": reviews, "total": total, "hidden": False}
+    result = await _list_public_reviews({"to_minisite_id": minisite_id, "visibility": "public"}, skip, limit, cursor)
+    result["hidden"] = False
+    return result
 
 @api_router.get("/reviews/user/{user_id}")
 async def get_user_reviews(
     user_id: str,
-    skip: int = 0,
-    limit: int = 10
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1),
+    cursor: Optional[str] = None
 ):
-    reviews = await db.reviews.find(
-        {"to_user_id": user_id, "visibility": "public"},
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    
-    total = await db.reviews.count_documents({"to_user_id": user_id, "visibility": "public"})
-    
-    for review in reviews:
-        author = await db.users.find_one({"id": review.get("from_user_id")}, {"_id": 0, "first_name": 1, "last_name": 1, "email": 1})
-        review["from_user"] = {
-            "id": author.get("id") if author else None,
-            "name": f"{author.get('first_name', '')} {author.get('last_name', '')}".strip() if author else "Utilisateur"
-        }
-    
-    return {"items": reviews, "total": total}
+    return await _list_public_reviews({"to_user_id": user_id, "visibility": "public"}, skip, limit, cursor)
 
 @api_router.get("/ratings/minisite/{minisite_id}")
 async def get_minisite_ratings(minisite_id: str):
@@ -2431,7 +2250,7 @@ async def create_minisite(
     current_user = Depends(get_current_user)
 ):
     
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     # Vérifier que le slug n'existe pas déjà
     existing = await db.minisites.find_one({"slug": site_data.slug}, {"_id": 0})
@@ -2494,6 +2313,7 @@ async def create_minisite(
     if final_plan_id not in roles:
         roles.append(final_plan_id)
         await db.users.update_one({"id": user_doc["id"]}, {"$set": {"roles": roles}})
+        user_cache.invalidate(email=current_user.email)
     
     # Notification admin : nouveau mini-site
     try:
@@ -2537,7 +2357,7 @@ async def create_minisite(
 
 @api_router.get("/minisites/my", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN]))])
 async def get_my_minisite(current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     minisite = await db.minisites.find_one({"user_id": user_doc["id"]}, {"_id": 0})
     
     if not minisite:
@@ -2558,8 +2378,9 @@ async def get_minisite_by_slug(slug: str):
     # Récupérer les articles du mini-site par minisite_id (pas par liste d'ids)
     articles = await db.minisite_articles.find(
         {"minisite_id": minisite["id"], "status": {"$nin": ["suspended", "sold"]}}, 
-        {"_id": 0}
+        {"_id": 0, **SEARCH_FIELDS_EXCLUDED}
     ).to_list(100)
+    await attach_photo_variants(db, articles)
     
     minisite["articles_data"] = articles
     
@@ -2567,7 +2388,7 @@ async def get_minisite_by_slug(slug: str):
 
 @api_router.put("/minisites/{site_id}", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN]))])
 async def update_minisite(site_id: str, updates: dict, current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     minisite = await db.minisites.find_one({"id": site_id}, {"_id": 0})
     
     if not minisite:
@@ -2632,7 +2453,7 @@ async def update_minisite(site_id: str, updates: dict, current_user = Depends(ge
 @api_router.post("/minisites/{site_id}/articles", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN]))])
 async def add_minisite_article(site_id: str, article_data: MiniSiteArticleCreate, current_user = Depends(get_current_user)):
     
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     minisite = await db.minisites.find_one({"id": site_id}, {"_id": 0})
     
     if not minisite:
@@ -2675,8 +2496,10 @@ async def add_minisite_article(site_id: str, article_data: MiniSiteArticleCreate
         "discord_tag": article_data.discord_tag,
         "created_at": now
     }
+    article_doc.update(search_fields(article_doc["name"], article_doc["description"]))
     
     await db.minisite_articles.insert_one(article_doc)
+    await adjust_photo_refs(db, [], article_doc["photos"])
     
     # Ajouter l'article à la liste du mini-site
     articles_list = minisite.get("articles", [])
@@ -2687,7 +2510,7 @@ async def add_minisite_article(site_id: str, article_data: MiniSiteArticleCreate
 
 @api_router.get("/minisites/{site_id}/articles", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN]))])
 async def get_minisite_articles(site_id: str, current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     minisite = await db.minisites.find_one({"id": site_id}, {"_id": 0})
     
     if not minisite:
@@ -2696,14 +2519,15 @@ async def get_minisite_articles(site_id: str, current_user = Depends(get_current
     if "ADMIN" not in user_doc.get("roles", []) and minisite["user_id"] != user_doc["id"]:
         raise HTTPException(status_code=403, detail="Non autorisé")
     
-    articles = await db.minisite_articles.find({"minisite_id": site_id}, {"_id": 0}).to_list(100)
+    articles = await db.minisite_articles.find({"minisite_id": site_id}, {"_id": 0, **SEARCH_FIELDS_EXCLUDED}).to_list(100)
+    await attach_photo_variants(db, articles)
     
     return articles
 
 @api_router.put("/minisites/{site_id}/articles/{article_id}", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN]))])
 async def update_minisite_article(site_id: str, article_id: str, article_data: MiniSiteArticleCreate, current_user = Depends(get_current_user)):
     """Mettre à jour un article de mini-site"""
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     minisite = await db.minisites.find_one({"id": site_id}, {"_id": 0})
     
     if not minisite:
@@ -2731,6 +2555,7 @@ async def update_minisite_article(site_id: str, article_id: str, article_data: M
         "contact_email": article_data.contact_email,
         "discord_tag": article_data.discord_tag
     }
+    update_data.update(search_fields(article_data.name, article_data.description))
     
     result = await db.minisite_articles.update_one(
         {"id": article_id, "minisite_id": site_id},
@@ -2739,15 +2564,16 @@ async def update_minisite_article(site_id: str, article_id: str, article_data: M
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Article non trouvé ou aucune modification")
+    await adjust_photo_refs(db, existing_article.get("photos"), update_data["photos"])
     
     # Récupérer l'article mis à jour
-    updated_article = await db.minisite_articles.find_one({"id": article_id, "minisite_id": site_id}, {"_id": 0})
+    updated_article = await db.minisite_articles.find_one({"id": article_id, "minisite_id": site_id}, {"_id": 0, **SEARCH_FIELDS_EXCLUDED})
     
     return {"success": True, "article": MiniSiteArticle(**updated_article)}
 
 @api_router.delete("/minisites/{site_id}/articles/{article_id}", dependencies=[Depends(require_roles([UserRole.CLIENT, UserRole.ADMIN]))])
 async def delete_minisite_article(site_id: str, article_id: str, current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     minisite = await db.minisites.find_one({"id": site_id}, {"_id": 0})
     
     if not minisite:
@@ -2756,7 +2582,12 @@ async def delete_minisite_article(site_id: str, article_id: str, current_user =
     if "ADMIN" not in user_doc.get("roles", []) and minisite["user_id"] != user_doc["id"]:
         raise HTTPException(status_code=403, detail="Non autorisé")
     
-    await db.minisite_articles.delete_one({"id": article_id, "minisite_id": site_id})
+    deleted = await db.minisite_articles.find_one_and_delete(
+        {"id": article_id, "minisite_id": site_id},
+        projection={"_id": 0, "photos": 1}
+    )
+    if deleted:
+        await adjust_photo_refs(db, deleted.get("photos"), [])
     
     # Retirer de la liste
     articles_list = minisite.get("articles", [])
@@ -2798,6 +2629,7 @@ async def admin_update_minisite_status(site_id: str, data: dict = Body(...)):
                     {"id": user["id"]},
                     {"$set": {"roles": new_roles}}
                 )
+                user_cache.invalidate(email=user.get("email"), user_id=user["id"])
     
     result = await db.minisites.update_one(
         {"id": site_id},
@@ -2816,7 +2648,7 @@ async def admin_get_minisite_detail(site_id: str):
         raise HTTPException(status_code=404, detail="Mini-site non trouvé")
     
     # Récupérer les articles du mini-site
-    articles = await db.minisite_articles.find({"minisite_id": site_id}, {"_id": 0}).to_list(100)
+    articles = await db.minisite_articles.find({"minisite_id": site_id}, {"_id": 0, **SEARCH_FIELDS_EXCLUDED}).to_list(100)
     minisite["articles"] = articles
     
     # Récupérer info utilisateur
@@ -2826,13 +2658,32 @@ async def admin_get_minisite_detail(site_id: str):
     return minisite
 
 @api_router.get("/admin/minisite-articles", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
-async def admin_get_all_minisite_articles():
-    """Liste tous les articles de tous les mini-sites pour modération"""
-    articles = await db.minisite_articles.find({}, {"_id": 0}).to_list(1000)
+async def admin_get_all_minisite_articles(search: Optional[str] = None):
+    """
+    Liste tous les articles de tous les mini-sites pour modération.
+    Avec `search`, seuls les articles correspondants sont renvoyés, par pertinence.
+    """
+    projection = {"_id": 0, **SEARCH_FIELDS_EXCLUDED}
+    search_query = SearchQuery(search)
+    if search_query:
+        articles = await db.minisite_articles.aggregate([
+            {"$match": search_query.filter()},
+            {"$addFields": {"search_score": search_query.score_expression()}},
+            {"$sort": {"search_score": -1, "created_at": -1}},
+            {"$limit": 1000},
+            {"$project": projection},
+        ]).to_list(1000)
+    else:
+        articles = await db.minisite_articles.find({}, projection).to_list(1000)
     
-    # Enrichir avec les infos du mini-site
+    # Enrichir avec les infos du mini-site (une requête pour toute la liste)
+    minisites = await fetch_by_ids(
+        db.minisites,
+        [article.get("minisite_id") for article in articles],
+        {"_id": 0, "id": 1, "site_name": 1, "user_email": 1, "status": 1}
+    )
     for article in articles:
-        minisite = await db.minisites.find_one({"id": article.get("minisite_id")}, {"_id": 0, "site_name": 1, "user_email": 1, "status": 1})
+        minisite = minisites.get(article.get("minisite_id"))
         if minisite:
             article["minisite_name"] = minisite.get("site_name")
             article["minisite_email"] = minisite.get("user_email")
@@ -2878,6 +2729,7 @@ async def admin_delete_minisite(site_id: str, data: dict = Body(...)):
             {"id": user["id"]},
             {"$set": {"roles": new_roles}}
         )
+        user_cache.invalidate(email=user.get("email"), user_id=user["id"])
     
     # Marquer comme supprimé (soft delete)
     await db.minisites.update_one(
@@ -2892,7 +2744,17 @@ async def admin_delete_minisite(site_id: str, data: dict = Body(...)):
     return {"success": True, "message": "Mini-site supprimé"}
 
 @api_router.get("/admin/users", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
-async def get_all_users():
+async def get_all_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_CURSOR_LIMIT, ge=1, le=MAX_CURSOR_LIMIT)
+):
+    """
+    Liste des utilisateurs. Avec `cursor` (vide pour la première page), liste
+    paginée sans limite de volume : {"items", "next_cursor"}.
+    """
+    if cursor is not None:
+        users, next_cursor = await paginate_keyset(db.users, {}, {"_id": 0, "password_hash": 0}, cursor, limit)
+        return {"items": users, "next_cursor": next_cursor}
     users = await db.users.find({}, {"_id": 0, "password_hash": 0}).to_list(1000)
     return users
 
@@ -2924,6 +2786,7 @@ async def update_user_roles(user_id: str, roles: List[str]):
         {"id": user_id},
         {"$set": {"roles": roles}}
     )
+    user_cache.invalidate(user_id=user_id)
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -2946,8 +2809,12 @@ async def delete_user(user_id: str):
         # 1. Supprimer les mini-sites et leurs articles
         minisites = await db.minisites.find({"user_id": user_id}, {"_id": 0, "id": 1}).to_list(1000)
         for minisite in minisites:
-            # Supprimer les articles du mini-site
+            # Supprimer les articles du mini-site (et libérer leurs photos)
+            site_articles = await db.minisite_articles.find(
+                {"minisite_id": minisite["id"]}, {"_id": 0, "photos": 1}
+            ).to_list(None)
             await db.minisite_articles.delete_many({"minisite_id": minisite["id"]})
+            await adjust_photo_refs(db, [url for doc in site_articles for url in doc.get("photos") or []], [])
             # Supprimer le mini-site
             await db.minisites.delete_one({"id": minisite["id"]})
         
@@ -2965,6 +2832,7 @@ async def delete_user(user_id: str):
         
         # 6. Supprimer l'utilisateur lui-même
         await db.users.delete_one({"id": user_id})
+        user_cache.invalidate(email=user_email, user_id=user_id)
         
         logger.info(f"✅ Utilisateur {user_id} ({user_email}) supprimé définitivement avec toutes ses données")
         
@@ -2976,19 +2844,34 @@ async def delete_user(user_id: str):
 
 @api_router.get("/admin/settings", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def get_all_settings():
-    settings = await db.settings.find({}, {"_id": 0}).to_list(100)
-    return {s["key"]: s["value"] for s in settings}
+    return await settings_cache.all(db)
 
 @api_router.put("/admin/settings/{key}", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def update_setting(key: str, value: dict):
-    await db.settings.update_one(
-        {"key": key},
-        {"$set": {"key": key, "value": value.get("value")}},
-        upsert=True
-    )
+    await settings_cache.set(db, key, value.get("value"))
     
     return {"success": True, "message": f"Paramètre {key} mis à jour"}
 
+@api_router.get("/admin/notifications/outbox", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
+async def get_notification_outbox(
+    status: str = Query(OutboxStatus.DEAD, description="pending, sending, sent ou dead"),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """Emails de l'outbox par statut (par défaut : lettres mortes), sans le corps HTML"""
+    emails = await db[OUTBOX_COLLECTION].find(
+        {"status": status},
+        {"html_body": 0, "text_body": 0}
+    ).sort("created_at", -1).to_list(limit)
+    for email in emails:
+        email["id"] = email.pop("_id")
+    return emails
+
+@api_router.post("/admin/notifications/outbox/{email_id}/retry", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
+async def retry_notification_email(email_id: str):
+    if not await requeue_dead_letter(db, email_id):
+        raise HTTPException(status_code=404, detail="Email en échec non trouvé")
+    return {"success": True, "message": "Email remis en file d'envoi"}
+
 @api_router.put("/admin/sales/{sale_id}/status", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def update_sale_status(sale_id: str, status: dict):
     new_status = status.get("status")
@@ -3004,13 +2887,26 @@ async def update_sale_status(sale_id: str, status: dict):
     return {"success": True, "message": "Statut de vente mis à jour"}
 
 @api_router.get("/admin/demandes", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
-async def get_all_demandes():
+async def get_all_demandes(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_CURSOR_LIMIT, ge=1, le=MAX_CURSOR_LIMIT)
+):
+    if cursor is not None:
+        demandes, next_cursor = await paginate_keyset(db.demandes, {}, {"_id": 0}, cursor, limit)
+        return {"items": demandes, "next_cursor": next_cursor}
     demandes = await db.demandes.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
     return demandes
 
 @api_router.get("/admin/sales", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
-async def get_all_sales():
-    sales = await db.seller_sales.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+async def get_all_sales(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_CURSOR_LIMIT, ge=1, le=MAX_CURSOR_LIMIT)
+):
+    next_cursor = None
+    if cursor is not None:
+        sales, next_cursor = await paginate_keyset(db.seller_sales, {}, {"_id": 0}, cursor, limit)
+    else:
+        sales = await db.seller_sales.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
     seller_ids = list({sale.get("seller_id") for sale in sales if sale.get("seller_id")})
     sellers_map = {}
     if seller_ids:
@@ -3027,6 +2923,8 @@ async def get_all_sales():
             sale["seller_display_name"] = (
                 f"{seller.get('first_name', '').strip()} {seller.get('last_name', '').strip()}"
             ).strip() or None
+    if cursor is not None:
+        return {"items": sales, "next_cursor": next_cursor}
     return sales
 
 @api_router.get("/admin/sales/{sale_id}", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
@@ -3086,7 +2984,7 @@ async def reject_sale(sale_id: str, data: dict):
 
 @api_router.post("/seller/sales/{sale_id}/submit-payment", dependencies=[Depends(require_roles([UserRole.SELLER, UserRole.ADMIN]))])
 async def submit_payment_proof(sale_id: str, data: dict, current_user = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     sale = await db.seller_sales.find_one({"id": sale_id}, {"_id": 0})
     
@@ -3189,7 +3087,7 @@ async def get_seller_sale_detail(sale_id: str, current_user = Depends(get_curren
     if not sale:
         raise HTTPException(status_code=404, detail="Vente non trouvée")
     
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     
     if sale["seller_id"] != user_doc["id"] and UserRole.ADMIN not in current_user.roles:
         raise HTTPException(status_code=403, detail="Accès interdit")
@@ -3214,16 +3112,143 @@ def _sale_timestamp(sale: dict) -> str:
     return sale.get("updated_at") or sale.get("created_at") or ""
 
 
+def _transaction_timestamp(tx: dict) -> str:
+    return tx.get("completed_at") or tx.get("created_at") or ""
+
+
+async def _latest_completed_sales(article_ids: List[str]) -> Dict[str, dict]:
+    """Dernière vente terminée de chaque article du lot."""
+    sales_map: Dict[str, dict] = {}
+    if not article_ids:
+        return sales_map
+    cursor = db.seller_sales.find(
+        {"article_id": {"$in": article_ids}, "status": SaleStatus.COMPLETED},
+        {"_id": 0, "article_id": 1, "sale_price": 1, "updated_at": 1, "created_at": 1}
+    )
+    async for sale in cursor:
+        article_id = sale.get("article_id")
+        if not article_id:
+            continue
+        existing = sales_map.get(article_id)
+        if not existing or _sale_timestamp(sale) > _sale_timestamp(existing):
+            sales_map[article_id] = sale
+    return sales_map
+
+
+async def _latest_completed_transactions(article_ids: List[str]) -> Dict[str, dict]:
+    """Dernière transaction marketplace terminée de chaque article minisite du lot."""
+    transaction_map: Dict[str, dict] = {}
+    if not article_ids:
+        return transaction_map
+    cursor = db.marketplace_transactions.find(
+        {"article_id": {"$in": article_ids}, "status": "completed"},
+        {"_id": 0, "article_id": 1, "completed_at": 1, "created_at": 1}
+    )
+    async for tx in cursor:
+        article_id = tx.get("article_id")
+        if not article_id:
+            continue
+        existing = transaction_map.get(article_id)
+        if not existing or _transaction_timestamp(tx) > _transaction_timestamp(existing):
+            transaction_map[article_id] = tx
+    return transaction_map
+
+
+async def _users_by_id(user_ids, projection: dict) -> Dict[str, dict]:
+    user_ids = [user_id for user_id in set(user_ids) if user_id]
+    if not user_ids:
+        return {}
+    users = await db.users.find({"id": {"$in": user_ids}}, projection).to_list(len(user_ids))
+    return {u.get("id"): u for u in users if u.get("id")}
+
+
+async def _category_names() -> Dict[str, str]:
+    categories = await db.categories.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(1000)
+    return {c["id"]: c["name"] for c in categories if c.get("id")}
+
+
+class _StatusSheets:
+    """Feuilles Tous / Vendus / Non vendus remplies dans la même passe."""
+
+    def __init__(self, writer, titles: Tuple[str, str, str], columns: List[str]):
+        self.writer = writer
+        self.all_rows = writer.add_sheet(titles[0], columns)
+        self.sold_rows = writer.add_sheet(titles[1], columns)
+        self.available_rows = writer.add_sheet(titles[2], columns)
+
+    async def write(self, rows: List[dict]) -> None:
+        await self.writer.write_rows(self.all_rows, rows)
+        await self.writer.write_rows(self.sold_rows, [r for r in rows if r["status"] == "SOLD"])
+        await self.writer.write_rows(self.available_rows, [r for r in rows if r["status"] == "AVAILABLE"])
+
+
+ARTICLE_EXPORT_COLUMNS = [
+    "article_id",
+    "title",
+    "category",
+    "condition/state",
+    "purchase_price",
+    "listed_price",
+    "sold_price",
+    "status",
+    "created_at",
+    "sold_at",
+    "platform_links",
+]
+
+OWNER_EXPORT_COLUMNS = [
+    "user_id",
+    "first_name",
+    "last_name",
+    "email",
+    "roles",
+    "minisite_id",
+    "minisite_name",
+    "minisite_slug",
+]
+
+
+def _owner_cells(user: Optional[dict], minisite: Optional[dict] = None) -> dict:
+    return {
+        "user_id": user.get("id") if user else "",
+        "first_name": user.get("first_name") if user else "",
+        "last_name": user.get("last_name") if user else "",
+        "email": user.get("email") if user else "",
+        "roles": ", ".join(user.get("roles", [])) if user else "",
+        "minisite_id": minisite.get("id") if minisite else "",
+        "minisite_name": minisite.get("site_name") if minisite else "",
+        "minisite_slug": minisite.get("slug") if minisite else "",
+    }
+
+
+def _article_row(article: dict, category_map: Dict[str, str], sale: Optional[dict]) -> dict:
+    sold = article.get("status") == "sold" or article.get("stock", 1) <= 0
+    return {
+        "article_id": article.get("id"),
+        "title": article.get("name"),
+        "category": category_map.get(article.get("category_id"), article.get("category_id") or ""),
+        "condition/state": article.get("condition") or "",
+        "purchase_price": article.get("price"),
+        "listed_price": article.get("reference_price"),
+        "sold_price": sale.get("sale_price") if sale else "",
+        "status": "SOLD" if sold else "AVAILABLE",
+        "created_at": article.get("created_at"),
+        "sold_at": _sale_timestamp(sale) if sale else "",
+        "platform_links": format_platform_links(article.get("platform_links")),
+    }
+
+
 @api_router.get("/admin/exports/articles/me", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def export_admin_articles_me(
     background_tasks: BackgroundTasks,
     start: Optional[str] = None,
     end: Optional[str] = None,
+    format: str = Query("xlsx", pattern="^(xlsx|csv)$"),
     current_user = Depends(get_current_user)
 ):
     # Date filter applies to created_at for all articles (sold or not).
     start_dt, end_dt, start_str, end_str = parse_date_range(start, end)
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0, "id": 1})
+    user_doc = await user_cache.get_by_email(db, current_user.email, {"_id": 0, "id": 1})
 
     query = _date_range_query("created_at", start_dt, end_dt)
     query["$or"] = [
@@ -3232,313 +3257,139 @@ async def export_admin_articles_me(
         {"posted_by": {"$exists": False}}
     ]
 
-    articles = await db.articles.find(query, {"_id": 0}).to_list(100000)
-    article_ids = [a.get("id") for a in articles if a.get("id")]
-
-    categories = await db.categories.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(1000)
-    category_map = {c["id"]: c["name"] for c in categories if c.get("id")}
-
-    sales = []
-    if article_ids:
-        sales = await db.seller_sales.find(
-            {"article_id": {"$in": article_ids}, "status": SaleStatus.COMPLETED},
-            {"_id": 0, "article_id": 1, "sale_price": 1, "updated_at": 1, "created_at": 1}
-        ).to_list(100000)
-
-    sales_map: Dict[str, dict] = {}
-    for sale in sales:
-        article_id = sale.get("article_id")
-        if not article_id:
-            continue
-        ts = _sale_timestamp(sale)
-        existing = sales_map.get(article_id)
-        if not existing or ts > _sale_timestamp(existing):
-            sales_map[article_id] = sale
-
-    columns = [
-        "article_id",
-        "title",
-        "category",
-        "condition/state",
-        "purchase_price",
-        "listed_price",
-        "sold_price",
-        "status",
-        "created_at",
-        "sold_at",
-        "platform_links",
-    ]
+    category_map = await _category_names()
+    writer = open_export_writer(format)
+    try:
+        sheets = _StatusSheets(writer, ("Articles - Tous", "Articles - Vendus", "Articles - Non vendus"), ARTICLE_EXPORT_COLUMNS)
 
-    rows = []
-    for article in articles:
-        sale = sales_map.get(article.get("id"))
-        sold = article.get("status") == "sold" or article.get("stock", 1) <= 0
-        rows.append({
-            "article_id": article.get("id"),
-            "title": article.get("name"),
-            "category": category_map.get(article.get("category_id"), article.get("category_id") or ""),
-            "condition/state": article.get("condition") or "",
-            "purchase_price": article.get("price"),
-            "listed_price": article.get("reference_price"),
-            "sold_price": sale.get("sale_price") if sale else "",
-            "status": "SOLD" if sold else "AVAILABLE",
-            "created_at": article.get("created_at"),
-            "sold_at": _sale_timestamp(sale) if sale else "",
-            "platform_links": format_platform_links(article.get("platform_links")),
-        })
-
-    sheets = [
-        {"title": "Articles - Tous", "columns": columns, "rows": rows},
-        {"title": "Articles - Vendus", "columns": columns, "rows": [r for r in rows if r["status"] == "SOLD"]},
-        {"title": "Articles - Non vendus", "columns": columns, "rows": [r for r in rows if r["status"] == "AVAILABLE"]},
-    ]
+        async for articles in iter_batches(db.articles.find(query, {"_id": 0})):
+            sales_map = await _latest_completed_sales([a.get("id") for a in articles if a.get("id")])
+            await sheets.write([_article_row(a, category_map, sales_map.get(a.get("id"))) for a in articles])
 
-    xlsx_path = create_xlsx_file(sheets)
-    filename = build_filename("articles_me", start_str, end_str, "xlsx")
-    return stream_file_response(
-        xlsx_path,
-        filename,
-        background_tasks,
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+        path = await writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    filename = build_filename("articles_me", start_str, end_str, writer.extension)
+    return export_response(path, filename, background_tasks, format)
 
 
 @api_router.get("/admin/exports/articles/all", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def export_admin_articles_all(
     background_tasks: BackgroundTasks,
     start: Optional[str] = None,
-    end: Optional[str] = None
+    end: Optional[str] = None,
+    format: str = Query("xlsx", pattern="^(xlsx|csv)$")
 ):
     # Date filter applies to created_at for all articles (sold or not).
     start_dt, end_dt, start_str, end_str = parse_date_range(start, end)
+    date_query = _date_range_query("created_at", start_dt, end_dt)
+    user_projection = {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "email": 1, "roles": 1}
 
-    articles = await db.articles.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-    minisite_articles = await db.minisite_articles.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-
-    categories = await db.categories.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(1000)
-    category_map = {c["id"]: c["name"] for c in categories if c.get("id")}
-
-    posted_by_ids = {a.get("posted_by") for a in articles if a.get("posted_by")}
-    minisite_ids = {a.get("minisite_id") for a in minisite_articles if a.get("minisite_id")}
-
-    minisites = []
-    if minisite_ids:
-        minisites = await db.minisites.find(
-            {"id": {"$in": list(minisite_ids)}},
-            {"_id": 0, "id": 1, "user_id": 1, "site_name": 1, "slug": 1}
-        ).to_list(100000)
-
-    minisite_map = {m.get("id"): m for m in minisites if m.get("id")}
-    minisite_user_ids = {m.get("user_id") for m in minisites if m.get("user_id")}
-
-    user_ids = set(posted_by_ids) | set(minisite_user_ids)
-    users = []
-    if user_ids:
-        users = await db.users.find(
-            {"id": {"$in": list(user_ids)}},
-            {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "email": 1, "roles": 1}
-        ).to_list(len(user_ids))
-
-    user_map = {u.get("id"): u for u in users if u.get("id")}
-
-    article_ids = [a.get("id") for a in articles if a.get("id")]
-    sales = []
-    if article_ids:
-        sales = await db.seller_sales.find(
-            {"article_id": {"$in": article_ids}, "status": SaleStatus.COMPLETED},
-            {"_id": 0, "article_id": 1, "sale_price": 1, "updated_at": 1, "created_at": 1}
-        ).to_list(100000)
+    category_map = await _category_names()
+    writer = open_export_writer(format)
+    try:
+        sheets = _StatusSheets(writer, ("Tous", "Vendus", "Non vendus"), OWNER_EXPORT_COLUMNS + ARTICLE_EXPORT_COLUMNS)
 
-    sales_map: Dict[str, dict] = {}
-    for sale in sales:
-        article_id = sale.get("article_id")
-        if not article_id:
-            continue
-        ts = _sale_timestamp(sale)
-        existing = sales_map.get(article_id)
-        if not existing or ts > _sale_timestamp(existing):
-            sales_map[article_id] = sale
+        async for articles in iter_batches(db.articles.find(date_query, {"_id": 0})):
+            user_map = await _users_by_id((a.get("posted_by") for a in articles), user_projection)
+            sales_map = await _latest_completed_sales([a.get("id") for a in articles if a.get("id")])
+            await sheets.write([
+                {
+                    **_owner_cells(user_map.get(article.get("posted_by"))),
+                    **_article_row(article, category_map, sales_map.get(article.get("id"))),
+                }
+                for article in articles
+            ])
+
+        async for articles in iter_batches(db.minisite_articles.find(date_query, {"_id": 0})):
+            minisite_ids = list({a.get("minisite_id") for a in articles if a.get("minisite_id")})
+            minisites = await db.minisites.find(
+                {"id": {"$in": minisite_ids}},
+                {"_id": 0, "id": 1, "user_id": 1, "site_name": 1, "slug": 1}
+            ).to_list(len(minisite_ids)) if minisite_ids else []
+            minisite_map = {m.get("id"): m for m in minisites if m.get("id")}
+            user_map = await _users_by_id((m.get("user_id") for m in minisites), user_projection)
+            transaction_map = await _latest_completed_transactions([a.get("id") for a in articles if a.get("id")])
+
+            rows = []
+            for article in articles:
+                minisite = minisite_map.get(article.get("minisite_id"))
+                user = user_map.get(minisite.get("user_id")) if minisite else None
+                tx = transaction_map.get(article.get("id"))
+                rows.append({
+                    **_owner_cells(user, minisite),
+                    "article_id": article.get("id"),
+                    "title": article.get("name"),
+                    "category": "",
+                    "condition/state": article.get("condition") or "",
+                    "purchase_price": article.get("price"),
+                    "listed_price": article.get("reference_price"),
+                    "sold_price": "",
+                    "status": "SOLD" if article.get("status") == "sold" else "AVAILABLE",
+                    "created_at": article.get("created_at"),
+                    "sold_at": _transaction_timestamp(tx) if tx else "",
+                    "platform_links": format_platform_links(article.get("platform_links")),
+                })
+            await sheets.write(rows)
+
+        path = await writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    filename = build_filename("articles_all", start_str, end_str, writer.extension)
+    return export_response(path, filename, background_tasks, format)
 
-    minisite_article_ids = [a.get("id") for a in minisite_articles if a.get("id")]
-    transactions = []
-    if minisite_article_ids:
-        transactions = await db.marketplace_transactions.find(
-            {"article_id": {"$in": minisite_article_ids}, "status": "completed"},
-            {"_id": 0, "article_id": 1, "completed_at": 1, "created_at": 1}
-        ).to_list(100000)
 
-    transaction_map: Dict[str, dict] = {}
-    for tx in transactions:
-        article_id = tx.get("article_id")
-        if not article_id:
-            continue
-        ts = tx.get("completed_at") or tx.get("created_at") or ""
-        existing = transaction_map.get(article_id)
-        existing_ts = (existing.get("completed_at") or existing.get("created_at") or "") if existing else ""
-        if not existing or ts > existing_ts:
-            transaction_map[article_id] = tx
+async def _user_export_stats(user_ids: List[str]) -> Tuple[Dict[str, List[dict]], Dict[str, dict], Dict[str, int]]:
+    """Minisites, ventes terminées et nombre d'articles des utilisateurs du lot (agrégations)."""
+    minisites = await db.minisites.find(
+        {"user_id": {"$in": user_ids}},
+        {"_id": 0, "id": 1, "user_id": 1, "slug": 1}
+    ).to_list(None)
+    minisite_map: Dict[str, List[dict]] = {}
+    for site in minisites:
+        minisite_map.setdefault(site.get("user_id"), []).append(site)
 
-    columns = [
-        "user_id",
-        "first_name",
-        "last_name",
-        "email",
-        "roles",
-        "minisite_id",
-        "minisite_name",
-        "minisite_slug",
-        "article_id",
-        "title",
-        "category",
-        "condition/state",
-        "purchase_price",
-        "listed_price",
-        "sold_price",
-        "status",
-        "created_at",
-        "sold_at",
-        "platform_links",
-    ]
+    sales_map: Dict[str, dict] = {}
+    async for row in db.seller_sales.aggregate([
+        {"$match": {"seller_id": {"$in": user_ids}, "status": SaleStatus.COMPLETED}},
+        {"$group": {
+            "_id": "$seller_id",
+            "count": {"$sum": 1},
+            "revenue": {"$sum": {"$convert": {"input": "$sale_price", "to": "double", "onError": 0, "onNull": 0}}},
+        }},
+    ]):
+        sales_map[row["_id"]] = {"count": row["count"], "revenue": float(row["revenue"])}
 
-    rows = []
-    for article in articles:
-        user = user_map.get(article.get("posted_by"))
-        sale = sales_map.get(article.get("id"))
-        sold = article.get("status") == "sold" or article.get("stock", 1) <= 0
-        rows.append({
-            "user_id": user.get("id") if user else "",
-            "first_name": user.get("first_name") if user else "",
-            "last_name": user.get("last_name") if user else "",
-            "email": user.get("email") if user else "",
-            "roles": ", ".join(user.get("roles", [])) if user else "",
-            "minisite_id": "",
-            "minisite_name": "",
-            "minisite_slug": "",
-            "article_id": article.get("id"),
-            "title": article.get("name"),
-            "category": category_map.get(article.get("category_id"), article.get("category_id") or ""),
-            "condition/state": article.get("condition") or "",
-            "purchase_price": article.get("price"),
-            "listed_price": article.get("reference_price"),
-            "sold_price": sale.get("sale_price") if sale else "",
-            "status": "SOLD" if sold else "AVAILABLE",
-            "created_at": article.get("created_at"),
-            "sold_at": _sale_timestamp(sale) if sale else "",
-            "platform_links": format_platform_links(article.get("platform_links")),
-        })
-
-    for article in minisite_articles:
-        minisite = minisite_map.get(article.get("minisite_id"))
-        user = user_map.get(minisite.get("user_id")) if minisite else None
-        tx = transaction_map.get(article.get("id"))
-        sold = article.get("status") == "sold"
-        rows.append({
-            "user_id": user.get("id") if user else "",
-            "first_name": user.get("first_name") if user else "",
-            "last_name": user.get("last_name") if user else "",
-            "email": user.get("email") if user else "",
-            "roles": ", ".join(user.get("roles", [])) if user else "",
-            "minisite_id": minisite.get("id") if minisite else "",
-            "minisite_name": minisite.get("site_name") if minisite else "",
-            "minisite_slug": minisite.get("slug") if minisite else "",
-            "article_id": article.get("id"),
-            "title": article.get("name"),
-            "category": "",
-            "condition/state": article.get("condition") or "",
-            "purchase_price": article.get("price"),
-            "listed_price": article.get("reference_price"),
-            "sold_price": "",
-            "status": "SOLD" if sold else "AVAILABLE",
-            "created_at": article.get("created_at"),
-            "sold_at": (tx.get("completed_at") or tx.get("created_at")) if tx else "",
-            "platform_links": format_platform_links(article.get("platform_links")),
-        })
-
-    sheets = [
-        {"title": "Tous", "columns": columns, "rows": rows},
-        {"title": "Vendus", "columns": columns, "rows": [r for r in rows if r["status"] == "SOLD"]},
-        {"title": "Non vendus", "columns": columns, "rows": [r for r in rows if r["status"] == "AVAILABLE"]},
-    ]
+    article_counts: Dict[str, int] = {}
+    async for row in db.articles.aggregate([
+        {"$match": {"posted_by": {"$in": user_ids}}},
+        {"$group": {"_id": "$posted_by", "count": {"$sum": 1}}},
+    ]):
+        article_counts[row["_id"]] = row["count"]
+
+    minisite_owner_map = {site.get("id"): site.get("user_id") for site in minisites if site.get("id")}
+    if minisite_owner_map:
+        async for row in db.minisite_articles.aggregate([
+            {"$match": {"minisite_id": {"$in": list(minisite_owner_map)}}},
+            {"$group": {"_id": "$minisite_id", "count": {"$sum": 1}}},
+        ]):
+            owner = minisite_owner_map.get(row["_id"])
+            if owner:
+                article_counts[owner] = article_counts.get(owner, 0) + row["count"]
 
-    xlsx_path = create_xlsx_file(sheets)
-    filename = build_filename("articles_all", start_str, end_str, "xlsx")
-    return stream_file_response(
-        xlsx_path,
-        filename,
-        background_tasks,
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    return minisite_map, sales_map, article_counts
 
 
 @api_router.get("/admin/exports/users", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def export_admin_users(
     background_tasks: BackgroundTasks,
     start: Optional[str] = None,
-    end: Optional[str] = None
+    end: Optional[str] = None,
+    format: str = Query("xlsx", pattern="^(xlsx|csv)$")
 ):
     start_dt, end_dt, start_str, end_str = parse_date_range(start, end)
-    users = await db.users.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0, "password_hash": 0}
-    ).to_list(100000)
-
-    user_ids = [u.get("id") for u in users if u.get("id")]
-
-    minisites = []
-    if user_ids:
-        minisites = await db.minisites.find(
-            {"user_id": {"$in": user_ids}},
-            {"_id": 0, "id": 1, "user_id": 1, "slug": 1}
-        ).to_list(100000)
-
-    minisite_map: Dict[str, List[dict]] = {}
-    for site in minisites:
-        minisite_map.setdefault(site.get("user_id"), []).append(site)
-
-    sales = []
-    if user_ids:
-        sales = await db.seller_sales.find(
-            {"seller_id": {"$in": user_ids}, "status": SaleStatus.COMPLETED},
-            {"_id": 0, "seller_id": 1, "sale_price": 1}
-        ).to_list(100000)
-
-    sales_map: Dict[str, dict] = {}
-    for sale in sales:
-        seller_id = sale.get("seller_id")
-        if not seller_id:
-            continue
-        stats = sales_map.setdefault(seller_id, {"count": 0, "revenue": 0.0})
-        stats["count"] += 1
-        stats["revenue"] += float(sale.get("sale_price") or 0)
-
-    article_counts: Dict[str, int] = {}
-    if user_ids:
-        user_articles = await db.articles.find(
-            {"posted_by": {"$in": user_ids}},
-            {"_id": 0, "posted_by": 1}
-        ).to_list(100000)
-        for article in user_articles:
-            owner = article.get("posted_by")
-            if owner:
-                article_counts[owner] = article_counts.get(owner, 0) + 1
-
-        minisite_ids = [site.get("id") for site in minisites if site.get("id")]
-        if minisite_ids:
-            minisite_articles = await db.minisite_articles.find(
-                {"minisite_id": {"$in": minisite_ids}},
-                {"_id": 0, "minisite_id": 1}
-            ).to_list(100000)
-            minisite_owner_map = {site.get("id"): site.get("user_id") for site in minisites}
-            for article in minisite_articles:
-                owner = minisite_owner_map.get(article.get("minisite_id"))
-                if owner:
-                    article_counts[owner] = article_counts.get(owner, 0) + 1
 
     columns = [
         "user_id",
@@ -3553,59 +3404,51 @@ async def export_admin_users(
         "total_revenue",
         "total_articles_count",
     ]
-
-    rows = []
-    for user in users:
-        user_id = user.get("id")
-        sites = minisite_map.get(user_id, [])
-        site_ids = ", ".join([s.get("id") for s in sites if s.get("id")])
-        site_slugs = ", ".join([s.get("slug") for s in sites if s.get("slug")])
-        stats = sales_map.get(user_id, {"count": 0, "revenue": 0.0})
-        rows.append({
-            "user_id": user_id,
-            "first_name": user.get("first_name"),
-            "last_name": user.get("last_name"),
-            "email": user.get("email"),
-            "created_at": user.get("created_at"),
-            "roles": ", ".join(user.get("roles", [])),
-            "minisite_id": site_ids,
-            "minisite_slug": site_slugs,
-            "total_sales_count": stats.get("count", 0),
-            "total_revenue": stats.get("revenue", 0.0),
-            "total_articles_count": article_counts.get(user_id, 0),
-        })
-
-    xlsx_path = create_xlsx_file([{"title": "Utilisateurs", "columns": columns, "rows": rows}])
-    filename = build_filename("users", start_str, end_str, "xlsx")
-    return stream_file_response(
-        xlsx_path,
-        filename,
-        background_tasks,
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    writer = open_export_writer(format)
+    try:
+        sheet = writer.add_sheet("Utilisateurs", columns)
+
+        cursor = db.users.find(_date_range_query("created_at", start_dt, end_dt), {"_id": 0, "password_hash": 0})
+        async for users in iter_batches(cursor):
+            user_ids = [u.get("id") for u in users if u.get("id")]
+            minisite_map, sales_map, article_counts = await _user_export_stats(user_ids)
+
+            rows = []
+            for user in users:
+                user_id = user.get("id")
+                sites = minisite_map.get(user_id, [])
+                stats = sales_map.get(user_id, {"count": 0, "revenue": 0.0})
+                rows.append({
+                    "user_id": user_id,
+                    "first_name": user.get("first_name"),
+                    "last_name": user.get("last_name"),
+                    "email": user.get("email"),
+                    "created_at": user.get("created_at"),
+                    "roles": ", ".join(user.get("roles", [])),
+                    "minisite_id": ", ".join([s.get("id") for s in sites if s.get("id")]),
+                    "minisite_slug": ", ".join([s.get("slug") for s in sites if s.get("slug")]),
+                    "total_sales_count": stats.get("count", 0),
+                    "total_revenue": stats.get("revenue", 0.0),
+                    "total_articles_count": article_counts.get(user_id, 0),
+                })
+            await writer.write_rows(sheet, rows)
+
+        path = await writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    filename = build_filename("users", start_str, end_str, writer.extension)
+    return export_response(path, filename, background_tasks, format)
 
 
 @api_router.get("/admin/exports/demandes", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
 async def export_admin_demandes(
     background_tasks: BackgroundTasks,
     start: Optional[str] = None,
-    end: Optional[str] = None
+    end: Optional[str] = None,
+    format: str = Query("xlsx", pattern="^(xlsx|csv)$")
 ):
     start_dt, end_dt, start_str, end_str = parse_date_range(start, end)
-    demandes = await db.demandes.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100000)
-
-    requester_ids = {d.get("client_id") for d in demandes if d.get("client_id")}
-    users = []
-    if requester_ids:
-        users = await db.users.find(
-            {"id": {"$in": list(requester_ids)}},
-            {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "email": 1, "phone": 1}
-        ).to_list(len(requester_ids))
-
-    user_map = {u.get("id"): u for u in users if u.get("id")}
 
     columns = [
         "demande_id",
@@ -3618,30 +3461,38 @@ async def export_admin_demandes(
         "related_article_id",
         "message/notes",
     ]
+    writer = open_export_writer(format)
+    try:
+        sheet = writer.add_sheet("Demandes", columns)
 
-    rows = []
-    for demande in demandes:
-        requester = user_map.get(demande.get("client_id"))
-        rows.append({
-            "demande_id": demande.get("id"),
-            "created_at": demande.get("created_at"),
-            "status": demande.get("status"),
-            "requester_first_name": requester.get("first_name") if requester else "",
-            "requester_last_name": requester.get("last_name") if requester else "",
-            "requester_email": requester.get("email") if requester else "",
-            "requester_phone": requester.get("phone") if requester else "",
-            "related_article_id": demande.get("article_id") or "",
-            "message/notes": demande.get("description") or "",
-        })
-
-    xlsx_path = create_xlsx_file([{"title": "Demandes", "columns": columns, "rows": rows}])
-    filename = build_filename("demandes", start_str, end_str, "xlsx")
-    return stream_file_response(
-        xlsx_path,
-        filename,
-        background_tasks,
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+        cursor = db.demandes.find(_date_range_query("created_at", start_dt, end_dt), {"_id": 0}).sort("created_at", -1)
+        async for demandes in iter_batches(cursor):
+            user_map = await _users_by_id(
+                (d.get("client_id") for d in demandes),
+                {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "email": 1, "phone": 1}
+            )
+            rows = []
+            for demande in demandes:
+                requester = user_map.get(demande.get("client_id"))
+                rows.append({
+                    "demande_id": demande.get("id"),
+                    "created_at": demande.get("created_at"),
+                    "status": demande.get("status"),
+                    "requester_first_name": requester.get("first_name") if requester else "",
+                    "requester_last_name": requester.get("last_name") if requester else "",
+                    "requester_email": requester.get("email") if requester else "",
+                    "requester_phone": requester.get("phone") if requester else "",
+                    "related_article_id": demande.get("article_id") or "",
+                    "message/notes": demande.get("description") or "",
+                })
+            await writer.write_rows(sheet, rows)
+
+        path = await writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    filename = build_filename("demandes", start_str, end_str, writer.extension)
+    return export_response(path, filename, background_tasks, format)
 
 
 @api_router.get("/admin/exports/sales/me", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
@@ -3649,20 +3500,14 @@ async def export_admin_sales_me(
     background_tasks: BackgroundTasks,
     start: Optional[str] = None,
     end: Optional[str] = None,
+    format: str = Query("xlsx", pattern="^(xlsx|csv)$"),
     current_user = Depends(get_current_user)
 ):
     # Date filter applies to created_at for seller sales.
     start_dt, end_dt, start_str, end_str = parse_date_range(start, end)
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0, "id": 1})
+    user_doc = await user_cache.get_by_email(db, current_user.email, {"_id": 0, "id": 1})
     seller_id = user_doc.get("id") if user_doc else None
 
-    if not seller_id:
-        sales = []
-    else:
-        query = _date_range_query("created_at", start_dt, end_dt)
-        query["seller_id"] = seller_id
-        sales = await db.seller_sales.find(query, {"_id": 0}).sort("created_at", -1).to_list(100000)
-
     columns = [
         "sale_id",
         "created_at",
@@ -3678,35 +3523,89 @@ async def export_admin_sales_me(
         "shipping_reference",
         "notes",
     ]
-
-    rows = []
-    for sale in sales:
-        payment_proof = sale.get("payment_proof") or {}
-        shipping_reference = sale.get("tracking_number") or sale.get("shipping_label") or ""
-        rows.append({
-            "sale_id": sale.get("id"),
-            "created_at": sale.get("created_at"),
-            "completed_at": sale.get("updated_at") if sale.get("status") == SaleStatus.COMPLETED else "",
-            "status": sale.get("status"),
-            "article_id": sale.get("article_id"),
-            "article_title": sale.get("article_name"),
-            "buyer_user_id": "",
-            "buyer_name": "",
-            "buyer_email": "",
-            "sold_price": sale.get("sale_price"),
-            "payment_method": sale.get("payment_method"),
-            "shipping_reference": shipping_reference,
-            "notes": payment_proof.get("note") or sale.get("rejection_reason") or "",
-        })
-
-    xlsx_path = create_xlsx_file([{"title": "Ventes", "columns": columns, "rows": rows}])
-    filename = build_filename("sales_me", start_str, end_str, "xlsx")
-    return stream_file_response(
-        xlsx_path,
-        filename,
-        background_tasks,
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    writer = open_export_writer(format)
+    try:
+        sheet = writer.add_sheet("Ventes", columns)
+
+        if seller_id:
+            query = _date_range_query("created_at", start_dt, end_dt)
+            query["seller_id"] = seller_id
+            async for sales in iter_batches(db.seller_sales.find(query, {"_id": 0}).sort("created_at", -1)):
+                rows = []
+                for sale in sales:
+                    payment_proof = sale.get("payment_proof") or {}
+                    rows.append({
+                        "sale_id": sale.get("id"),
+                        "created_at": sale.get("created_at"),
+                        "completed_at": sale.get("updated_at") if sale.get("status") == SaleStatus.COMPLETED else "",
+                        "status": sale.get("status"),
+                        "article_id": sale.get("article_id"),
+                        "article_title": sale.get("article_name"),
+                        "buyer_user_id": "",
+                        "buyer_name": "",
+                        "buyer_email": "",
+                        "sold_price": sale.get("sale_price"),
+                        "payment_method": sale.get("payment_method"),
+                        "shipping_reference": sale.get("tracking_number") or sale.get("shipping_label") or "",
+                        "notes": payment_proof.get("note") or sale.get("rejection_reason") or "",
+                    })
+                await writer.write_rows(sheet, rows)
+
+        path = await writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    filename = build_filename("sales_me", start_str, end_str, writer.extension)
+    return export_response(path, filename, background_tasks, format)
+
+
+# Contenu du snapshot : fichier -> feuilles (titre, collection, filtre par période ?, colonnes)
+SNAPSHOT_FILES = [
+    ("users.xlsx", [
+        ("users", "users", True, ["id", "email", "first_name", "last_name", "phone", "roles", "site_plan", "created_at"]),
+    ]),
+    ("minisites.xlsx", [
+        ("minisites", "minisites", True, [
+            "id", "user_id", "user_email", "plan_id", "site_name", "slug",
+            "welcome_text", "template", "primary_color", "font_family",
+            "status", "rating_avg", "rating_count", "sales_count",
+            "show_reviews", "created_at", "updated_at"
+        ]),
+    ]),
+    ("articles.xlsx", [
+        ("articles", "articles", True, [
+            "id", "name", "description", "price", "reference_price", "category_id",
+            "platform_links", "status", "stock", "created_at", "visible_public",
+            "visible_seller", "discord_contact", "posted_by", "is_third_party"
+        ]),
+        ("minisite_articles", "minisite_articles", True, [
+            "id", "minisite_id", "name", "description", "price", "reference_price",
+            "platform_links", "created_at", "status", "reserved", "show_in_reseller_catalog",
+            "condition", "show_in_public_catalog", "contact_email", "discord_tag"
+        ]),
+    ]),
+    ("demandes.xlsx", [
+        ("demandes", "demandes", True, [
+            "id", "client_id", "name", "description", "max_price", "reference_price",
+            "deposit_amount", "status", "payment_type", "deposit_requested_at",
+            "deposit_paid_at", "created_at", "can_cancel"
+        ]),
+    ]),
+    ("sales_transactions.xlsx", [
+        ("seller_sales", "seller_sales", True, [
+            "id", "seller_id", "article_id", "article_name", "sale_price", "seller_cost",
+            "profit", "status", "payment_method", "tracking_number", "shipping_label",
+            "rejection_reason", "created_at", "updated_at"
+        ]),
+        ("marketplace_transactions", "marketplace_transactions", True, [
+            "id", "article_id", "seller_user_id", "seller_minisite_id", "buyer_user_id",
+            "status", "buyer_confirmed", "seller_confirmed", "accepted_at",
+            "completed_at", "created_at", "reserved"
+        ]),
+    ]),
+]
+
+SNAPSHOT_PUBLIC_SETTINGS = ["logo_url", "contact_phone", "contact_email", "discord_invite_url", "billing_mode", "payments_enabled"]
 
 
 @api_router.get("/admin/exports/snapshot", dependencies=[Depends(require_roles([UserRole.ADMIN]))])
@@ -3716,183 +3615,75 @@ async def export_admin_snapshot(
     end: Optional[str] = None
 ):
     start_dt, end_dt, start_str, end_str = parse_date_range(start, end)
+    date_query = _date_range_query("created_at", start_dt, end_dt)
     tmp_dir = create_temp_dir()
     temp_paths: List[str] = [tmp_dir]
 
-    def _write_xlsx(filename: str, sheets: List[Dict[str, Any]]) -> str:
+    async def _write_xlsx(filename: str, sheets: List[Tuple[str, Any, List[str]]]) -> None:
         output_path = os.path.join(tmp_dir, filename)
-        create_xlsx_file(sheets, output_path=output_path)
+        writer = open_export_writer("xlsx", output_path)
+        try:
+            for title, cursor, columns in sheets:
+                await write_cursor(writer, writer.add_sheet(title, columns), cursor)
+            await writer.close()
+        except BaseException:
+            writer.abort()
+            raise
         temp_paths.append(output_path)
-        return output_path
-
-    users = await db.users.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0, "password_hash": 0}
-    ).to_list(100000)
-    _write_xlsx(
-        "users.xlsx",
-        [{
-            "title": "users",
-            "columns": ["id", "email", "first_name", "last_name", "phone", "roles", "site_plan", "created_at"],
-            "rows": users,
-        }]
-    )
 
-    minisites = await db.minisites.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-    _write_xlsx(
-        "minisites.xlsx",
-        [{
-            "title": "minisites",
-            "columns": [
-                "id", "user_id", "user_email", "plan_id", "site_name", "slug",
-                "welcome_text", "template", "primary_color", "font_family",
-                "status", "rating_avg", "rating_count", "sales_count",
-                "show_reviews", "created_at", "updated_at"
-            ],
-            "rows": minisites,
-        }]
-    )
-
-    articles = await db.articles.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-    minisite_articles = await db.minisite_articles.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-    _write_xlsx(
-        "articles.xlsx",
-        [
-            {
-                "title": "articles",
-                "columns": [
-                    "id", "name", "description", "price", "reference_price", "category_id",
-                    "platform_links", "status", "stock", "created_at", "visible_public",
-                    "visible_seller", "discord_contact", "posted_by", "is_third_party"
-                ],
-                "rows": articles,
-            },
-            {
-                "title": "minisite_articles",
-                "columns": [
-                    "id", "minisite_id", "name", "description", "price", "reference_price",
-                    "platform_links", "created_at", "status", "reserved", "show_in_reseller_catalog",
-                    "condition", "show_in_public_catalog", "contact_email", "discord_tag"
-                ],
-                "rows": minisite_articles,
-            }
-        ]
-    )
-
-    demandes = await db.demandes.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-    _write_xlsx(
-        "demandes.xlsx",
-        [{
-            "title": "demandes",
-            "columns": [
-                "id", "client_id", "name", "description", "max_price", "reference_price",
-                "deposit_amount", "status", "payment_type", "deposit_requested_at",
-                "deposit_paid_at", "created_at", "can_cancel"
-            ],
-            "rows": demandes,
-        }]
-    )
-
-    seller_sales = await db.seller_sales.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-    transactions = await db.marketplace_transactions.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-    _write_xlsx(
-        "sales_transactions.xlsx",
-        [
-            {
-                "title": "seller_sales",
-                "columns": [
-                    "id", "seller_id", "article_id", "article_name", "sale_price", "seller_cost",
-                    "profit", "status", "payment_method", "tracking_number", "shipping_label",
-                    "rejection_reason", "created_at", "updated_at"
-                ],
-                "rows": seller_sales,
-            },
-            {
-                "title": "marketplace_transactions",
-                "columns": [
-                    "id", "article_id", "seller_user_id", "seller_minisite_id", "buyer_user_id",
-                    "status", "buyer_confirmed", "seller_confirmed", "accepted_at",
-                    "completed_at", "created_at", "reserved"
-                ],
-                "rows": transactions,
-            }
-        ]
-    )
-
-    subscriptions = await db.subscriptions.find(
-        {"product": "minisite"},
-        {"_id": 0}
-    ).to_list(100000)
-    _write_xlsx(
-        "subscriptions.xlsx",
-        [{
-            "title": "subscriptions",
-            "columns": ["id", "user_id", "user_email", "plan", "status", "created_at", "current_period_end"],
-            "rows": subscriptions,
-        }]
-    )
-
-    settings_docs = await db.settings.find({}, {"_id": 0}).to_list(1000)
-    public_settings = await db.settings.find(
-        {"key": {"$in": ["logo_url", "contact_phone", "contact_email", "discord_invite_url", "billing_mode", "payments_enabled"]}},
-        {"_id": 0}
-    ).to_list(1000)
-    _write_xlsx(
-        "settings.xlsx",
-        [
-            {"title": "settings", "columns": ["key", "value"], "rows": settings_docs},
-            {"title": "public_settings", "columns": ["key", "value"], "rows": public_settings},
-        ]
-    )
-
-    audit_logs = await db.audit_logs.find(
-        _date_range_query("created_at", start_dt, end_dt),
-        {"_id": 0}
-    ).to_list(100000)
-    if audit_logs:
-        _write_xlsx(
-            "audit_logs.xlsx",
-            [{
-                "title": "audit_logs",
-                "columns": ["user_id", "action", "created_at", "ip"],
-                "rows": audit_logs,
-            }]
-        )
-
-    export_info = {
-        "version": "1.0",
-        "period": {"start": start_str, "end": end_str},
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-    }
-    export_info_path = os.path.join(tmp_dir, "export_info.json")
-    with open(export_info_path, "w", encoding="utf-8") as handle:
-        json.dump(export_info, handle, ensure_ascii=True, indent=2)
-    temp_paths.append(export_info_path)
-
-    zip_path = os.path.join(tmp_dir, "snapshot.zip")
-    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_handle:
-        for path in temp_paths:
-            if os.path.isfile(path) and path != zip_path:
-                zip_handle.write(path, arcname=os.path.basename(path))
-    temp_paths.append(zip_path)
+    try:
+        for filename, sheets in SNAPSHOT_FILES:
+            await _write_xlsx(filename, [
+                (
+                    title,
+                    db[collection].find(date_query if by_period else {}, {"_id": 0, "password_hash": 0} if collection == "users" else {"_id": 0}),
+                    columns,
+                )
+                for title, collection, by_period, columns in sheets
+            ])
+
+        await _write_xlsx("subscriptions.xlsx", [(
+            "subscriptions",
+            db.subscriptions.find({"product": "minisite"}, {"_id": 0}),
+            ["id", "user_id", "user_email", "plan", "status", "created_at", "current_period_end"],
+        )])
+
+        await _write_xlsx("settings.xlsx", [
+            ("settings", db.settings.find({}, {"_id": 0}), ["key", "value"]),
+            ("public_settings", db.settings.find({"key": {"$in": SNAPSHOT_PUBLIC_SETTINGS}}, {"_id": 0}), ["key", "value"]),
+        ])
+
+        if await db.audit_logs.find_one(date_query, {"_id": 1}):
+            await _write_xlsx("audit_logs.xlsx", [(
+                "audit_logs",
+                db.audit_logs.find(date_query, {"_id": 0}),
+                ["user_id", "action", "created_at", "ip"],
+            )])
+
+        export_info = {
+            "version": "1.0",
+            "period": {"start": start_str, "end": end_str},
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        export_info_path = os.path.join(tmp_dir, "export_info.json")
+        with open(export_info_path, "w", encoding="utf-8") as handle:
+            json.dump(export_info, handle, ensure_ascii=True, indent=2)
+        temp_paths.append(export_info_path)
+
+        zip_path = os.path.join(tmp_dir, "snapshot.zip")
+
+        def _write_zip() -> None:
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_handle:
+                for path in temp_paths:
+                    if os.path.isfile(path) and path != zip_path:
+                        zip_handle.write(path, arcname=os.path.basename(path))
+
+        await asyncio.to_thread(_write_zip)
+        temp_paths.append(zip_path)
+    except BaseException:
+        # Le nettoyage n'est programmé qu'avec la réponse : supprimer tout de suite les fichiers partiels
+        cleanup_paths(temp_paths)
+        raise
 
     background_tasks.add_task(cleanup_paths, temp_paths)
     filename = build_filename("snapshot", start_str, end_str, "zip")
@@ -3905,7 +3696,7 @@ async def export_admin_snapshot(
 
 # ===== STRIPE BILLING ENDPOINTS =====
 
-@api_router.post("/billing/minisite/checkout", dependencies=[Depends(get_current_user)])
+@api_router.post("/billing/minisite/checkout", dependencies=[Depends(get_current_user), Depends(checkout_limiter.dependency(db, _user_or_ip_key))])
 async def create_minisite_checkout(
     plan_data: dict = Body(...),
     current_user = Depends(get_current_user)
@@ -3916,8 +3707,7 @@ async def create_minisite_checkout(
     logger.info(f"🔵 Checkout request received - User: {current_user.email}, Plan data: {plan_data}")
     
     # Vérifier si les paiements sont activés
-    payments_setting = await db.settings.find_one({"key": "payments_enabled"}, {"_id": 0})
-    payments_enabled = payments_setting.get("value", False) if payments_setting else False
+    payments_enabled = await settings_cache.get(db, "payments_enabled", False)
     
     logger.info(f"📊 Payments enabled: {payments_enabled}")
     
@@ -3938,7 +3728,7 @@ async def create_minisite_checkout(
     logger.info(f"✅ Plan validated: {plan}")
     
     # Récupérer l'utilisateur
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     if not user_doc:
         logger.error(f"❌ User not found in DB - Email: {current_user.email}")
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -4037,7 +3827,7 @@ async def get_my_subscription(
     """
     Récupère les informations d'abonnement de l'utilisateur connecté
     """
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
@@ -4101,7 +3891,7 @@ async def create_portal_session(
     """
     Crée une session Stripe Customer Portal pour gérer l'abonnement
     """
-    user_doc = await db.users.find_one({"email": current_user.email}, {"_id": 0})
+    user_doc = await user_cache.get_by_email(db, current_user.email)
     if not user_doc:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
@@ -4220,7 +4010,7 @@ async def stripe_webhook(request: Request):
                                     "deposit_amount": demande.get("deposit_amount", 0),
                                     "details": f"<table class='details-table'><tr><td>Demande</td><td>{demande['name']}</td></tr><tr><td>Acompte</td><td>{demande.get('deposit_amount', 0)}€</td></tr><tr><td>Client</td><td>{user.get('first_name', '')} {user.get('last_name', '')} ({user.get('email', '')})</td></tr></table>"
                                 },
-                                BackgroundTasks()
+                                idempotency_key=f"stripe:{event_id}:{EventType.ADMIN_DEPOSIT_PAID.value}"
                             )
                     except Exception as e:
                         logger.error(f"Erreur notification admin acompte payé: {str(e)}")
@@ -4245,7 +4035,7 @@ async def stripe_webhook(request: Request):
                                     "plan": plan,
                                     "details": f"<table class='details-table'><tr><td>Plan</td><td>{plan}</td></tr><tr><td>Utilisateur</td><td>{user.get('first_name', '')} {user.get('last_name', '')} ({user.get('email', '')})</td></tr></table>"
                                 },
-                                BackgroundTasks()
+                                idempotency_key=f"stripe:{event_id}:{EventType.ADMIN_MINISITE_SUBSCRIPTION.value}"
                             )
                     except Exception as e:
                         logger.error(f"Erreur notification admin abonnement minisite: {str(e)}")
@@ -4301,6 +4091,9 @@ if "*" in cors_origins:
     # RFC CORS: wildcard incompatible with credentials
     allow_credentials = False
 
+# Coupe les uploads trop volumineux avant l'analyse multipart (déclaré avant CORS pour que les 413 portent les en-têtes CORS)
+app.add_middleware(UploadSizeLimitMiddleware, path_prefixes=("/api/upload/", "/api/users/avatar"))
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=allow_credentials,
@@ -4326,9 +4119,84 @@ async def add_security_headers(request: Request, call_next):
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    # Lot d'emails en cours terminé avant l'arrêt (borné par MAIL_DRAIN_TIMEOUT) ;
+    # le reste de l'outbox est repris par les autres workers ou au redémarrage
+    await stop_startup_maintenance()
+    await digest_worker.stop()
+    await outbox_worker.stop()
+    await mail_queue.stop()
+    await settings_cache.stop_watching()
+    image_pool.shutdown()
+    close_client()
+
+# Maintenance de démarrage (paramètres par défaut, index, backfills) : une seule fois
+# par démarrage du maître gunicorn, qui transmet STARTUP_MAINTENANCE_TOKEN à ses workers
+# (voir gunicorn.conf.py). Sans gunicorn, chaque processus l'exécute.
+# Elle tourne en tâche de fond (le worker sert les requêtes pendant les backfills) sous
+# un bail court renouvelé : si le worker meurt, le bail expire et un worker qui démarre
+# la reprend. Une fois terminée, le verrou est gardé STARTUP_MAINTENANCE_DONE_SECONDS
+# pour que les autres workers du même maître ne la relancent pas.
+STARTUP_MAINTENANCE_LEASE_SECONDS = 60
+STARTUP_MAINTENANCE_DONE_SECONDS = 24 * 3600
+
+_startup_maintenance_task: Optional[asyncio.Task] = None
 
 @app.on_event("startup")
+async def start_background_services():
+    settings_cache.invalidate()
+    settings_cache.start_watching(db)
+    mail_queue.start()
+    outbox_worker.start(db)
+    digest_worker.start(db)
+
+@app.on_event("startup")
+async def start_startup_maintenance():
+    global _startup_maintenance_task
+    token = os.environ.get("STARTUP_MAINTENANCE_TOKEN") or str(uuid.uuid4())
+    lock_name = f"startup-maintenance:{token}"
+    if not await acquire_lock(db, lock_name, STARTUP_MAINTENANCE_LEASE_SECONDS):
+        logger.info("Maintenance de démarrage déjà effectuée ou en cours dans un autre worker")
+        return
+    _startup_maintenance_task = asyncio.create_task(_run_startup_maintenance(lock_name))
+
+async def stop_startup_maintenance():
+    global _startup_maintenance_task
+    if _startup_maintenance_task is not None:
+        _startup_maintenance_task.cancel()
+        await asyncio.gather(_startup_maintenance_task, return_exceptions=True)
+        _startup_maintenance_task = None
+
+async def _renew_startup_maintenance_lock(lock_name: str):
+    while True:
+        await asyncio.sleep(STARTUP_MAINTENANCE_LEASE_SECONDS / 3)
+        try:
+            if not await renew_lock(db, lock_name, STARTUP_MAINTENANCE_LEASE_SECONDS):
+                logger.warning("Verrou de maintenance de démarrage perdu (bail expiré)")
+        except Exception as e:
+            logger.warning(f"Verrou de maintenance de démarrage non renouvelé: {str(e)}")
+
+async def _run_startup_maintenance(lock_name: str):
+    renewal = asyncio.create_task(_renew_startup_maintenance_lock(lock_name))
+    completed = False
+    try:
+        await initialize_default_settings()
+        completed = True
+    except asyncio.CancelledError:
+        logger.info("Maintenance de démarrage interrompue (arrêt du worker)")
+    except Exception as e:
+        logger.error(f"Erreur lors de la maintenance de démarrage: {str(e)}", exc_info=True)
+    finally:
+        renewal.cancel()
+        await asyncio.gather(renewal, return_exceptions=True)
+        try:
+            if completed:
+                await renew_lock(db, lock_name, STARTUP_MAINTENANCE_DONE_SECONDS)
+            else:
+                # Interrompue ou en échec : un prochain démarrage la relance
+                await release_lock(db, lock_name)
+        except Exception as e:
+            logger.warning(f"Verrou de maintenance de démarrage non mis à jour: {str(e)}")
+
 async def initialize_default_settings():
     existing_billing = await db.settings.find_one({"key": "billing_mode"})
     if not existing_billing:
@@ -4350,10 +4218,21 @@ async def initialize_default_settings():
         existing = await db.settings.find_one({"key": setting["key"]})
         if not existing:
             await db.settings.insert_one(setting)
+    settings_cache.invalidate()
+
+    await ensure_indexes(db)
+
+    try:
+        for collection in (db.articles, db.minisite_articles):
+            backfilled = await backfill_search_fields(collection)
+            if backfilled:
+                logger.info(f"Champs de recherche calculés pour {backfilled} document(s) de {collection.name}")
+    except Exception as e:
+        logger.warning(f"Champs de recherche non initialisés: {str(e)}")
 
     try:
-        await db.password_resets.create_index("token_hash", unique=True)
-        await db.password_resets.create_index("expires_at", expireAfterSeconds=0)
-        await db.password_resets.create_index("user_id")
+        normalized = await normalize_return_deadlines(db)
+        if normalized:
+            logger.info(f"Dates de retour Pro converties pour {normalized} article(s)")
     except Exception as e:
-        logger.warning(f"Index password_resets non créé: {str(e)}")
+        logger.warning(f"Dates de retour Pro non normalisées: {str(e)}")
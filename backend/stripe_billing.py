@@ -7,6 +7,7 @@ import logging
 import stripe
 from typing import Dict, Any, Optional
 from datetime import datetime, timezone
+from utils.user_cache import user_cache
 
 logger = logging.getLogger(__name__)
 
@@ -79,6 +80,7 @@ async def get_stripe_customer_id(db, user_id: str, user_email: str) -> Optional[
                 {"id": user_id},
                 {"$set": {"stripe_customer_id": customer.id}}
             )
+            user_cache.invalidate(user_id=user_id)
             logger.info(f"✅ Customer ID saved to database - Customer ID: {customer.id}")
         except Exception as e:
             logger.warning(f"⚠️ Failed to save customer_id to DB (non-critical): {str(e)}")
@@ -399,6 +401,7 @@ async def handle_checkout_session_completed(db, session: Dict[str, Any]) -> None
             {"id": user_id},
             {"$set": user_update}
         )
+        user_cache.invalidate(user_id=user_id)
         logger.info(f"📝 User update result - Modified: {result.modified_count}, Matched: {result.matched_count}")
         
         # Vérifier les rôles après update
@@ -521,6 +524,7 @@ async def handle_subscription_updated(db, subscription: Dict[str, Any]) -> None:
             {"id": user_id},
             {"$set": user_update}
         )
+        user_cache.invalidate(user_id=user_id)
         logger.info(f"📝 User update result - Modified: {result.modified_count}, Matched: {result.matched_count}")
         
         # Vérifier les rôles après update
@@ -593,6 +597,7 @@ async def handle_subscription_deleted(db, subscription: Dict[str, Any]) -> None:
                 "roles": roles
             }}
         )
+        user_cache.invalidate(user_id=user_id)
         logger.info(f"📝 User update result - Modified: {result.modified_count}, Matched: {result.matched_count}")
         
         # Vérifier les rôles après update
@@ -658,6 +663,7 @@ async def handle_invoice_payment_failed(db, invoice: Dict[str, Any]) -> None:
                 "minisite_active": False
             }}
         )
+        user_cache.invalidate(user_id=user_id)
         logger.info(f"📝 User update result - Modified: {result.modified_count}")
         
         # Mettre à jour l'abonnement
@@ -806,6 +812,7 @@ async def handle_invoice_paid(db, invoice: Dict[str, Any]) -> None:
                 "minisite_active": subscription.status in ["active", "trialing"]
             }}
         )
+        user_cache.invalidate(user_id=user_id)
         logger.info(f"📝 User update result - Modified: {result.modified_count}")
         
         # Mettre à jour l'abonnement
@@ -0,0 +1,197 @@
+"""
+Nettoyage des fichiers uploadés orphelins (backend/uploads).
+
+Marquage puis balayage :
+1. les documents qui référencent des uploads (UPLOAD_REFERENCES) sont parcourus
+   en flux, avec projection sur les seuls champs concernés, pour construire
+   l'ensemble des noms de fichiers référencés ;
+2. les fichiers d'UPLOAD_DIR non référencés et plus anciens que la période de
+   grâce sont supprimés, ou déplacés dans `.quarantine/<date>/`.
+
+Les déclinaisons responsive (`<nom>_<largeur>.webp`) suivent le sort de leur
+image principale. La période de grâce protège les uploads récents pas encore
+rattachés à un document (formulaire en cours de saisie, upload dédupliqué).
+
+    python upload_gc.py                       # dry-run : rapport des octets récupérables
+    python upload_gc.py --delete              # supprime les orphelins
+    python upload_gc.py --quarantine          # déplace les orphelins en quarantaine
+    python upload_gc.py --grace-hours 72      # période de grâce (UPLOAD_GC_GRACE_HOURS, 168 par défaut)
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from upload_store import UPLOAD_DIR
+from utils.images import VARIANT_WIDTHS
+
+logger = logging.getLogger(__name__)
+
+QUARANTINE_DIRNAME = ".quarantine"
+UPLOAD_GC_GRACE_HOURS = float(os.environ.get("UPLOAD_GC_GRACE_HOURS", "168"))
+SCAN_BATCH_SIZE = 1000
+
+# Champs (notation pointée) susceptibles de contenir une URL d'upload, par collection
+UPLOAD_REFERENCES: Dict[str, List[str]] = {
+    "articles": ["photos"],
+    "minisite_articles": ["photos"],
+    "users": ["avatar_url"],
+    "minisites": ["logo_url"],
+    "pro_articles": ["photo"],
+    "seller_sales": ["shipping_label", "payment_proof"],
+    "demandes": ["photos"],
+    "settings": ["value"],
+}
+
+_VARIANT_PATTERN = re.compile(r"^(?P<stem>.+)_(?P<width>\d+)\.webp$")
+# `/api/uploads/<nom>` comme `/uploads/<nom>` (URL normalisée côté frontend)
+_UPLOAD_URL_PATTERN = re.compile(r"/uploads/([^\s\"'?#/]+)")
+
+
+def _collect_filenames(value: Any, found: Set[str]) -> None:
+    """Ajoute à `found` les fichiers référencés dans `value` (chaîne, liste ou dict)."""
+    if isinstance(value, str):
+        found.update(_UPLOAD_URL_PATTERN.findall(value))
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_filenames(item, found)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_filenames(item, found)
+
+
+async def referenced_filenames(db, references: Dict[str, List[str]] = UPLOAD_REFERENCES) -> Set[str]:
+    """Ensemble des noms de fichiers référencés, en un parcours par collection."""
+    found: Set[str] = set()
+    for collection_name, fields in references.items():
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        async for doc in db[collection_name].find({}, projection, batch_size=SCAN_BATCH_SIZE):
+            _collect_filenames(doc, found)
+    return found
+
+
+def parent_filename(filename: str) -> Optional[str]:
+    """Image principale d'une déclinaison (`abc_400.webp` -> `abc.webp`), sinon None."""
+    match = _VARIANT_PATTERN.match(filename)
+    if match and int(match.group("width")) in VARIANT_WIDTHS:
+        return f"{match.group('stem')}.webp"
+    return None
+
+
+def find_orphans(upload_dir: Path, referenced: Set[str], grace_hours: float) -> List[Path]:
+    """Fichiers d'`upload_dir` non référencés et modifiés avant la période de grâce."""
+    cutoff = time.time() - grace_hours * 3600
+    orphans = []
+    with os.scandir(upload_dir) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            name = entry.name
+            if name in referenced or parent_filename(name) in referenced:
+                continue
+            if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                continue
+            orphans.append(Path(entry.path))
+    return orphans
+
+
+async def sweep_uploads(
+    db,
+    upload_dir: Path = UPLOAD_DIR,
+    grace_hours: float = UPLOAD_GC_GRACE_HOURS,
+    mode: str = "dry-run"
+) -> Dict[str, Any]:
+    """
+    Balaye `upload_dir`. `mode` : "dry-run" (rien n'est modifié), "delete" ou
+    "quarantine". Les entrées correspondantes de la collection `uploads` sont
+    supprimées avec les fichiers.
+    Retourne {"referenced", "orphans", "bytes", "processed", "errors"}.
+    """
+    if mode not in ("dry-run", "delete", "quarantine"):
+        raise ValueError(f"Mode de nettoyage inconnu: {mode}")
+
+    referenced = await referenced_filenames(db)
+    orphans = await asyncio.to_thread(find_orphans, upload_dir, referenced, grace_hours)
+    report: Dict[str, Any] = {
+        "referenced": len(referenced),
+        "orphans": len(orphans),
+        "bytes": 0,
+        "processed": 0,
+        "errors": 0,
+    }
+
+    quarantine_dir = upload_dir / QUARANTINE_DIRNAME / datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    removed: List[str] = []
+    for path in orphans:
+        try:
+            size = path.stat().st_size
+            if mode == "delete":
+                path.unlink()
+            elif mode == "quarantine":
+                quarantine_dir.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(path), str(quarantine_dir / path.name))
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            report["errors"] += 1
+            logger.warning(f"Upload {path.name} non traité: {str(e)}")
+            continue
+        report["bytes"] += size
+        if mode != "dry-run":
+            report["processed"] += 1
+            removed.append(path.name)
+
+    for start in range(0, len(removed), SCAN_BATCH_SIZE):
+        await db.uploads.delete_many({"filename": {"$in": removed[start:start + SCAN_BATCH_SIZE]}})
+    return report
+
+
+def _format_bytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+async def main() -> int:
+    from database import close_client, get_db
+
+    parser = argparse.ArgumentParser(description="Nettoie les fichiers uploadés non référencés")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--delete", action="store_true", help="Supprime les fichiers orphelins")
+    action.add_argument("--quarantine", action="store_true", help=f"Déplace les orphelins dans uploads/{QUARANTINE_DIRNAME}/")
+    parser.add_argument("--grace-hours", type=float, default=UPLOAD_GC_GRACE_HOURS, help="Âge minimal d'un fichier orphelin")
+    parser.add_argument("--upload-dir", type=Path, default=UPLOAD_DIR)
+    args = parser.parse_args()
+
+    try:
+        db = get_db()
+    except ValueError as e:
+        print(str(e))
+        return 1
+
+    mode = "delete" if args.delete else "quarantine" if args.quarantine else "dry-run"
+    try:
+        report = await sweep_uploads(db, args.upload_dir, args.grace_hours, mode)
+    finally:
+        close_client()
+
+    print(f"🔎 {report['referenced']} fichier(s) référencé(s)")
+    print(f"🗑️  {report['orphans']} orphelin(s) de plus de {args.grace_hours:.0f}h : {_format_bytes(report['bytes'])} récupérables")
+    if mode == "dry-run":
+        print("ℹ️  Dry-run : rien n'a été modifié (--delete ou --quarantine pour appliquer)")
+    else:
+        print(f"✅ {report['processed']} fichier(s) traité(s) ({mode})")
+    if report["errors"]:
+        print(f"❌ {report['errors']} erreur(s), voir les logs")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,254 @@
+"""
+Registre des fichiers uploadés (collection `uploads`).
+
+Chaque image traitée par POST /api/upload/image y est enregistrée avec ses
+déclinaisons responsive (`<nom>_<largeur>.webp`) et son placeholder LQIP.
+Les documents (articles, articles mini-site) continuent de stocker leurs photos
+sous forme d'URL : les déclinaisons sont rattachées à la lecture par
+`attach_photo_variants`, en une seule requête pour toute une page.
+
+Déduplication : chaque upload porte une `content_key` (SHA-256 des octets
+d'origine + signature des paramètres de traitement). Un fichier déjà connu
+n'est ni ré-encodé ni stocké une seconde fois : l'URL existante est renvoyée.
+L'index unique sur `content_key` départage deux uploads simultanés du même
+contenu : le second supprime ses fichiers et renvoie l'URL du premier.
+`ref_count` compte les photos d'articles qui pointent vers le fichier
+(`adjust_photo_refs`) ; un fichier à 0 référence est candidat au nettoyage.
+
+`store_upload` (fichier déjà sur disque) et `store_data_uri` (image base64,
+module Pro) sont les deux points d'entrée pour écrire dans le store.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from utils.images import PROCESSING_SIGNATURE, image_pool, process_upload_image
+from utils.uploads import get_upload_max_bytes, sniff_image_format
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path(__file__).parent / "uploads"
+
+# Segment d'URL sous lequel UPLOAD_DIR est servi
+UPLOADS_URL_SEGMENT = "/api/uploads/"
+
+# Champs du registre nécessaires pour décrire les déclinaisons
+UPLOAD_VARIANT_FIELDS = {"_id": 0, "filename": 1, "variants": 1, "lqip": 1, "width": 1, "height": 1}
+
+# Traitement appliqué aux uploads `no_restrictions` (fichier conservé tel quel)
+ORIGINAL_PROCESSING = "original"
+
+
+def filename_from_url(url: Optional[str]) -> Optional[str]:
+    """Nom du fichier stocké dans UPLOAD_DIR pour cette URL, ou None si l'URL est externe."""
+    if not url or not isinstance(url, str) or UPLOADS_URL_SEGMENT not in url:
+        return None
+    filename = url.rsplit(UPLOADS_URL_SEGMENT, 1)[1].split("?", 1)[0]
+    return filename or None
+
+
+def content_key(sha256: str, processing: str) -> str:
+    """Clé de contenu : empreinte des octets d'origine et des paramètres de traitement."""
+    return hashlib.sha256(f"{sha256}:{processing}".encode("ascii")).hexdigest()
+
+
+async def find_by_content_key(db, key: str) -> Optional[Dict[str, Any]]:
+    """Upload déjà enregistré pour ce contenu, ou None."""
+    return await db.uploads.find_one({"content_key": key}, UPLOAD_VARIANT_FIELDS)
+
+
+async def record_upload(
+    db,
+    filename: str,
+    result: Dict[str, Any],
+    kind: str,
+    key: Optional[str] = None,
+    uploaded_by: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Enregistre un upload traité (`result` = retour de process_upload_image).
+    Si un autre upload a enregistré le même contenu entre-temps, retourne son
+    document (champs UPLOAD_VARIANT_FIELDS) : `filename` diffère alors de celui
+    fourni et l'appelant doit supprimer ses propres fichiers.
+    """
+    width, height = result.get("size") or (None, None)
+    doc = {
+        "filename": filename,
+        "content_key": key,
+        "kind": kind,
+        "bytes": result.get("bytes"),
+        "width": width,
+        "height": height,
+        "variants": result.get("variants") or {},
+        "lqip": result.get("lqip"),
+        "uploaded_by": uploaded_by,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    try:
+        await db.uploads.update_one(
+            {"filename": filename},
+            {"$set": doc, "$setOnInsert": {"ref_count": 0}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        existing = await find_by_content_key(db, key) if key else None
+        if existing is None:
+            raise
+        return existing
+    return doc
+
+
+def _remove_stored_files(filename: str, variants: Optional[Dict[str, str]] = None) -> None:
+    """Supprime de UPLOAD_DIR un fichier et ses déclinaisons."""
+    for name in [filename, *(variants or {}).values()]:
+        (UPLOAD_DIR / name).unlink(missing_ok=True)
+
+
+async def adjust_photo_refs(db, previous: Iterable[str], current: Iterable[str]) -> None:
+    """
+    Répercute sur `ref_count` le passage des photos `previous` aux photos `current`
+    (création : previous vide ; suppression : current vide). Les URL externes
+    sont ignorées.
+    """
+    delta = Counter(filter(None, map(filename_from_url, current or [])))
+    delta.subtract(filter(None, map(filename_from_url, previous or [])))
+    by_delta: Dict[int, List[str]] = {}
+    for filename, change in delta.items():
+        if change:
+            by_delta.setdefault(change, []).append(filename)
+    for change, filenames in by_delta.items():
+        await db.uploads.update_many({"filename": {"$in": filenames}}, {"$inc": {"ref_count": change}})
+
+
+def describe_variants(url: str, record: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Déclinaisons d'une photo : {"srcset": {largeur: url}, "lqip", "width", "height"}.
+    Les URL des déclinaisons reprennent la base de l'URL d'origine.
+    """
+    if not record or not (record.get("variants") or record.get("lqip")):
+        return None
+    base = url.rsplit("/", 1)[0]
+    srcset = {
+        width: f"{base}/{name}"
+        for width, name in sorted((record.get("variants") or {}).items(), key=lambda item: int(item[0]))
+    }
+    return {
+        "srcset": srcset,
+        "lqip": record.get("lqip"),
+        "width": record.get("width"),
+        "height": record.get("height"),
+    }
+
+
+async def fetch_upload_records(db, filenames: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """{filename: document du registre} en une seule requête."""
+    unique = list({name for name in filenames if name})
+    if not unique:
+        return {}
+    records = await db.uploads.find({"filename": {"$in": unique}}, UPLOAD_VARIANT_FIELDS).to_list(len(unique))
+    return {record["filename"]: record for record in records}
+
+
+async def attach_photo_variants(db, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Ajoute `photo_variants` (liste alignée sur `photos`, None pour une photo
+    sans déclinaison) à chaque document. Modifie les documents en place.
+    """
+    filenames = [filename_from_url(url) for doc in docs for url in (doc.get("photos") or [])]
+    records = await fetch_upload_records(db, filenames)
+    for doc in docs:
+        photos = doc.get("photos") or []
+        if photos:
+            doc["photo_variants"] = [describe_variants(url, records.get(filename_from_url(url))) for url in photos]
+    return docs
+
+
+async def store_upload(
+    db,
+    source_path: Path,
+    sha256: str,
+    base_url: str,
+    uploaded_by: Optional[str] = None,
+    original_ext: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Range dans UPLOAD_DIR l'image `source_path` (copie temporaire, laissée à
+    l'appelant) : WebP + déclinaisons via le pool d'images, ou fichier tel quel
+    si `original_ext` est fourni. Un contenu déjà stocké est réutilisé.
+    Retourne {"url", "filename", "variants"} ; lève ImagePoolSaturated si le
+    pool est saturé.
+    """
+    key = content_key(sha256, ORIGINAL_PROCESSING if original_ext else PROCESSING_SIGNATURE)
+    existing = await find_by_content_key(db, key)
+    if existing and (UPLOAD_DIR / existing["filename"]).exists():
+        logger.info(f"Upload dédupliqué : {existing['filename']}")
+        # Rafraîchir la date : le fichier repasse sous la période de grâce du nettoyage (upload_gc.py)
+        os.utime(UPLOAD_DIR / existing["filename"])
+        url = f"{base_url}{UPLOADS_URL_SEGMENT}{existing['filename']}"
+        return {"url": url, "filename": existing["filename"], "variants": describe_variants(url, existing)}
+    if existing:
+        # Fichier disparu du disque : le contenu sera stocké à nouveau sous un autre nom
+        await db.uploads.update_one({"filename": existing["filename"]}, {"$unset": {"content_key": ""}})
+
+    if original_ext:
+        filename = f"{uuid.uuid4()}.{original_ext}"
+        os.replace(source_path, UPLOAD_DIR / filename)
+        result = {"bytes": (UPLOAD_DIR / filename).stat().st_size}
+        record = await record_upload(db, filename, result, kind="original", key=key, uploaded_by=uploaded_by)
+    else:
+        filename = f"{uuid.uuid4()}.webp"
+        # Décodage, redimensionnement et encodage WebP dans le pool de processus dédié
+        result = await image_pool.run(process_upload_image, str(source_path), str(UPLOAD_DIR / filename))
+        if result["size"] != result["original_size"]:
+            logger.info(f"Image redimensionnée de {result['original_size']} à {result['size']}")
+        logger.info(f"Image compressée à {result['bytes'] / 1024:.2f}KB avec qualité {result['quality']}")
+        record = await record_upload(db, filename, result, kind="image", key=key, uploaded_by=uploaded_by)
+
+    if record["filename"] != filename:
+        # Même contenu enregistré par un upload simultané : on garde le sien
+        logger.info(f"Upload dédupliqué après traitement : {record['filename']}")
+        await asyncio.to_thread(_remove_stored_files, filename, result.get("variants"))
+        filename = record["filename"]
+
+    url = f"{base_url}{UPLOADS_URL_SEGMENT}{filename}"
+    return {"url": url, "filename": filename, "variants": describe_variants(url, record)}
+
+
+def _spool_data_uri(data_uri: str, destination: Path) -> str:
+    """Décode l'image base64 vers `destination`. Retourne le SHA-256 des octets."""
+    header, _, payload = data_uri.partition(",")
+    if not header.startswith("data:image/") or ";base64" not in header:
+        raise ValueError("Data URI d'image base64 attendue")
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except binascii.Error:
+        raise ValueError("Contenu base64 invalide")
+    if len(data) > get_upload_max_bytes():
+        raise ValueError("Image trop volumineuse")
+    if not sniff_image_format(data[:16]):
+        raise ValueError("Format d'image non supporté")
+    destination.write_bytes(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+async def store_data_uri(db, data_uri: str, base_url: str, uploaded_by: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Range une image reçue en data URI base64 dans le store (même traitement que
+    POST /api/upload/image). Lève ValueError si la data URI n'est pas une image valide.
+    """
+    spool_path = UPLOAD_DIR / f".{uuid.uuid4()}.part"
+    try:
+        sha256 = await asyncio.to_thread(_spool_data_uri, data_uri, spool_path)
+        return await store_upload(db, spool_path, sha256, base_url, uploaded_by)
+    finally:
+        spool_path.unlink(missing_ok=True)
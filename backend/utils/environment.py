@@ -0,0 +1,26 @@
+"""
+Environnement d'exécution de l'API : APP_ENV, sinon ENV (voir README), et
+nombre de workers sur l'hôte (WEB_CONCURRENCY, voir gunicorn.conf.py).
+"""
+import os
+
+
+def app_env() -> str:
+    return (os.environ.get("APP_ENV") or os.environ.get("ENV") or "").strip().lower()
+
+
+def is_production_env() -> bool:
+    return app_env() == "production"
+
+
+def web_concurrency() -> int:
+    """Nombre de workers de l'API sur l'hôte (WEB_CONCURRENCY, fixé par gunicorn.conf.py ; 1 sinon)."""
+    try:
+        return max(1, int(os.environ.get("WEB_CONCURRENCY") or 1))
+    except ValueError:
+        return 1
+
+
+def cpus_per_worker() -> int:
+    """Cœurs revenant à un worker : base des pools de calcul créés dans chaque processus."""
+    return max(1, (os.cpu_count() or 1) // web_concurrency())
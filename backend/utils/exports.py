@@ -1,14 +1,49 @@
+"""
+Exports admin (XLSX/CSV).
+
+Les documents sont lus par lots (iter_batches, EXPORT_BATCH_SIZE) et chaque lot
+est écrit aussitôt dans le fichier : classeur openpyxl en mode write-only (une
+feuille = un fichier temporaire, les lignes ne restent pas en mémoire) ou CSV.
+La mémoire utilisée dépend de la taille d'un lot, pas du nombre de lignes.
+
+    writer = open_export_writer("xlsx")
+    all_rows = writer.add_sheet("Tous", columns)
+    async for batch in iter_batches(db.articles.find(query, {"_id": 0})):
+        await writer.write_rows(all_rows, [build_row(doc) for doc in batch])
+    path = await writer.close()
+
+En cas d'échec ou d'annulation avant `close()`, `writer.abort()` supprime les
+fichiers temporaires (sinon ils restent sur disque, le nettoyage n'étant
+programmé qu'avec la réponse) :
+
+    try:
+        ...
+        path = await writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+"""
+import asyncio
+import csv
 import json
 import os
 import shutil
 import tempfile
 from datetime import date, datetime, time, timedelta, timezone
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 
 from fastapi import BackgroundTasks, HTTPException
 from fastapi.responses import StreamingResponse
 from openpyxl import Workbook
 
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = ("xlsx", "csv")
+EXPORT_MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+}
+
 
 def parse_date_range(start: Optional[str], end: Optional[str]) -> Tuple[datetime, datetime, str, str]:
     """
@@ -68,26 +103,136 @@ def serialize_cell(value: Any) -> Any:
     return value
 
 
-def create_xlsx_file(sheets: List[Dict[str, Any]], output_path: Optional[str] = None) -> str:
-    wb = Workbook(write_only=True)
-    for sheet in sheets:
-        title = sheet["title"]
-        columns = sheet["columns"]
-        rows = sheet.get("rows", [])
+async def iter_batches(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Parcourt un curseur Motor par lots de `batch_size` documents."""
+    cursor.batch_size(batch_size)
+    batch: List[Dict[str, Any]] = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-        ws = wb.create_sheet(title=title)
-        ws.append(columns)
+
+class ExportSheet:
+    def __init__(self, columns: List[str], append):
+        self.columns = columns
+        self._append = append
+
+    def write(self, rows: Iterable[Dict[str, Any]]) -> None:
         for row in rows:
-            ws.append([serialize_cell(row.get(col, "")) for col in columns])
+            self._append([serialize_cell(row.get(col, "")) for col in self.columns])
+
+
+class XlsxExportWriter:
+    """Classeur write-only : plusieurs feuilles remplies en parallèle, au fil des lots."""
+
+    extension = "xlsx"
+
+    def __init__(self, output_path: Optional[str] = None):
+        self.output_path = output_path
+        self._workbook = Workbook(write_only=True)
+
+    def add_sheet(self, title: str, columns: List[str]) -> ExportSheet:
+        ws = self._workbook.create_sheet(title=title)
+        ws.append(columns)
+        return ExportSheet(columns, ws.append)
+
+    async def write_rows(self, sheet: ExportSheet, rows: List[Dict[str, Any]]) -> None:
+        # Sérialisation hors de la boucle d'événements (lots de EXPORT_BATCH_SIZE lignes)
+        await asyncio.to_thread(sheet.write, rows)
+
+    def _save(self) -> str:
+        if self.output_path:
+            self._workbook.save(self.output_path)
+            return self.output_path
+        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
+        tmp_file.close()
+        self._workbook.save(tmp_file.name)
+        return tmp_file.name
+
+    async def close(self) -> str:
+        return await asyncio.to_thread(self._save)
 
-    if output_path:
-        wb.save(output_path)
-        return output_path
+    def abort(self) -> None:
+        """Abandonne l'export : supprime les fichiers temporaires des feuilles et le fichier de sortie."""
+        for ws in self._workbook.worksheets:
+            sheet_writer = ws._writer
+            if sheet_writer is None:
+                continue
+            try:
+                ws.close()
+            except Exception:
+                # Feuille déjà finalisée (échec pendant la sauvegarde)
+                pass
+            _cleanup_path(sheet_writer.out)
+        if self.output_path:
+            _cleanup_path(self.output_path)
 
-    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-    wb.save(tmp_file.name)
-    tmp_file.close()
-    return tmp_file.name
+
+class CsvExportWriter:
+    """
+    CSV (UTF-8 avec BOM pour Excel). Un CSV n'a qu'une feuille : seule la première
+    est écrite, les feuilles par statut sont ignorées (la colonne status suffit).
+    """
+
+    extension = "csv"
+
+    def __init__(self, output_path: Optional[str] = None):
+        if output_path:
+            self.path = output_path
+        else:
+            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
+            tmp_file.close()
+            self.path = tmp_file.name
+        self._handle = open(self.path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._handle)
+        self._has_sheet = False
+
+    def add_sheet(self, title: str, columns: List[str]) -> ExportSheet:
+        if self._has_sheet:
+            return ExportSheet(columns, lambda values: None)
+        self._has_sheet = True
+        self._writer.writerow(columns)
+        return ExportSheet(columns, self._writer.writerow)
+
+    async def write_rows(self, sheet: ExportSheet, rows: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(sheet.write, rows)
+
+    async def close(self) -> str:
+        self._handle.close()
+        return self.path
+
+    def abort(self) -> None:
+        """Abandonne l'export : ferme le fichier et le supprime."""
+        self._handle.close()
+        _cleanup_path(self.path)
+
+
+async def write_cursor(writer, sheet: ExportSheet, cursor) -> int:
+    """Écrit tous les documents du curseur (lignes brutes) ; retourne le nombre de lignes."""
+    count = 0
+    async for batch in iter_batches(cursor):
+        await writer.write_rows(sheet, batch)
+        count += len(batch)
+    return count
+
+
+def open_export_writer(export_format: str = "xlsx", output_path: Optional[str] = None):
+    if export_format == "csv":
+        return CsvExportWriter(output_path)
+    return XlsxExportWriter(output_path)
+
+
+def export_response(
+    path: str,
+    filename: str,
+    background_tasks: BackgroundTasks,
+    export_format: str = "xlsx",
+) -> StreamingResponse:
+    return stream_file_response(path, filename, background_tasks, EXPORT_MEDIA_TYPES[export_format])
 
 
 def stream_file_response(
@@ -0,0 +1,241 @@
+"""
+Traitement des images uploadées (conversion WebP, redimensionnement, compression).
+
+Les fonctions de traitement sont pures et picklables : elles s'exécutent dans un
+pool de processus dédié (`image_pool`) pour ne jamais bloquer la boucle
+d'événements. Le pool applique une contre-pression : au-delà de
+IMAGE_QUEUE_LIMIT traitements en cours ou en attente, `ImagePoolSaturated`
+est levée et l'API répond 503.
+
+Le pool et sa limite sont propres à chaque worker gunicorn : l'hôte exécute
+jusqu'à WEB_CONCURRENCY × IMAGE_WORKERS encodages. Par défaut IMAGE_WORKERS
+vaut min(2, cœurs / WEB_CONCURRENCY) pour ne pas dépasser le nombre de cœurs.
+"""
+import asyncio
+import base64
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from PIL import Image
+
+from utils.environment import cpus_per_worker
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par worker (voir l'en-tête du module)
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS") or min(2, cpus_per_worker()))
+IMAGE_QUEUE_LIMIT = int(os.environ.get("IMAGE_QUEUE_LIMIT") or IMAGE_WORKERS * 4)
+
+COMPRESSION_THRESHOLD = 1 * 1024 * 1024  # 1MB - déclenche compression
+TARGET_SIZE = 400 * 1024  # 400KB cible après compression
+ACCEPTED_SIZE = int(TARGET_SIZE * 1.2)  # Accepter jusqu'à 480KB
+MAX_QUALITY = 60
+MIN_QUALITY = 30
+QUALITY_STEP = 5
+WEBP_METHOD = 6
+
+# Déclinaisons responsive (largeur en px) générées à côté de l'image principale
+VARIANT_WIDTHS = (160, 400, 800, 1600)
+VARIANT_QUALITY = 70
+# Placeholder flou (LQIP) inliné en data URI
+LQIP_WIDTH = 16
+LQIP_QUALITY = 30
+
+# Empreinte des paramètres de traitement : entre dans la clé de contenu des
+# uploads (upload_store.content_key). Toute modification des réglages ci-dessus
+# change la signature, donc ré-encode les images au lieu de servir l'ancien rendu.
+PROCESSING_SIGNATURE = (
+    f"webp-v2:{COMPRESSION_THRESHOLD}:{TARGET_SIZE}:{MAX_QUALITY}-{MIN_QUALITY}-{QUALITY_STEP}:{WEBP_METHOD}"
+    f":{','.join(map(str, VARIANT_WIDTHS))}@{VARIANT_QUALITY}:lqip{LQIP_WIDTH}@{LQIP_QUALITY}"
+)
+
+
+class ImagePoolSaturated(Exception):
+    """Trop de traitements d'image en cours : la requête doit être réessayée plus tard."""
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    # Convertir en RGB si nécessaire (pour les PNG avec alpha)
+    if image.mode in ('RGBA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if len(image.split()) == 4 else None)
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _encode_webp(image: Image.Image, quality: int, method: int = WEBP_METHOD) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=quality, method=method)
+    return buffer.getvalue()
+
+
+def _predict_quality(size_at_max: int) -> int:
+    """
+    Estime la qualité qui ramène l'encodage sous ACCEPTED_SIZE, en supposant une
+    taille WebP proportionnelle à quality^1.5 sur la plage 30-60.
+    """
+    ratio = (ACCEPTED_SIZE / size_at_max) ** (1 / 1.5)
+    quality = int(MAX_QUALITY * ratio) // QUALITY_STEP * QUALITY_STEP
+    return max(MIN_QUALITY, min(MAX_QUALITY - QUALITY_STEP, quality))
+
+
+def _compress_to_target(image: Image.Image) -> Dict[str, Any]:
+    """
+    Cherche la meilleure qualité tenant dans ACCEPTED_SIZE : un encodage à la
+    qualité max (cas courant), puis une qualité prédite, puis une recherche
+    dichotomique en dessous si la prédiction était trop optimiste.
+    Retourne {"data", "quality"} ; à défaut, l'encodage à MIN_QUALITY.
+    """
+    data = _encode_webp(image, MAX_QUALITY)
+    if len(data) <= ACCEPTED_SIZE:
+        return {"data": data, "quality": MAX_QUALITY}
+
+    quality = _predict_quality(len(data))
+    data = _encode_webp(image, quality)
+    if len(data) <= ACCEPTED_SIZE:
+        return {"data": data, "quality": quality}
+
+    best: Optional[Dict[str, Any]] = None
+    smallest = {"data": data, "quality": quality}
+    low, high = MIN_QUALITY // QUALITY_STEP, quality // QUALITY_STEP - 1
+    while low <= high:
+        step = (low + high) // 2
+        candidate_quality = step * QUALITY_STEP
+        data = _encode_webp(image, candidate_quality)
+        if len(data) <= ACCEPTED_SIZE:
+            best = {"data": data, "quality": candidate_quality}
+            low = step + 1
+        else:
+            smallest = {"data": data, "quality": candidate_quality}
+            high = step - 1
+    return best or smallest
+
+
+def variant_filename(filename: str, width: int) -> str:
+    """Nom de la déclinaison `width` d'une image (`abc.webp` -> `abc_400.webp`)."""
+    stem, _, _ = filename.rpartition(".")
+    return f"{stem}_{width}.webp"
+
+
+def _write_variants(image: Image.Image, file_path: str, max_width: int, max_bytes: int) -> Dict[str, Any]:
+    """
+    Écrit les déclinaisons plus étroites (`max_width`) et plus légères
+    (`max_bytes`) que l'image principale : une déclinaison plus lourde que
+    l'image canonique ferait télécharger plus via srcset.
+    De la plus grande à la plus petite, chacune réduite depuis la précédente.
+    Retourne {"variants": {largeur: nom de fichier}, "lqip": data URI}.
+    """
+    directory, filename = os.path.split(file_path)
+    variants: Dict[str, str] = {}
+    current = image
+    for width in sorted(VARIANT_WIDTHS, reverse=True):
+        if width >= max_width or image.width <= width:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        current = current.resize((width, height), Image.Resampling.LANCZOS)
+        data = _encode_webp(current, VARIANT_QUALITY, method=4)
+        if len(data) >= max_bytes:
+            continue
+        name = variant_filename(filename, width)
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        variants[str(width)] = name
+
+    lqip_height = max(1, round(image.height * LQIP_WIDTH / image.width))
+    lqip = _encode_webp(current.resize((LQIP_WIDTH, lqip_height), Image.Resampling.BILINEAR), LQIP_QUALITY, method=4)
+    return {
+        "variants": variants,
+        "lqip": "data:image/webp;base64," + base64.b64encode(lqip).decode("ascii"),
+    }
+
+
+def process_upload_image(source_path: str, file_path: str) -> Dict[str, Any]:
+    """
+    Convertit l'image uploadée `source_path` en WebP et l'écrit dans `file_path`.
+    - > 1MB : redimensionnement vers ~400KB puis compression à qualité cible ;
+    - sinon : vignette 800x800 qualité 75.
+    Génère aussi les déclinaisons responsive (VARIANT_WIDTHS plus étroites et plus
+    légères que l'image principale) et un placeholder LQIP, à partir de l'image
+    pleine résolution.
+    Exécuté dans le pool de processus.
+    """
+    image = Image.open(source_path)
+    image.load()  # Décode et referme le fichier source
+    image = _to_rgb(image)
+    original = image
+    original_size = image.size
+
+    if os.path.getsize(source_path) > COMPRESSION_THRESHOLD:
+        # Estimation: qualité 60 WebP ~= 0.1-0.2 bytes par pixel selon complexité
+        target_pixels = TARGET_SIZE * 8
+        current_pixels = image.size[0] * image.size[1]
+        if current_pixels > target_pixels:
+            scale_factor = (target_pixels / current_pixels) ** 0.5
+            new_size = (int(image.size[0] * scale_factor), int(image.size[1] * scale_factor))
+            # S'assurer que la taille minimale est respectée
+            new_size = (max(new_size[0], 400), max(new_size[1], 400))
+            image = image.resize(new_size, Image.Resampling.LANCZOS)
+        result = _compress_to_target(image)
+        data, quality = result["data"], result["quality"]
+    else:
+        image = image.copy()
+        image.thumbnail((800, 800), Image.Resampling.LANCZOS)
+        quality = 75
+        data = _encode_webp(image, quality, method=4)
+
+    with open(file_path, "wb") as f:
+        f.write(data)
+    responsive = _write_variants(original, file_path, max_width=image.width, max_bytes=len(data))
+
+    return {
+        "original_size": original_size,
+        "size": image.size,
+        "bytes": len(data),
+        "quality": quality,
+        "variants": responsive["variants"],
+        "lqip": responsive["lqip"],
+    }
+
+
+class ImageProcessingPool:
+    """Pool de processus borné pour le traitement d'image."""
+
+    def __init__(self, workers: int = IMAGE_WORKERS, queue_limit: int = IMAGE_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._in_flight >= self.queue_limit:
+            raise ImagePoolSaturated()
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_pool = ImageProcessingPool()
@@ -1,25 +1,55 @@
 """
 Module d'envoi d'emails via SMTP
-Support SSL (port 465) et STARTTLS (port 587)
+Support SSL (port 465), STARTTLS (port 587) et SMTP sans chiffrement (relais local)
+
+Les connexions SMTP authentifiées sont gardées ouvertes et réutilisées
+(`smtp_pool`) au lieu d'une connexion + TLS + LOGIN par email. Les envois passent
+par `mail_queue`, file asyncio du processus : MAIL_CONCURRENCY tâches dépilent
+les emails par lots (jusqu'à MAIL_BATCH_SIZE messages consécutifs envoyés sur
+la même connexion), hors de la boucle d'événements.
+
+    MAIL_POOL_SIZE                   (2)    connexions inactives gardées par serveur SMTP
+    MAIL_CONNECTION_IDLE_SECONDS     (60)   au-delà, la connexion inactive est refermée
+    MAIL_MAX_MESSAGES_PER_CONNECTION (100)  reconnexion après N messages (limites fournisseurs)
+    MAIL_CONCURRENCY                 (2)    envois simultanés
+    MAIL_BATCH_SIZE                  (20)
+    MAIL_QUEUE_SIZE                  (1000) au-delà, enqueue() attend qu'une place se libère
+    MAIL_DRAIN_TIMEOUT               (30)   délai d'envoi des emails restants à l'arrêt
 """
+import asyncio
 import os
 import smtplib
 import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+
+from utils.settings_cache import settings_cache
 
 logger = logging.getLogger(__name__)
 
+MAIL_POOL_SIZE = int(os.environ.get("MAIL_POOL_SIZE", "2"))
+MAIL_CONNECTION_IDLE_SECONDS = float(os.environ.get("MAIL_CONNECTION_IDLE_SECONDS", "60"))
+MAIL_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get("MAIL_MAX_MESSAGES_PER_CONNECTION", "100"))
+MAIL_CONCURRENCY = int(os.environ.get("MAIL_CONCURRENCY", "2"))
+MAIL_BATCH_SIZE = int(os.environ.get("MAIL_BATCH_SIZE", "20"))
+MAIL_QUEUE_SIZE = int(os.environ.get("MAIL_QUEUE_SIZE", "1000"))
+MAIL_DRAIN_TIMEOUT = float(os.environ.get("MAIL_DRAIN_TIMEOUT", "30"))
+
+SMTP_TIMEOUT_SECONDS = 10
+
 
 async def get_email_config(db) -> Dict[str, Any]:
     """Récupère la config email depuis settings DB (priorité) puis env vars"""
-    # Récupérer depuis DB
-    email_enabled_setting = await db.settings.find_one({"key": "email_notif_enabled"}, {"_id": 0})
-    admin_email_setting = await db.settings.find_one({"key": "admin_notif_email"}, {"_id": 0})
+    # Récupérer depuis DB (via le cache settings)
+    db_settings = await settings_cache.get_many(db, ["email_notif_enabled", "admin_notif_email"])
     
-    email_enabled = email_enabled_setting.get("value", False) if email_enabled_setting else None
-    admin_email = admin_email_setting.get("value") if admin_email_setting else None
+    email_enabled = db_settings.get("email_notif_enabled", False) if "email_notif_enabled" in db_settings else None
+    admin_email = db_settings.get("admin_notif_email")
     
     # Fallback sur env vars
     if email_enabled is None:
@@ -41,54 +71,189 @@ async def get_email_config(db) -> Dict[str, Any]:
     }
 
 
-def send_email_sync(config: Dict[str, Any], to: str, subject: str, html_body: str, text_body: Optional[str] = None):
-    """Envoie un email de façon synchrone (à appeler depuis BackgroundTasks)"""
+def _can_send(config: Dict[str, Any], to: str) -> bool:
     if not config.get("enabled", False):
         logger.info(f"Email notifications désactivées, skip envoi à {to}")
-        return
+        return False
     
     if not config.get("smtp_host") or not config.get("smtp_user") or not config.get("smtp_pass"):
         logger.warning("Configuration SMTP incomplète, impossible d'envoyer l'email")
-        return
+        return False
+    return True
+
+
+def build_message(config: Dict[str, Any], to: str, subject: str, html_body: str, text_body: Optional[str] = None) -> MIMEMultipart:
+    msg = MIMEMultipart("alternative")
+    msg["From"] = config.get("smtp_from") or config.get("smtp_user", "")
+    msg["To"] = to
+    msg["Subject"] = subject
     
-    try:
-        # Créer le message
-        msg = MIMEMultipart("alternative")
-        msg["From"] = config.get("smtp_from") or config.get("smtp_user", "")
-        msg["To"] = to
-        msg["Subject"] = subject
-        
-        # Ajouter le texte brut si fourni
-        if text_body:
-            msg.attach(MIMEText(text_body, "plain"))
-        
-        # Ajouter le HTML
-        msg.attach(MIMEText(html_body, "html"))
-        
-        # Connexion SMTP
-        smtp_host = config["smtp_host"]
-        smtp_port = config["smtp_port"]
-        smtp_user = config["smtp_user"]
-        smtp_pass = config["smtp_pass"]
-        tls_mode = config.get("smtp_tls_mode", "starttls")
-        
-        if tls_mode == "ssl":
-            # SSL/TLS (port 465)
-            server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=10)
-        else:
+    # Ajouter le texte brut si fourni
+    if text_body:
+        msg.attach(MIMEText(text_body, "plain"))
+    
+    # Ajouter le HTML
+    msg.attach(MIMEText(html_body, "html"))
+    return msg
+
+
+def _server_key(config: Dict[str, Any]) -> Tuple[str, int, str, str]:
+    return (config["smtp_host"], int(config["smtp_port"]), config["smtp_user"], config.get("smtp_tls_mode", "starttls"))
+
+
+def open_smtp_connection(config: Dict[str, Any]) -> smtplib.SMTP:
+    """Connexion SMTP authentifiée (SSL, STARTTLS ou sans chiffrement selon smtp_tls_mode)."""
+    smtp_host = config["smtp_host"]
+    smtp_port = config["smtp_port"]
+    tls_mode = config.get("smtp_tls_mode", "starttls")
+    
+    if tls_mode == "ssl":
+        # SSL/TLS (port 465)
+        server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=SMTP_TIMEOUT_SECONDS)
+    else:
+        server = smtplib.SMTP(smtp_host, smtp_port, timeout=SMTP_TIMEOUT_SECONDS)
+        if tls_mode != "none":
             # STARTTLS (port 587)
-            server = smtplib.SMTP(smtp_host, smtp_port, timeout=10)
             server.starttls()
-        
-        # Authentification
-        server.login(smtp_user, smtp_pass)
-        
-        # Envoi
-        server.send_message(msg)
+    
+    try:
+        server.login(config["smtp_user"], config["smtp_pass"])
+    except Exception:
+        _close_quietly(server)
+        raise
+    return server
+
+
+def _close_quietly(server: smtplib.SMTP) -> None:
+    try:
         server.quit()
-        
+    except Exception:
+        server.close()
+
+
+class _PooledConnection:
+    def __init__(self, key: Tuple[str, int, str, str], server: smtplib.SMTP):
+        self.key = key
+        self.server = server
+        self.sent = 0
+        self.released_at = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Connexions SMTP authentifiées réutilisables, par serveur (hôte, port, compte).
+    Une connexion n'est utilisée que par un thread à la fois (acquire/release).
+    """
+
+    def __init__(
+        self,
+        max_idle: int = MAIL_POOL_SIZE,
+        idle_seconds: float = MAIL_CONNECTION_IDLE_SECONDS,
+        max_messages: int = MAIL_MAX_MESSAGES_PER_CONNECTION
+    ):
+        self.max_idle = max_idle
+        self.idle_seconds = idle_seconds
+        self.max_messages = max_messages
+        self._idle: Dict[Tuple[str, int, str, str], List[_PooledConnection]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, config: Dict[str, Any]) -> _PooledConnection:
+        key = _server_key(config)
+        expired = []
+        connection = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                candidate = idle.pop()
+                if time.monotonic() - candidate.released_at < self.idle_seconds:
+                    connection = candidate
+                    break
+                expired.append(candidate)
+        for stale in expired:
+            _close_quietly(stale.server)
+        if connection is None:
+            connection = _PooledConnection(key, open_smtp_connection(config))
+        return connection
+
+    def release(self, connection: _PooledConnection, reusable: bool = True) -> None:
+        if reusable and connection.sent < self.max_messages:
+            connection.released_at = time.monotonic()
+            with self._lock:
+                idle = self._idle.setdefault(connection.key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(connection)
+                    return
+        _close_quietly(connection.server)
+
+    def send_batch(self, config: Dict[str, Any], messages: List[MIMEMultipart]) -> List[Optional[Exception]]:
+        """
+        Envoie les messages sur une même connexion ; retourne l'erreur de chaque
+        message (None si envoyé). Une connexion coupée par le serveur (inactivité)
+        est rouverte et le message renvoyé une fois. Si la connexion devient
+        inutilisable en cours de lot, les messages déjà envoyés restent à None et
+        les suivants reçoivent l'erreur. Seul l'échec de la première connexion
+        (serveur injoignable, authentification) est levé.
+        """
+        results: List[Optional[Exception]] = []
+        connection: Optional[_PooledConnection] = self.acquire(config)
+        reusable = True
+        try:
+            for index, msg in enumerate(messages):
+                try:
+                    if connection is None:
+                        connection = self.acquire(config)
+                    try:
+                        connection.server.send_message(msg)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                        raise
+                    except (smtplib.SMTPServerDisconnected, ConnectionError):
+                        _close_quietly(connection.server)
+                        connection = _PooledConnection(connection.key, open_smtp_connection(config))
+                        connection.server.send_message(msg)
+                    connection.sent += 1
+                    results.append(None)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    # Refus propre au message : la connexion reste utilisable
+                    results.append(e)
+                except Exception as e:
+                    # Connexion inutilisable : les messages restants ne sont pas envoyés
+                    reusable = False
+                    results.extend([e] * (len(messages) - index))
+                    break
+                if connection.sent >= self.max_messages:
+                    self.release(connection)
+                    connection = None
+        finally:
+            if connection is not None:
+                self.release(connection, reusable=reusable and len(results) == len(messages))
+        return results
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for connection in connections:
+            _close_quietly(connection.server)
+
+
+smtp_pool = SMTPConnectionPool()
+
+
+def _log_delivery(to: str, subject: str, error: Optional[Exception]) -> None:
+    if error is None:
         logger.info(f"Email envoyé avec succès à {to}: {subject}")
-        
+    else:
+        logger.error(f"Erreur lors de l'envoi d'email à {to}: {str(error)}")
+
+
+def send_email_sync(config: Dict[str, Any], to: str, subject: str, html_body: str, text_body: Optional[str] = None):
+    """Envoie un email de façon synchrone sur une connexion du pool (scripts, threads)"""
+    if not _can_send(config, to):
+        return
+    
+    try:
+        msg = build_message(config, to, subject, html_body, text_body)
+        _log_delivery(to, subject, smtp_pool.send_batch(config, [msg])[0])
     except smtplib.SMTPAuthenticationError as e:
         logger.error(f"Erreur d'authentification SMTP: {str(e)}")
     except smtplib.SMTPException as e:
@@ -96,3 +261,138 @@ def send_email_sync(config: Dict[str, Any], to: str, subject: str, html_body: st
     except Exception as e:
         logger.error(f"Erreur lors de l'envoi d'email à {to}: {str(e)}")
 
+
+@dataclass
+class MailJob:
+    config: Dict[str, Any]
+    to: str
+    subject: str
+    html_body: str
+    text_body: Optional[str] = None
+    # Résultat attendu par deliver() : None si envoyé, sinon l'erreur
+    result: Optional[asyncio.Future] = None
+
+
+class MailQueue:
+    """File d'envoi asyncio du processus (démarrée/arrêtée avec l'API)."""
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool = smtp_pool,
+        concurrency: int = MAIL_CONCURRENCY,
+        batch_size: int = MAIL_BATCH_SIZE,
+        max_size: int = MAIL_QUEUE_SIZE
+    ):
+        self.pool = pool
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def enqueue(
+        self,
+        config: Dict[str, Any],
+        to: str,
+        subject: str,
+        html_body: str,
+        text_body: Optional[str] = None
+    ) -> None:
+        """
+        Programme l'envoi d'un email. File non démarrée (scripts CLI) :
+        envoi immédiat dans un thread.
+        """
+        if not _can_send(config, to):
+            return
+        job = MailJob(config, to, subject, html_body, text_body)
+        if self._queue is None:
+            await asyncio.to_thread(self._deliver, [job])
+            return
+        await self._queue.put(job)
+
+    async def deliver(
+        self,
+        config: Dict[str, Any],
+        to: str,
+        subject: str,
+        html_body: str,
+        text_body: Optional[str] = None
+    ) -> Optional[Exception]:
+        """
+        Envoie un email via la file (lots, connexions réutilisées) et attend le
+        résultat : None si le serveur SMTP l'a accepté, sinon l'erreur.
+        """
+        if not config.get("smtp_host") or not config.get("smtp_user") or not config.get("smtp_pass"):
+            return RuntimeError("Configuration SMTP incomplète")
+        job = MailJob(config, to, subject, html_body, text_body)
+        if self._queue is None:
+            return (await asyncio.to_thread(self._deliver, [job]))[0]
+        job.result = asyncio.get_running_loop().create_future()
+        await self._queue.put(job)
+        return await job.result
+
+    async def _worker(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            # Emails déjà en attente : envoyés dans la foulée sur la même connexion
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                errors = await asyncio.to_thread(self._deliver, batch)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'envoi d'un lot d'emails: {str(e)}", exc_info=True)
+                errors = [e] * len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            for job, error in zip(batch, errors):
+                if job.result is not None and not job.result.done():
+                    job.result.set_result(error)
+
+    def _deliver(self, jobs: List[MailJob]) -> List[Optional[Exception]]:
+        """Envoie les jobs regroupés par serveur SMTP ; retourne l'erreur de chaque job (ordre d'entrée)."""
+        errors: Dict[int, Optional[Exception]] = {}
+        by_server: "OrderedDict[Tuple[str, int, str, str], List[int]]" = OrderedDict()
+        for index, job in enumerate(jobs):
+            by_server.setdefault(_server_key(job.config), []).append(index)
+        for indexes in by_server.values():
+            config = jobs[indexes[0]].config
+            try:
+                messages = [build_message(config, jobs[i].to, jobs[i].subject, jobs[i].html_body, jobs[i].text_body) for i in indexes]
+                results = self.pool.send_batch(config, messages)
+            except smtplib.SMTPAuthenticationError as e:
+                logger.error(f"Erreur d'authentification SMTP: {str(e)}")
+                results = [e] * len(indexes)
+            except Exception as e:
+                logger.error(f"Erreur SMTP, {len(indexes)} email(s) non envoyé(s): {str(e)}")
+                results = [e] * len(indexes)
+            for i, error in zip(indexes, results):
+                _log_delivery(jobs[i].to, jobs[i].subject, error)
+                errors[i] = error
+        return [errors[i] for i in range(len(jobs))]
+
+    async def stop(self, timeout: float = MAIL_DRAIN_TIMEOUT) -> None:
+        """Envoie les emails en attente (dans la limite de `timeout`) puis ferme les connexions."""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"{self._queue.qsize()} email(s) non envoyé(s) à l'arrêt")
+            for task in self._workers:
+                task.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._queue = None
+            self._workers = []
+        await asyncio.to_thread(self.pool.close_all)
+
+
+mail_queue = MailQueue()
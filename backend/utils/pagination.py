@@ -0,0 +1,102 @@
+"""
+Pagination par curseur (keyset) pour les listes de l'API.
+Le curseur encode la clé de tri (valeur du champ + id) du dernier élément renvoyé :
+la page suivante est obtenue par un seek sur l'index au lieu d'un skip.
+"""
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+DEFAULT_CURSOR_LIMIT = 50
+MAX_CURSOR_LIMIT = 500
+
+
+def encode_cursor(doc: Dict[str, Any], field: str = "created_at") -> str:
+    payload = {"f": field, "v": doc.get(field), "id": doc.get("id")}
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], field: str = "created_at") -> Optional[Dict[str, Any]]:
+    """
+    Décode un curseur. Une chaîne vide (`?cursor=`) demande la première page
+    en mode curseur et retourne None.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    if not isinstance(payload, dict) or payload.get("f") != field or not payload.get("id"):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    return payload
+
+
+def keyset_filter(
+    position: Optional[Dict[str, Any]],
+    field: str = "created_at",
+    direction: int = -1
+) -> Dict[str, Any]:
+    """
+    Filtre "strictement après `position`" pour un tri (field: direction, id: 1).
+    Les documents sans valeur pour `field` sont triés comme null par MongoDB
+    (en fin de liste en tri décroissant, en début en tri croissant).
+    """
+    if position is None:
+        return {}
+    value = position.get("v")
+    last_id = position.get("id")
+    same_value_after = {field: value, "id": {"$gt": last_id}}
+
+    if value is None:
+        if direction < 0:
+            return same_value_after
+        return {"$or": [{field: {"$ne": None}}, same_value_after]}
+
+    clauses = [{field: {"$lt" if direction < 0 else "$gt": value}}, same_value_after]
+    if direction < 0:
+        clauses.append({field: None})
+    return {"$or": clauses}
+
+
+def merge_filters(*filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine plusieurs filtres Mongo (via $and si nécessaire)."""
+    non_empty = [f for f in filters if f]
+    if not non_empty:
+        return {}
+    if len(non_empty) == 1:
+        return non_empty[0]
+    return {"$and": non_empty}
+
+
+def split_page(items: List[dict], limit: int, field: str = "created_at") -> Tuple[List[dict], Optional[str]]:
+    """
+    `items` contient jusqu'à limit + 1 éléments : s'il y en a plus que `limit`,
+    une page suivante existe et son curseur pointe sur le dernier élément gardé.
+    """
+    if len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    return page, encode_cursor(page[-1], field)
+
+
+async def paginate_keyset(
+    collection,
+    query: Dict[str, Any],
+    projection: Dict[str, Any],
+    cursor: Optional[str],
+    limit: int,
+    field: str = "created_at",
+    direction: int = -1
+) -> Tuple[List[dict], Optional[str]]:
+    """Retourne (page, next_cursor) pour une collection triée par (field, id)."""
+    position = decode_cursor(cursor, field)
+    filters = merge_filters(query, keyset_filter(position, field, direction))
+    items = await collection.find(filters, projection).sort(
+        [(field, direction), ("id", 1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    return split_page(items, limit, field)
@@ -0,0 +1,176 @@
+"""
+Limitation de débit partagée entre workers (fenêtre glissante approchée).
+
+Chaque clé (IP, email, utilisateur) garde deux compteurs : la fenêtre fixe
+courante et la précédente. Le nombre de requêtes sur la dernière fenêtre
+glissante est estimé par
+
+    précédente * (part de la précédente encore couverte) + courante
+
+ce qui donne une vérification en O(1) et un seul état par clé.
+
+Stockage (RATE_LIMIT_BACKEND) :
+    mongo   (défaut) un document par clé dans `rate_limits`, mis à jour en une
+            seule opération atomique ; expiration par index TTL (indexes.py).
+            Partagé entre tous les workers et conteneurs.
+    memory  dictionnaire LRU borné à RATE_LIMIT_MEMORY_SIZE clés, propre au
+            processus (développement, tests).
+Si MongoDB est indisponible, la vérification se replie sur la mémoire locale.
+RATE_LIMIT_ENABLED=false désactive toutes les limites (tests de charge).
+
+Les clés sont hachées : aucun email ni IP n'est stocké en clair.
+
+    login_limiter = RateLimiter("login", max_hits=10, window_seconds=300)
+
+    @api_router.post("/auth/login", dependencies=[Depends(login_limiter.dependency(db))])
+"""
+import hashlib
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "mongo").strip().lower()
+RATE_LIMIT_MEMORY_SIZE = int(os.environ.get("RATE_LIMIT_MEMORY_SIZE", "10000"))
+
+RATE_LIMIT_COLLECTION = "rate_limits"
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    # Secondes avant que la fenêtre courante ne se termine (en-tête Retry-After)
+    retry_after: int
+
+
+def client_ip(request: Request) -> str:
+    """IP du client (X-Forwarded-For déjà résolu par uvicorn/gunicorn derrière nginx)."""
+    return request.client.host if request.client else "unknown"
+
+
+def _hash_key(name: str, key: str) -> str:
+    digest = hashlib.sha256(f"{name}:{key}".encode("utf-8")).hexdigest()[:32]
+    return f"{name}:{digest}"
+
+
+def _estimate(previous: int, current: int, elapsed_fraction: float) -> float:
+    return previous * (1.0 - elapsed_fraction) + current
+
+
+class _MemoryWindows:
+    """Compteurs (fenêtre, courante, précédente) par clé, éviction LRU."""
+
+    def __init__(self, max_size: int = RATE_LIMIT_MEMORY_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[int, int, int]]" = OrderedDict()
+
+    def hit(self, key: str, window: int) -> Tuple[int, int]:
+        stored_window, current, previous = self._entries.get(key, (window, 0, 0))
+        if stored_window == window - 1:
+            previous, current = current, 0
+        elif stored_window != window:
+            previous, current = 0, 0
+        current += 1
+        self._entries[key] = (window, current, previous)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return previous, current
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_memory_windows = _MemoryWindows()
+
+
+async def _mongo_hit(db, key: str, window: int, window_seconds: float) -> Tuple[int, int]:
+    """Bascule de fenêtre et incrément en une seule mise à jour (pipeline)."""
+    expires_at = datetime.fromtimestamp((window + 2) * window_seconds, tz=timezone.utc)
+    update = [{"$set": {
+        # Les expressions d'un même $set lisent le document avant mise à jour
+        "previous": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$window", window]}, "then": "$previous"},
+                {"case": {"$eq": ["$window", window - 1]}, "then": "$current"},
+            ],
+            "default": 0,
+        }},
+        "current": {"$cond": [{"$eq": ["$window", window]}, {"$add": ["$current", 1]}, 1]},
+        "window": window,
+        "expires_at": expires_at,
+    }}]
+    collection = db[RATE_LIMIT_COLLECTION]
+    try:
+        doc = await collection.find_one_and_update(
+            {"_id": key}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Deux upserts simultanés sur une clé neuve : le document existe désormais
+        doc = await collection.find_one_and_update(
+            {"_id": key}, update, return_document=ReturnDocument.AFTER
+        )
+    return doc.get("previous", 0), doc.get("current", 1)
+
+
+class RateLimiter:
+    def __init__(self, name: str, max_hits: int, window_seconds: float, backend: Optional[str] = None):
+        self.name = name
+        self.max_hits = max_hits
+        self.window_seconds = window_seconds
+        self.backend = backend or RATE_LIMIT_BACKEND
+
+    async def hit(self, db, key: str) -> RateLimitResult:
+        """
+        Compte une requête pour `key` et indique si elle reste sous la limite.
+        Les requêtes refusées sont comptées aussi : un client qui insiste reste bloqué.
+        """
+        if not RATE_LIMIT_ENABLED:
+            return RateLimitResult(allowed=True, retry_after=0)
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed_fraction = (now % self.window_seconds) / self.window_seconds
+        storage_key = _hash_key(self.name, key)
+
+        counts = None
+        if self.backend == "mongo" and db is not None:
+            try:
+                counts = await _mongo_hit(db, storage_key, window, self.window_seconds)
+            except PyMongoError as e:
+                logger.warning(f"Rate limit {self.name} : MongoDB indisponible, repli en mémoire ({str(e)})")
+        if counts is None:
+            counts = _memory_windows.hit(storage_key, window)
+
+        previous, current = counts
+        retry_after = max(1, math.ceil(self.window_seconds * (1.0 - elapsed_fraction)))
+        return RateLimitResult(
+            allowed=_estimate(previous, current, elapsed_fraction) <= self.max_hits,
+            retry_after=retry_after,
+        )
+
+    async def enforce(self, db, key: str) -> None:
+        """Comme hit(), mais lève une HTTPException 429 au-delà de la limite."""
+        result = await self.hit(db, key)
+        if not result.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Trop de requêtes, veuillez réessayer dans quelques instants",
+                headers={"Retry-After": str(result.retry_after)},
+            )
+
+    def dependency(self, db, key: Callable[[Request], str] = client_ip):
+        """Dépendance FastAPI appliquant la limite à la clé extraite de la requête (IP par défaut)."""
+        async def check_rate_limit(request: Request):
+            await self.enforce(db, key(request))
+        return check_rate_limit
@@ -0,0 +1,170 @@
+"""
+Recherche plein texte du catalogue (articles et articles mini-site).
+
+Chaque document indexable porte deux tableaux :
+- `search_terms` : mots normalisés (minuscules, sans accents) du nom et de la
+  description, plus leur radical français ;
+- `search_name_terms` : idem pour le nom seul (bonus de pertinence).
+
+`search_terms` est couvert par un index multikey (voir indexes.py). Chaque mot de la requête doit
+correspondre à un terme du document, soit par préfixe du mot normalisé (regex
+ancrée, servie par l'index), soit par égalité de radical ("chaussures" trouve
+"chaussure"). La pertinence compte les termes exacts trouvés, le nom pesant plus.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+SEARCH_TERMS_FIELD = "search_terms"
+SEARCH_NAME_TERMS_FIELD = "search_name_terms"
+SEARCH_SCORE_FIELD = "search_score"
+
+# Champs techniques à exclure des réponses API
+SEARCH_HIDDEN_FIELDS = [SEARCH_TERMS_FIELD, SEARCH_NAME_TERMS_FIELD]
+SEARCH_FIELDS_EXCLUDED = {field: 0 for field in SEARCH_HIDDEN_FIELDS}
+
+# Poids d'un terme trouvé dans le nom par rapport à la description
+NAME_BOOST = 3
+
+# Garde-fous sur la taille des tableaux indexés et des requêtes
+MAX_DOCUMENT_TERMS = 300
+MAX_QUERY_TERMS = 8
+MIN_STEM_LENGTH = 3
+
+FRENCH_STOPWORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "d", "dans", "de", "des", "du", "en",
+    "et", "l", "la", "le", "les", "ou", "par", "pour", "sans", "sur", "un", "une",
+}
+
+# Suffixes flexionnels / dérivationnels courants, du plus long au plus court
+_FRENCH_SUFFIXES: Tuple[Tuple[str, str], ...] = (
+    ("issements", "iss"),
+    ("issement", "iss"),
+    ("ements", ""),
+    ("ement", ""),
+    ("ations", "at"),
+    ("ation", "at"),
+    ("euses", "eu"),
+    ("euse", "eu"),
+    ("eaux", "eau"),
+    ("aux", "al"),
+    ("iques", "ic"),
+    ("ique", "ic"),
+    ("ives", "if"),
+    ("ive", "if"),
+    ("ables", ""),
+    ("able", ""),
+    ("es", ""),
+    ("s", ""),
+    ("x", ""),
+    ("e", ""),
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold_text(text: Optional[str]) -> str:
+    """Minuscules et suppression des accents ("Été" -> "ete")."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Mots normalisés du texte, sans les mots vides."""
+    return [word for word in _WORD_RE.findall(fold_text(text)) if word not in FRENCH_STOPWORDS]
+
+
+def stem(word: str) -> str:
+    """Racinisation légère du français (pluriels et suffixes fréquents)."""
+    if word.isdigit():
+        return word
+    for suffix, replacement in _FRENCH_SUFFIXES:
+        if word.endswith(suffix):
+            candidate = word[: -len(suffix)] + replacement
+            if len(candidate) >= MIN_STEM_LENGTH:
+                return candidate
+    return word
+
+
+def _terms(texts: Iterable[Optional[str]]) -> List[str]:
+    terms: Dict[str, None] = {}
+    for text in texts:
+        for word in tokenize(text):
+            terms.setdefault(word, None)
+            terms.setdefault(stem(word), None)
+            if len(terms) >= MAX_DOCUMENT_TERMS:
+                return list(terms)
+    return list(terms)
+
+
+def search_fields(name: Optional[str], description: Optional[str]) -> Dict[str, List[str]]:
+    """Champs de recherche à enregistrer avec un article (création et mise à jour)."""
+    return {
+        SEARCH_TERMS_FIELD: _terms([name, description]),
+        SEARCH_NAME_TERMS_FIELD: _terms([name]),
+    }
+
+
+class SearchQuery:
+    """Requête de recherche analysée : filtre MongoDB et expression de score."""
+
+    def __init__(self, raw: Optional[str]):
+        self.raw = raw or ""
+        words = list(dict.fromkeys(tokenize(self.raw)))[:MAX_QUERY_TERMS]
+        self.words = words
+        self.exact_terms = list(dict.fromkeys(words + [stem(word) for word in words]))
+
+    def __bool__(self) -> bool:
+        return bool(self.words)
+
+    def filter(self) -> Dict[str, Any]:
+        """Chaque mot doit matcher un terme du document (préfixe du mot ou radical exact)."""
+        if not self.words:
+            return {}
+        clauses = [
+            {SEARCH_TERMS_FIELD: {"$in": [re.compile("^" + re.escape(word)), stem(word)]}}
+            for word in self.words
+        ]
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def score_expression(self) -> Dict[str, Any]:
+        """Expression d'agrégation du score de pertinence (termes exacts, bonus nom)."""
+        def matches(field: str) -> Dict[str, Any]:
+            return {"$size": {"$setIntersection": [{"$ifNull": [f"${field}", []]}, self.exact_terms]}}
+
+        return {"$add": [
+            matches(SEARCH_TERMS_FIELD),
+            {"$multiply": [NAME_BOOST, matches(SEARCH_NAME_TERMS_FIELD)]},
+        ]}
+
+
+async def backfill_search_fields(collection, batch_size: int = 500) -> int:
+    """
+    Calcule les champs de recherche des documents qui n'en ont pas encore.
+    Retourne le nombre de documents mis à jour.
+    """
+    updated = 0
+    batch = []
+    cursor = collection.find(
+        {SEARCH_TERMS_FIELD: {"$exists": False}},
+        {"_id": 1, "name": 1, "description": 1},
+        batch_size=batch_size
+    )
+    async for doc in cursor:
+        batch.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": search_fields(doc.get("name"), doc.get("description"))}
+        ))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
+
@@ -0,0 +1,97 @@
+"""
+Cache en mémoire de la collection `settings`.
+
+La collection est chargée en une seule requête puis servie depuis la mémoire.
+Le cache est invalidé :
+- localement, à chaque écriture passant par `settings_cache.set()` ;
+- pour les autres workers, par un change stream MongoDB (replica set requis) ;
+- à défaut de change stream, après SETTINGS_CACHE_TTL secondes (30 par défaut).
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CACHE_TTL = float(os.environ.get("SETTINGS_CACHE_TTL", "30"))
+
+
+class SettingsCache:
+    def __init__(self, ttl_seconds: float = SETTINGS_CACHE_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._values: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def _is_fresh(self) -> bool:
+        if self._values is None:
+            return False
+        # Avec un change stream actif, seules les invalidations explicites comptent
+        if self._watch_task is not None and not self._watch_task.done():
+            return True
+        return time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    async def _ensure_loaded(self, db) -> Dict[str, Any]:
+        if self._is_fresh():
+            return self._values
+        async with self._lock:
+            if not self._is_fresh():
+                docs = await db.settings.find({}, {"_id": 0, "key": 1, "value": 1}).to_list(None)
+                self._values = {doc["key"]: doc.get("value") for doc in docs if "key" in doc}
+                self._loaded_at = time.monotonic()
+        return self._values
+
+    async def get(self, db, key: str, default: Any = None) -> Any:
+        values = await self._ensure_loaded(db)
+        return values.get(key, default)
+
+    async def get_many(self, db, keys: Iterable[str]) -> Dict[str, Any]:
+        """Sous-ensemble {clé: valeur} des paramètres existants parmi `keys`."""
+        values = await self._ensure_loaded(db)
+        return {key: values[key] for key in keys if key in values}
+
+    async def all(self, db) -> Dict[str, Any]:
+        return dict(await self._ensure_loaded(db))
+
+    async def set(self, db, key: str, value: Any) -> None:
+        """Écrit un paramètre (upsert) puis invalide le cache."""
+        await db.settings.update_one({"key": key}, {"$set": {"key": key, "value": value}}, upsert=True)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self._values = None
+
+    async def _watch(self, db) -> None:
+        try:
+            async with db.settings.watch() as stream:
+                logger.info("Cache settings : synchronisation par change stream active")
+                # Les écritures antérieures à l'ouverture du stream ne seront pas notifiées
+                self.invalidate()
+                async for _ in stream:
+                    self.invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Instance standalone (pas de replica set) : on retombe sur le TTL
+            logger.info(f"Cache settings : change stream indisponible, expiration après {self.ttl_seconds:.0f}s ({str(e)})")
+        finally:
+            self.invalidate()
+
+    def start_watching(self, db) -> None:
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch(db))
+
+    async def stop_watching(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._watch_task = None
+
+
+settings_cache = SettingsCache()
@@ -0,0 +1,156 @@
+"""
+Réception des fichiers uploadés sans les charger en mémoire.
+
+- `UploadSizeLimitMiddleware` coupe les requêtes d'upload dès que le corps
+  dépasse la limite (Content-Length annoncé ou octets effectivement reçus),
+  avant même l'analyse multipart.
+- `spool_upload` recopie le fichier par blocs vers le disque en appliquant la
+  limite au fil de l'eau, conserve les premiers octets pour identifier le
+  format (magic bytes) et calcule l'empreinte SHA-256 du contenu
+  (déduplication, voir upload_store.py).
+
+La mémoire consommée par upload est donc bornée par UPLOAD_CHUNK_SIZE,
+quelle que soit la taille du fichier.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+SNIFF_BYTES = 1024
+# Marge pour l'enveloppe multipart (boundaries, en-têtes de champ)
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def get_upload_max_mb() -> int:
+    """Limite d'upload en MB (UPLOAD_MAX_MB, jamais moins de 24)."""
+    try:
+        upload_max_mb = int(os.environ.get("UPLOAD_MAX_MB", "24"))
+    except ValueError:
+        upload_max_mb = 24
+    return max(upload_max_mb, 24)
+
+
+def get_upload_max_bytes() -> int:
+    return get_upload_max_mb() * 1024 * 1024
+
+
+class UploadTooLarge(HTTPException):
+    """413 levée dès que le volume reçu dépasse la limite."""
+
+    def __init__(self, received: int, max_bytes: int):
+        super().__init__(
+            status_code=413,
+            detail={
+                "error": "file_too_large",
+                "detail": f"Le fichier est trop volumineux. Taille maximale autorisée : {max_bytes // (1024 * 1024)}MB"
+            }
+        )
+        self.received = received
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """Format d'image d'après la signature des premiers octets (JPEG, PNG, GIF, WEBP)."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+async def spool_upload(file: UploadFile, destination: Path, max_bytes: int) -> Tuple[int, bytes, str]:
+    """
+    Copie `file` vers `destination` par blocs de UPLOAD_CHUNK_SIZE.
+    Lève UploadTooLarge (et supprime la copie partielle) dès que `max_bytes`
+    est dépassé. Retourne (taille totale, premiers SNIFF_BYTES octets, SHA-256 hex).
+    """
+    received = 0
+    head = b""
+    digest = hashlib.sha256()
+    try:
+        with open(destination, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > max_bytes:
+                    raise UploadTooLarge(received, max_bytes)
+                if len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    return received, head, digest.hexdigest()
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Middleware ASGI : refuse avec 413 les requêtes dont le chemin commence par
+    un des `path_prefixes` et dont le corps dépasse la limite d'upload.
+    """
+
+    def __init__(self, app, path_prefixes: Tuple[str, ...]):
+        self.app = app
+        self.path_prefixes = path_prefixes
+
+    async def _reject(self, send, error: UploadTooLarge) -> None:
+        body = json.dumps({"detail": error.detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = get_upload_max_bytes()
+        limit = max_bytes + MULTIPART_OVERHEAD
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    if int(value) > limit:
+                        await self._reject(send, UploadTooLarge(int(value), max_bytes))
+                        return
+                except ValueError:
+                    pass
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Convertie en réponse 413 par les handlers d'exception FastAPI
+                    raise UploadTooLarge(received, max_bytes)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadTooLarge as error:
+            if not response_started:
+                await self._reject(send, error)
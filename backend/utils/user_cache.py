@@ -0,0 +1,93 @@
+"""
+Cache LRU à durée de vie courte des utilisateurs authentifiés.
+
+Les endpoints résolvent l'utilisateur du JWT (sujet = email) via
+`user_cache.get_by_email()` au lieu d'un `db.users.find_one` par requête.
+Toute écriture sur un utilisateur (rôles, profil, avatar, mot de passe,
+suppression, abonnement Stripe) doit appeler `user_cache.invalidate()`.
+Entre plusieurs workers, la cohérence est bornée par USER_CACHE_TTL (secondes).
+"""
+import copy
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "2048"))
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Applique une projection MongoDB simple (inclusion ou exclusion de premier niveau)."""
+    if not projection:
+        return copy.deepcopy(doc)
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        return {field: copy.deepcopy(doc[field]) for field in included if field in doc}
+    excluded = {field for field, flag in projection.items() if not flag}
+    return {field: copy.deepcopy(value) for field, value in doc.items() if field not in excluded}
+
+
+class UserCache:
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._email_by_id: Dict[str, str] = {}
+
+    def _lookup(self, email: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        expires_at, doc = entry
+        if expires_at < time.monotonic():
+            self._discard(email)
+            return None
+        self._entries.move_to_end(email)
+        return doc
+
+    def _store(self, email: str, doc: Dict[str, Any]) -> None:
+        self._entries[email] = (time.monotonic() + self.ttl_seconds, doc)
+        self._entries.move_to_end(email)
+        if doc.get("id"):
+            self._email_by_id[doc["id"]] = email
+        while len(self._entries) > self.max_size:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            if evicted.get("id"):
+                self._email_by_id.pop(evicted["id"], None)
+
+    def _discard(self, email: str) -> None:
+        entry = self._entries.pop(email, None)
+        if entry is not None and entry[1].get("id"):
+            self._email_by_id.pop(entry[1]["id"], None)
+
+    async def get_by_email(
+        self,
+        db,
+        email: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Document utilisateur (sans `_id`) pour cet email, ou None.
+        Retourne une copie : le modifier n'altère pas le cache.
+        """
+        doc = self._lookup(email)
+        if doc is None:
+            doc = await db.users.find_one({"email": email}, {"_id": 0})
+            if doc is None:
+                return None
+            self._store(email, doc)
+        return _project(doc, projection)
+
+    def invalidate(self, email: Optional[str] = None, user_id: Optional[str] = None) -> None:
+        if user_id and user_id in self._email_by_id:
+            self._discard(self._email_by_id[user_id])
+        if email:
+            self._discard(email)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._email_by_id.clear()
+
+
+user_cache = UserCache()
@@ -6,7 +6,7 @@ import { Input } from '../components/ui/input';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../components/ui/select';
 import { Search, Filter, ArrowUpDown, ShoppingBag, Star, Zap, X, Store } from 'lucide-react';
 import api from '../utils/api';
-import { resolveImageUrl } from '../utils/images';
+import { buildSrcSet, resolveImageUrl } from '../utils/images';
 import { Loader2 } from 'lucide-react';
 
 export const Home = () => {
@@ -159,6 +159,7 @@ export const Home = () => {
                 <SelectItem value="recent">Plus récents</SelectItem>
                 <SelectItem value="price_low">Prix croissant</SelectItem>
                 <SelectItem value="views">Populaires</SelectItem>
+                <SelectItem value="relevance">Pertinence</SelectItem>
               </SelectContent>
             </Select>
           </div>
@@ -175,6 +176,7 @@ export const Home = () => {
               if (!article) return null;
               const discount = calculateDiscount(article.price, article.reference_price);
               const imageUrl = resolveImageUrl(article.photos?.[0]);
+              const imageVariants = article.photo_variants?.[0];
               const vendor = article.vendor;
               const vendorName = vendor?.seller_name || vendor?.minisite_name || 'Boutique';
 
@@ -189,8 +191,11 @@ export const Home = () => {
                     {imageUrl ? (
                       <img
                         src={imageUrl}
+                        srcSet={buildSrcSet(imageVariants, article.photos?.[0])}
+                        sizes="(min-width: 1024px) 25vw, (min-width: 640px) 33vw, 50vw"
                         alt={article.name}
                         className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-105"
+                        style={imageVariants?.lqip ? { backgroundImage: `url(${imageVariants.lqip})`, backgroundSize: 'cover' } : undefined}
                         loading="lazy"
                       />
                     ) : (
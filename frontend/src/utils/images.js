@@ -87,3 +87,31 @@ export const isValidImageUrl = (imageUrl) => {
   return resolveImageUrl(imageUrl) !== null;
 };
 
+
+/**
+ * Construit l'attribut srcset à partir des déclinaisons renvoyées par l'API
+ * (`photo_variants[i].srcset` : { largeur: url }) et de l'image principale
+ * (`photo_variants[i].width`). Les déclinaisons étant toutes plus étroites que
+ * l'image principale, celle-ci doit figurer dans le srcset : avec des
+ * descripteurs `w`, le navigateur n'utilise `src` qu'en repli.
+ * 
+ * @param {object|null|undefined} variants - Déclinaisons d'une photo
+ * @param {string|null|undefined} photo - URL de l'image principale
+ * @returns {string|undefined} - srcset (ex: "…_160.webp 160w, …_400.webp 400w, ….webp 800w") ou undefined
+ */
+export const buildSrcSet = (variants, photo) => {
+  if (!variants || !variants.srcset) {
+    return undefined;
+  }
+  const entries = Object.entries(variants.srcset)
+    .map(([width, url]) => {
+      const resolved = resolveImageUrl(url);
+      return resolved ? `${resolved} ${width}w` : null;
+    })
+    .filter(Boolean);
+  const main = resolveImageUrl(photo);
+  if (main && variants.width) {
+    entries.push(`${main} ${variants.width}w`);
+  }
+  return entries.length > 0 ? entries.join(', ') : undefined;
+};
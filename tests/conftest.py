@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# Unit tests import the backend modules directly (no running server needed)
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def db():
+    """In-memory Motor database (mongomock), fresh for each test."""
+    return AsyncMongoMockClient()["downpricer_test"]
@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from notifications import digest, notifier
+from notifications.digest import DIGEST_COLLECTION, DIGEST_SETTINGS_KEY, flush_due_digests, record_admin_event
+from notifications.notifier import EventType, notify_admin
+from notifications.outbox import OUTBOX_COLLECTION
+from utils.settings_cache import settings_cache
+
+EMAIL_CONFIG = {"enabled": True, "admin_email": "admin@downpricer.test"}
+EVENT = {"title": "Nouvelle vente", "message": "Article vendu", "details": "<p>détails</p>"}
+
+
+class FrozenDatetime(datetime):
+    frozen = datetime(2026, 10, 18, 10, 5, tzinfo=timezone.utc)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.frozen
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(digest, "datetime", FrozenDatetime)
+    FrozenDatetime.frozen = datetime(2026, 10, 18, 10, 5, tzinfo=timezone.utc)
+    return FrozenDatetime
+
+
+@pytest.fixture(autouse=True)
+def email_enabled(monkeypatch):
+    async def email_config(db):
+        return EMAIL_CONFIG
+
+    monkeypatch.setattr(digest, "get_email_config", email_config)
+    monkeypatch.setattr(notifier, "get_email_config", email_config)
+    settings_cache.invalidate()
+    yield
+    settings_cache.invalidate()
+
+
+async def _configure(db, windows):
+    await db.settings.insert_one({"key": DIGEST_SETTINGS_KEY, "value": windows})
+    settings_cache.invalidate()
+
+
+def test_events_are_immediate_without_configuration(db):
+    async def run():
+        recorded = await record_admin_event(db, "admin_new_sale", EVENT)
+        await notify_admin(db, EventType.ADMIN_NEW_SALE, EVENT)
+        return recorded, await db[DIGEST_COLLECTION].count_documents({}), await db[OUTBOX_COLLECTION].count_documents({})
+
+    assert asyncio.run(run()) == (False, 0, 1)
+
+
+@pytest.mark.parametrize("windows", [{"admin_new_user": 60}, {"admin_new_sale": 0}, "60", None])
+def test_unconfigured_or_zero_window_is_immediate(db, windows):
+    async def run():
+        await _configure(db, windows)
+        return await record_admin_event(db, "admin_new_sale", EVENT)
+
+    assert asyncio.run(run()) is False
+
+
+def test_urgent_events_bypass_digests(db):
+    async def run():
+        await _configure(db, {"admin_deposit_paid": 60})
+        recorded = await record_admin_event(db, "admin_deposit_paid", EVENT)
+        await notify_admin(db, EventType.ADMIN_DEPOSIT_PAID, EVENT)
+        return recorded, await db[OUTBOX_COLLECTION].count_documents({})
+
+    assert asyncio.run(run()) == (False, 1)
+
+
+def test_events_of_one_window_are_grouped(db, clock):
+    async def run():
+        await _configure(db, {"admin_new_sale": 15, "admin_new_user": 60})
+        await record_admin_event(db, "admin_new_sale", EVENT)
+        clock.frozen = datetime(2026, 10, 18, 10, 14, 59, tzinfo=timezone.utc)
+        await record_admin_event(db, "admin_new_sale", EVENT)
+        await record_admin_event(db, "admin_new_user", EVENT)
+        # Next 15-minute window
+        clock.frozen = datetime(2026, 10, 18, 10, 15, tzinfo=timezone.utc)
+        await record_admin_event(db, "admin_new_sale", EVENT)
+        return await db[DIGEST_COLLECTION].find({}).sort("_id", 1).to_list(None)
+
+    digests = asyncio.run(run())
+    start = int(datetime(2026, 10, 18, 10, 0, tzinfo=timezone.utc).timestamp())
+    assert [(d["_id"], d["count"]) for d in digests] == [
+        (f"admin_new_sale:{start}", 2),
+        (f"admin_new_sale:{start + 900}", 1),
+        (f"admin_new_user:{start}", 1),
+    ]
+    first = digests[0]
+    assert first["window_end"].replace(tzinfo=timezone.utc) == datetime(2026, 10, 18, 10, 15, tzinfo=timezone.utc)
+    assert first["flush_at"].replace(tzinfo=timezone.utc) == datetime(2026, 10, 18, 10, 15, 30, tzinfo=timezone.utc)
+
+
+def test_replayed_event_is_counted_once(db, clock):
+    async def run():
+        await _configure(db, {"admin_new_sale": 15})
+        for _ in range(3):
+            await record_admin_event(db, "admin_new_sale", EVENT, idempotency_key="stripe:evt_1:sale")
+        await record_admin_event(db, "admin_new_sale", EVENT, idempotency_key="stripe:evt_2:sale")
+        return await db[DIGEST_COLLECTION].find_one({})
+
+    doc = asyncio.run(run())
+    assert doc["count"] == 2
+    assert doc["keys"] == ["stripe:evt_1:sale", "stripe:evt_2:sale"]
+
+
+def test_digest_keeps_only_the_first_items(db, clock, monkeypatch):
+    monkeypatch.setattr(digest, "DIGEST_MAX_ITEMS", 2)
+
+    async def run():
+        await _configure(db, {"admin_new_sale": 15})
+        for i in range(4):
+            await record_admin_event(db, "admin_new_sale", {**EVENT, "title": f"Vente {i}"})
+        return await db[DIGEST_COLLECTION].find_one({})
+
+    doc = asyncio.run(run())
+    assert doc["count"] == 4
+    assert [item["title"] for item in doc["items"]] == ["Vente 0", "Vente 1"]
+
+
+def test_due_digest_is_sent_once_then_removed(db, clock):
+    async def run():
+        await _configure(db, {"admin_new_sale": 15})
+        clock.frozen = datetime(2020, 1, 1, 9, 0, tzinfo=timezone.utc)
+        await record_admin_event(db, "admin_new_sale", EVENT)
+        await record_admin_event(db, "admin_new_sale", EVENT)
+        # Current window: not due yet
+        clock.frozen = datetime.now(timezone.utc)
+        await record_admin_event(db, "admin_new_sale", EVENT)
+        clock.frozen = datetime.now(timezone.utc)
+        flushed = await flush_due_digests(db)
+        return flushed, await db[OUTBOX_COLLECTION].find({}).to_list(None), await db[DIGEST_COLLECTION].count_documents({})
+
+    flushed, emails, remaining = asyncio.run(run())
+    assert flushed == 1
+    assert remaining == 1
+    assert len(emails) == 1
+    start = int(datetime(2020, 1, 1, 9, 0, tzinfo=timezone.utc).timestamp())
+    assert emails[0]["_id"] == f"digest:admin_new_sale:{start}"
+    assert emails[0]["to"] == "admin@downpricer.test"
+    assert "2 × Nouvelle vente" in emails[0]["subject"]
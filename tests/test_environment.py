@@ -0,0 +1,20 @@
+import pytest
+
+from utils import environment
+from utils.environment import cpus_per_worker, web_concurrency
+
+
+@pytest.mark.parametrize("value, workers, cpus", [
+    (None, 1, 8),     # single uvicorn process
+    ("4", 4, 2),
+    ("3", 3, 2),
+    ("16", 16, 1),    # more workers than cores: never below one
+    ("", 1, 8),
+    ("abc", 1, 8),
+])
+def test_cores_are_shared_between_workers(monkeypatch, value, workers, cpus):
+    monkeypatch.setattr(environment.os, "cpu_count", lambda: 8)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    if value is not None:
+        monkeypatch.setenv("WEB_CONCURRENCY", value)
+    assert (web_concurrency(), cpus_per_worker()) == (workers, cpus)
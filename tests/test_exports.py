@@ -0,0 +1,62 @@
+import asyncio
+import glob
+import os
+import tempfile
+
+import pytest
+
+from utils.exports import CsvExportWriter, XlsxExportWriter, open_export_writer
+
+ROWS = [{"id": "a1", "title": "=SUM(A1)"}, {"id": "a2", "title": "Lampe"}]
+
+
+def _openpyxl_temp_files():
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), "openpyxl.*")))
+
+
+@pytest.mark.parametrize("export_format", ["xlsx", "csv"])
+def test_close_returns_the_written_file(export_format):
+    async def run():
+        writer = open_export_writer(export_format)
+        sheet = writer.add_sheet("Articles", ["id", "title"])
+        await writer.write_rows(sheet, ROWS)
+        return await writer.close()
+
+    path = asyncio.run(run())
+    try:
+        assert path.endswith(f".{export_format}")
+        assert os.path.getsize(path) > 0
+    finally:
+        os.remove(path)
+
+
+def test_csv_abort_closes_and_removes_the_file():
+    async def run():
+        writer = CsvExportWriter()
+        sheet = writer.add_sheet("Articles", ["id", "title"])
+        await writer.write_rows(sheet, ROWS)
+        writer.abort()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer._handle.closed
+    assert not os.path.exists(writer.path)
+
+
+def test_xlsx_abort_removes_sheet_temp_files_and_output(tmp_path):
+    before = _openpyxl_temp_files()
+    output_path = str(tmp_path / "users.xlsx")
+
+    async def run():
+        writer = XlsxExportWriter(output_path)
+        for title in ("Tous", "Vendus", "Vide"):
+            sheet = writer.add_sheet(title, ["id", "title"])
+            if title != "Vide":
+                await writer.write_rows(sheet, ROWS)
+        assert _openpyxl_temp_files() - before
+        writer.abort()
+
+    asyncio.run(run())
+    assert _openpyxl_temp_files() - before == set()
+    assert not os.path.exists(output_path)
+
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from PIL import Image
+
+from utils.images import COMPRESSION_THRESHOLD, process_upload_image
+
+
+def _source(tmp_path, size, noise=False):
+    path = tmp_path / "source.jpg"
+    if noise:
+        # Incompressible: the JPEG goes over COMPRESSION_THRESHOLD
+        image = Image.effect_noise(size, 60)
+    else:
+        image = Image.linear_gradient("L").resize(size)
+    image.convert("RGB").save(path, "JPEG", quality=95)
+    return str(path)
+
+
+def _assert_variants_smaller_than_main(tmp_path, result, output):
+    main_width = result["size"][0]
+    main_bytes = os.path.getsize(output)
+    assert all(int(width) < main_width for width in result["variants"])
+    for name in result["variants"].values():
+        assert os.path.getsize(tmp_path / name) < main_bytes
+    assert result["lqip"].startswith("data:image/webp;base64,")
+
+
+@pytest.mark.parametrize("size, expected_widths", [
+    ((2000, 1500), ["160", "400"]),   # 800x800 thumbnail: no 800/1600 variant
+    ((1500, 3000), ["160"]),          # portrait thumbnail, 400 px wide
+    ((700, 500), ["160", "400"]),     # already smaller than the thumbnail
+])
+def test_variants_are_narrower_than_the_thumbnail(tmp_path, size, expected_widths):
+    source = _source(tmp_path, size)
+    output = str(tmp_path / "photo.webp")
+
+    result = process_upload_image(source, output)
+
+    assert sorted(result["variants"], key=int) == expected_widths
+    _assert_variants_smaller_than_main(tmp_path, result, output)
+
+
+def test_compressed_upload_drops_variants_heavier_than_the_main_image(tmp_path):
+    source = _source(tmp_path, (1700, 1300), noise=True)
+    assert os.path.getsize(source) > COMPRESSION_THRESHOLD
+    output = str(tmp_path / "photo.webp")
+
+    result = process_upload_image(source, output)
+
+    assert result["original_size"] == (1700, 1300)
+    _assert_variants_smaller_than_main(tmp_path, result, output)
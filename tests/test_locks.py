@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import database
+from database import acquire_lock, release_lock, renew_lock
+
+
+def test_lock_is_exclusive_until_released(db):
+    async def run():
+        first = await acquire_lock(db, "maintenance", 60)
+        second = await acquire_lock(db, "maintenance", 60)
+        await release_lock(db, "maintenance")
+        third = await acquire_lock(db, "maintenance", 60)
+        return first, second, third
+
+    assert asyncio.run(run()) == (True, False, True)
+
+
+def test_expired_lease_can_be_taken_over(db):
+    async def run():
+        await db.locks.insert_one({
+            "_id": "maintenance",
+            "owner": "other-host:1",
+            "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1),
+        })
+        return await acquire_lock(db, "maintenance", 60)
+
+    assert asyncio.run(run()) is True
+
+
+def test_renew_and_release_only_apply_to_the_owner(db, monkeypatch):
+    async def run():
+        await acquire_lock(db, "maintenance", 60)
+        monkeypatch.setattr(database, "_lock_owner", lambda: "other-host:2")
+        renewed_by_other = await renew_lock(db, "maintenance", 3600)
+        await release_lock(db, "maintenance")
+        still_held = await db.locks.count_documents({"_id": "maintenance"})
+        monkeypatch.undo()
+        renewed = await renew_lock(db, "maintenance", 3600)
+        doc = await db.locks.find_one({"_id": "maintenance"})
+        return renewed_by_other, still_held, renewed, doc["expires_at"]
+
+    renewed_by_other, still_held, renewed, expires_at = asyncio.run(run())
+    assert (renewed_by_other, still_held, renewed) == (False, 1, True)
+    assert expires_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) + timedelta(minutes=59)
@@ -0,0 +1,141 @@
+import smtplib
+
+import pytest
+
+from utils import mailer
+from utils.mailer import SMTPConnectionPool, build_message
+
+CONFIG = {
+    "enabled": True,
+    "smtp_host": "smtp.test",
+    "smtp_port": 587,
+    "smtp_user": "user",
+    "smtp_pass": "pass",
+    "smtp_from": "noreply@downpricer.test",
+    "smtp_tls_mode": "none",
+}
+
+
+class FakeSMTP:
+    """SMTP session stand-in: `failures` maps a recipient to the exception raised for it."""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.sent = []
+        self.closed = False
+
+    def send_message(self, msg):
+        error = self.failures.pop(msg["To"], None)
+        if error is not None:
+            raise error
+        self.sent.append(msg["To"])
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Every new SMTP connection pops the next FakeSMTP (or exception) from the list."""
+    scripted = []
+    opened = []
+
+    def _open(config):
+        item = scripted.pop(0) if scripted else FakeSMTP()
+        if isinstance(item, Exception):
+            raise item
+        opened.append(item)
+        return item
+
+    monkeypatch.setattr(mailer, "open_smtp_connection", _open)
+    return scripted, opened
+
+
+def _messages(*recipients):
+    return [build_message(CONFIG, to, "Sujet", "<p>Bonjour</p>") for to in recipients]
+
+
+def test_send_batch_reports_each_message(sessions):
+    pool = SMTPConnectionPool()
+    assert pool.send_batch(CONFIG, _messages("a@x", "b@x")) == [None, None]
+    assert sessions[1][0].sent == ["a@x", "b@x"]
+
+
+def test_refused_recipient_does_not_reconnect_or_resend(sessions):
+    scripted, opened = sessions
+    refused = smtplib.SMTPRecipientsRefused({"b@x": (550, b"unknown user")})
+    scripted.append(FakeSMTP({"b@x": refused}))
+
+    results = SMTPConnectionPool().send_batch(CONFIG, _messages("a@x", "b@x", "c@x"))
+
+    assert results == [None, refused, None]
+    assert len(opened) == 1
+    assert opened[0].sent == ["a@x", "c@x"]
+
+
+@pytest.mark.parametrize("error", [
+    smtplib.SMTPSenderRefused(553, b"sender refused", "noreply@downpricer.test"),
+    smtplib.SMTPDataError(554, b"rejected"),
+])
+def test_other_message_refusals_stay_per_message(sessions, error):
+    scripted, opened = sessions
+    scripted.append(FakeSMTP({"a@x": error}))
+
+    assert SMTPConnectionPool().send_batch(CONFIG, _messages("a@x", "b@x")) == [error, None]
+    assert len(opened) == 1
+
+
+def test_disconnected_session_is_reopened_and_message_resent_once(sessions):
+    scripted, opened = sessions
+    scripted.extend([FakeSMTP({"b@x": smtplib.SMTPServerDisconnected("idle")}), FakeSMTP()])
+
+    results = SMTPConnectionPool().send_batch(CONFIG, _messages("a@x", "b@x", "c@x"))
+
+    assert results == [None, None, None]
+    assert opened[0].sent == ["a@x"] and opened[0].closed
+    assert opened[1].sent == ["b@x", "c@x"]
+
+
+def test_failed_reconnect_returns_partial_results(sessions):
+    scripted, opened = sessions
+    refused = ConnectionRefusedError("smtp down")
+    scripted.extend([FakeSMTP({"b@x": ConnectionResetError("reset")}), refused])
+
+    results = SMTPConnectionPool().send_batch(CONFIG, _messages("a@x", "b@x", "c@x"))
+
+    assert results == [None, refused, refused]
+    assert opened[0].sent == ["a@x"]
+
+
+def test_unexpected_error_fails_remaining_messages_only(sessions):
+    scripted, opened = sessions
+    error = smtplib.SMTPResponseException(421, b"service not available")
+    scripted.append(FakeSMTP({"b@x": error}))
+    pool = SMTPConnectionPool()
+
+    results = pool.send_batch(CONFIG, _messages("a@x", "b@x", "c@x"))
+
+    assert results == [None, error, error]
+    # The broken session is closed, not returned to the pool
+    assert opened[0].closed
+    assert not any(pool._idle.values())
+
+
+def test_first_connection_failure_is_raised(sessions):
+    scripted, _ = sessions
+    scripted.append(smtplib.SMTPAuthenticationError(535, b"bad credentials"))
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        SMTPConnectionPool().send_batch(CONFIG, _messages("a@x"))
+
+
+def test_connection_is_rotated_after_max_messages(sessions):
+    _, opened = sessions
+    pool = SMTPConnectionPool(max_messages=2)
+
+    assert pool.send_batch(CONFIG, _messages("a@x", "b@x", "c@x")) == [None, None, None]
+    assert [s.sent for s in opened] == [["a@x", "b@x"], ["c@x"]]
+    assert opened[0].closed
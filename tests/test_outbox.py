@@ -0,0 +1,200 @@
+import asyncio
+import smtplib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from notifications import outbox
+from notifications.outbox import (
+    OUTBOX_COLLECTION,
+    OutboxStatus,
+    _backoff_seconds,
+    _is_permanent,
+    drain_outbox,
+    enqueue_email,
+    requeue_dead_letter,
+)
+
+SMTP_CONFIG = {"enabled": True, "smtp_host": "smtp.test", "smtp_port": 587, "smtp_user": "u", "smtp_pass": "p"}
+
+
+@pytest.fixture
+def delivery(monkeypatch):
+    """Scripted mail_queue.deliver: pops the next result (None = sent) and records recipients."""
+    results = []
+    delivered = []
+
+    async def deliver(config, to, subject, html_body, text_body=None):
+        delivered.append(to)
+        return results.pop(0) if results else None
+
+    async def email_config(db):
+        return SMTP_CONFIG
+
+    monkeypatch.setattr(outbox.mail_queue, "deliver", deliver)
+    monkeypatch.setattr(outbox, "get_email_config", email_config)
+    return results, delivered
+
+
+def _utc(value):
+    # mongomock returns naive UTC datetimes, like a non tz_aware MongoClient
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+async def _get(db, email_id="mail-1"):
+    return await db[OUTBOX_COLLECTION].find_one({"_id": email_id})
+
+
+def test_enqueue_is_idempotent(db):
+    async def run():
+        first = await enqueue_email(db, "a@x", "Sujet", "<p>1</p>", idempotency_key="stripe:evt_1:paid")
+        second = await enqueue_email(db, "a@x", "Sujet", "<p>2</p>", idempotency_key="stripe:evt_1:paid")
+        return first, second, await db[OUTBOX_COLLECTION].count_documents({})
+
+    assert asyncio.run(run()) == (True, False, 1)
+
+
+def test_sent_email_is_marked_and_expires(db, delivery):
+    async def run():
+        await enqueue_email(db, "a@x", "Sujet", "<p>ok</p>", idempotency_key="mail-1")
+        processed = await drain_outbox(db)
+        return processed, await _get(db)
+
+    processed, doc = asyncio.run(run())
+    assert processed == 1
+    assert doc["status"] == OutboxStatus.SENT
+    assert doc["attempts"] == 1
+    assert "locked_until" not in doc
+    assert _utc(doc["expires_at"]) > datetime.now(timezone.utc) + timedelta(days=6)
+
+
+def test_temporary_failure_is_retried_later(db, delivery):
+    results, delivered = delivery
+    results.append(smtplib.SMTPServerDisconnected("timeout"))
+
+    async def run():
+        await enqueue_email(db, "a@x", "Sujet", "<p>ok</p>", idempotency_key="mail-1")
+        await drain_outbox(db)
+        doc = await _get(db)
+        # Not due yet: a second drain does not pick it up
+        return doc, await drain_outbox(db)
+
+    doc, processed_again = asyncio.run(run())
+    assert doc["status"] == OutboxStatus.PENDING
+    assert doc["last_error"] == "timeout"
+    assert _utc(doc["next_attempt_at"]) > datetime.now(timezone.utc)
+    assert processed_again == 0
+    assert delivered == ["a@x"]
+
+
+def test_backoff_doubles_and_is_capped(monkeypatch):
+    monkeypatch.setattr(outbox.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(outbox, "OUTBOX_BASE_BACKOFF_SECONDS", 30)
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_BACKOFF_SECONDS", 3600)
+    assert [_backoff_seconds(n) for n in (1, 2, 3, 4)] == [30, 60, 120, 240]
+    assert _backoff_seconds(20) == 3600
+
+    # Jitter only shortens the delay, down to half
+    monkeypatch.setattr(outbox.random, "uniform", lambda low, high: low)
+    assert _backoff_seconds(3) == 60
+
+
+@pytest.mark.parametrize("error, permanent", [
+    (smtplib.SMTPRecipientsRefused({"a@x": (550, b"no such user")}), True),
+    (smtplib.SMTPDataError(554, b"rejected"), True),
+    (smtplib.SMTPDataError(451, b"try later"), False),
+    (smtplib.SMTPAuthenticationError(535, b"bad credentials"), False),
+    (smtplib.SMTPServerDisconnected("gone"), False),
+    (ConnectionRefusedError("down"), False),
+])
+def test_permanent_errors(error, permanent):
+    assert _is_permanent(error) is permanent
+
+
+def test_permanent_failure_goes_to_dead_letter(db, delivery):
+    results, _ = delivery
+    results.append(smtplib.SMTPRecipientsRefused({"a@x": (550, b"no such user")}))
+
+    async def run():
+        await enqueue_email(db, "a@x", "Sujet", "<p>ok</p>", idempotency_key="mail-1")
+        await drain_outbox(db)
+        return await _get(db)
+
+    doc = asyncio.run(run())
+    assert doc["status"] == OutboxStatus.DEAD
+    assert doc["attempts"] == 1
+    assert "dead_at" in doc
+
+
+def test_dead_letter_after_max_attempts(db, delivery, monkeypatch):
+    results, _ = delivery
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    results.extend([ConnectionResetError("reset"), ConnectionResetError("reset")])
+
+    async def run():
+        await enqueue_email(db, "a@x", "Sujet", "<p>ok</p>", idempotency_key="mail-1")
+        await drain_outbox(db)
+        assert (await _get(db))["status"] == OutboxStatus.PENDING
+        await db[OUTBOX_COLLECTION].update_one({"_id": "mail-1"}, {"$set": {"next_attempt_at": datetime.now(timezone.utc)}})
+        await drain_outbox(db)
+        return await _get(db)
+
+    doc = asyncio.run(run())
+    assert doc["status"] == OutboxStatus.DEAD
+    assert doc["attempts"] == 2
+    assert doc["last_error"] == "reset"
+
+
+def test_expired_lease_is_reclaimed(db, delivery):
+    _, delivered = delivery
+    now = datetime.now(timezone.utc)
+
+    async def run():
+        await db[OUTBOX_COLLECTION].insert_many([
+            {"_id": "expired", "to": "a@x", "subject": "s", "html_body": "h", "status": OutboxStatus.SENDING,
+             "attempts": 1, "next_attempt_at": now - timedelta(minutes=10), "locked_until": now - timedelta(seconds=1)},
+            {"_id": "leased", "to": "b@x", "subject": "s", "html_body": "h", "status": OutboxStatus.SENDING,
+             "attempts": 1, "next_attempt_at": now - timedelta(minutes=10), "locked_until": now + timedelta(minutes=1)},
+        ])
+        processed = await drain_outbox(db)
+        return processed, await _get(db, "expired"), await _get(db, "leased")
+
+    processed, expired, leased = asyncio.run(run())
+    assert processed == 1
+    assert delivered == ["a@x"]
+    assert expired["status"] == OutboxStatus.SENT
+    assert expired["attempts"] == 2
+    assert leased["status"] == OutboxStatus.SENDING
+
+
+def test_stale_worker_does_not_overwrite_a_reclaimed_email(db, delivery):
+    async def run():
+        await enqueue_email(db, "a@x", "Sujet", "<p>ok</p>", idempotency_key="mail-1")
+        stale = await outbox._claim(db)
+        # The lease expires and another worker takes the email over
+        await db[OUTBOX_COLLECTION].update_one(
+            {"_id": "mail-1"}, {"$set": {"locked_until": datetime.now(timezone.utc) + timedelta(minutes=5)}}
+        )
+        await outbox._process(db, stale, SMTP_CONFIG)
+        return await _get(db)
+
+    doc = asyncio.run(run())
+    assert doc["status"] == OutboxStatus.SENDING
+
+
+def test_requeue_dead_letter(db, delivery):
+    async def run():
+        await db[OUTBOX_COLLECTION].insert_one({
+            "_id": "mail-1", "to": "a@x", "subject": "s", "html_body": "h", "status": OutboxStatus.DEAD,
+            "attempts": 8, "dead_at": datetime.now(timezone.utc), "next_attempt_at": datetime.now(timezone.utc),
+        })
+        requeued = await requeue_dead_letter(db, "mail-1")
+        again = await requeue_dead_letter(db, "mail-1")
+        doc = await _get(db)
+        await drain_outbox(db)
+        return requeued, again, doc, await _get(db)
+
+    requeued, again, doc, sent = asyncio.run(run())
+    assert (requeued, again) == (True, False)
+    assert doc["status"] == OutboxStatus.PENDING and doc["attempts"] == 0 and "dead_at" not in doc
+    assert sent["status"] == OutboxStatus.SENT
@@ -0,0 +1,135 @@
+import pytest
+from fastapi import HTTPException
+
+from utils.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    merge_filters,
+    split_page,
+)
+
+
+def _matches(doc, query):
+    """Minimal evaluator for the filters built by keyset_filter (null sorts lowest, like MongoDB)."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(_matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            for op, operand in condition.items():
+                if op == "$ne" and value == operand:
+                    return False
+                if op in ("$lt", "$gt") and (value is None or operand is None):
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+def _sorted(docs, field, direction):
+    """Sort by (field: direction, id: 1); missing values sort as null, below any value."""
+    present = sorted((d for d in docs if d.get(field) is not None), key=lambda d: d["id"])
+    present.sort(key=lambda d: d[field], reverse=direction < 0)
+    missing = sorted((d for d in docs if d.get(field) is None), key=lambda d: d["id"])
+    return present + missing if direction < 0 else missing + present
+
+
+def _walk(docs, limit, field, direction):
+    """Follow next cursors page by page until the end."""
+    pages = []
+    cursor = ""
+    while True:
+        position = decode_cursor(cursor, field)
+        filtered = [d for d in docs if _matches(d, keyset_filter(position, field, direction))]
+        page, cursor = split_page(_sorted(filtered, field, direction)[:limit + 1], limit, field)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+DOCS = [
+    {"id": "a", "created_at": "2026-01-03"},
+    {"id": "b", "created_at": "2026-01-02"},
+    {"id": "c", "created_at": "2026-01-02"},
+    {"id": "d", "created_at": "2026-01-02"},
+    {"id": "e", "created_at": None},
+    {"id": "f"},
+    {"id": "g", "created_at": "2026-01-01"},
+]
+
+
+def test_cursor_round_trip():
+    doc = {"id": "art-1", "created_at": "2026-10-18T10:00:00+00:00", "name": "ignored"}
+    cursor = encode_cursor(doc)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == {"f": "created_at", "v": doc["created_at"], "id": "art-1"}
+
+
+def test_cursor_round_trip_other_field():
+    cursor = encode_cursor({"id": "x", "price": 12.5}, field="price")
+    assert decode_cursor(cursor, field="price")["v"] == 12.5
+
+
+def test_empty_cursor_requests_first_page():
+    assert decode_cursor("") is None
+    assert decode_cursor(None) is None
+    assert keyset_filter(None) == {}
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!!",
+    encode_cursor({"id": "x", "price": 1}, field="price"),
+    encode_cursor({"created_at": "2026-01-01"}),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("direction", [-1, 1])
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_pages_cover_every_document_once(direction, limit):
+    pages = _walk(DOCS, limit, "created_at", direction)
+    walked = [d["id"] for page in pages for d in page]
+    assert walked == [d["id"] for d in _sorted(DOCS, "created_at", direction)]
+
+
+def test_ties_are_broken_by_id():
+    position = {"v": "2026-01-02", "id": "b"}
+    after = [d["id"] for d in DOCS if _matches(d, keyset_filter(position, "created_at", -1))]
+    assert after == ["c", "d", "e", "f", "g"]
+
+
+def test_null_position_descending_stays_among_nulls():
+    position = {"v": None, "id": "e"}
+    assert keyset_filter(position, "created_at", -1) == {"created_at": None, "id": {"$gt": "e"}}
+
+
+def test_null_position_ascending_moves_on_to_values():
+    position = {"v": None, "id": "f"}
+    after = [d["id"] for d in DOCS if _matches(d, keyset_filter(position, "created_at", 1))]
+    assert sorted(after) == ["a", "b", "c", "d", "g"]
+
+
+def test_merge_filters():
+    assert merge_filters({}, {}) == {}
+    assert merge_filters({"a": 1}, {}) == {"a": 1}
+    assert merge_filters({"a": 1}, {"b": 2}) == {"$and": [{"a": 1}, {"b": 2}]}
+
+
+def test_split_page():
+    items = [{"id": str(i), "created_at": f"2026-01-0{i}"} for i in range(1, 4)]
+    assert split_page(items, 3) == (items, None)
+    page, cursor = split_page(items, 2)
+    assert page == items[:2]
+    assert decode_cursor(cursor)["id"] == "2"
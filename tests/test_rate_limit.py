@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import ServerSelectionTimeoutError
+
+from utils import rate_limit
+from utils.rate_limit import RateLimiter, _MemoryWindows
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(1000.0)
+    monkeypatch.setattr(rate_limit.time, "time", clock.time)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "_memory_windows", _MemoryWindows())
+    return clock
+
+
+def _hits(limiter, key, count, db=None):
+    async def run():
+        return [await limiter.hit(db, key) for _ in range(count)]
+    return asyncio.run(run())
+
+
+def test_limit_applies_within_a_window(clock):
+    limiter = RateLimiter("test", max_hits=3, window_seconds=10, backend="memory")
+    results = _hits(limiter, "1.2.3.4", 4)
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[-1].retry_after == 10
+
+
+def test_keys_are_counted_separately(clock):
+    limiter = RateLimiter("test", max_hits=1, window_seconds=10, backend="memory")
+    assert _hits(limiter, "a", 1)[0].allowed
+    assert _hits(limiter, "b", 1)[0].allowed
+    assert not _hits(limiter, "a", 1)[0].allowed
+
+
+def test_previous_window_is_weighted_by_remaining_overlap(clock):
+    limiter = RateLimiter("test", max_hits=4, window_seconds=10, backend="memory")
+    assert all(r.allowed for r in _hits(limiter, "k", 4))
+
+    # Halfway through the next window: 4 * 0.5 + current
+    clock.now = 1015.0
+    results = _hits(limiter, "k", 3)
+    assert [r.allowed for r in results] == [True, True, False]
+    assert results[0].retry_after == 5
+
+
+def test_window_edge_does_not_reset_the_count(clock):
+    limiter = RateLimiter("test", max_hits=4, window_seconds=10, backend="memory")
+    clock.now = 1009.9
+    assert all(r.allowed for r in _hits(limiter, "k", 4))
+
+    # Just after the edge the previous window still counts almost fully
+    clock.now = 1010.0
+    assert not _hits(limiter, "k", 1)[0].allowed
+
+
+def test_counts_expire_after_two_windows(clock):
+    limiter = RateLimiter("test", max_hits=2, window_seconds=10, backend="memory")
+    assert not _hits(limiter, "k", 3)[-1].allowed
+    clock.now = 1020.0
+    assert _hits(limiter, "k", 1)[0].allowed
+
+
+def test_retry_after_is_at_least_one_second(clock):
+    limiter = RateLimiter("test", max_hits=1, window_seconds=10, backend="memory")
+    clock.now = 1009.999
+    assert _hits(limiter, "k", 2)[-1].retry_after == 1
+
+
+def test_enforce_raises_429_with_retry_after(clock):
+    limiter = RateLimiter("test", max_hits=1, window_seconds=60, backend="memory")
+    clock.now = 1020.0
+
+    async def run():
+        await limiter.enforce(None, "k")
+        await limiter.enforce(None, "k")
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "60"
+
+
+def test_disabled_limiter_always_allows(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    limiter = RateLimiter("test", max_hits=1, window_seconds=10, backend="memory")
+    assert all(r.allowed for r in _hits(limiter, "k", 5))
+
+
+def test_mongo_errors_fall_back_to_memory(clock, monkeypatch):
+    async def unavailable(*args, **kwargs):
+        raise ServerSelectionTimeoutError("no primary")
+
+    monkeypatch.setattr(rate_limit, "_mongo_hit", unavailable)
+    limiter = RateLimiter("test", max_hits=2, window_seconds=10, backend="mongo")
+    results = _hits(limiter, "k", 3, db=object())
+    assert [r.allowed for r in results] == [True, True, False]
+
+
+def test_memory_windows_evict_least_recently_used():
+    windows = _MemoryWindows(max_size=2)
+    windows.hit("a", 1)
+    windows.hit("b", 1)
+    windows.hit("a", 1)
+    windows.hit("c", 1)
+    assert list(windows._entries) == ["a", "c"]
@@ -0,0 +1,95 @@
+import re
+
+import pytest
+
+from utils.search import (
+    MAX_QUERY_TERMS,
+    SEARCH_NAME_TERMS_FIELD,
+    SEARCH_TERMS_FIELD,
+    SearchQuery,
+    fold_text,
+    search_fields,
+    stem,
+    tokenize,
+)
+
+
+def _matches(doc_terms, query):
+    """Evaluate SearchQuery.filter() against a document's search_terms, like MongoDB would."""
+    clauses = query.get("$and", [query])
+    for clause in clauses:
+        candidates = clause[SEARCH_TERMS_FIELD]["$in"]
+        if not any(
+            (c.match(term) if isinstance(c, re.Pattern) else c == term)
+            for c in candidates
+            for term in doc_terms
+        ):
+            return False
+    return True
+
+
+def test_fold_text_removes_case_and_accents():
+    assert fold_text("Été CRÈME brûlée") == "ete creme brulee"
+    assert fold_text(None) == ""
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("La veste de ski et les gants") == ["veste", "ski", "gants"]
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("chaussures", "chaussur"),
+    ("chaussure", "chaussur"),
+    ("chevaux", "cheval"),
+    ("bateaux", "bateau"),
+    ("electriques", "electric"),
+    ("sportive", "sportif"),
+    ("2024", "2024"),
+    ("ski", "ski"),
+    ("les", "les"),
+])
+def test_stem(word, expected):
+    assert stem(word) == expected
+
+
+def test_stem_keeps_short_words_readable():
+    # A stem shorter than MIN_STEM_LENGTH falls back to the next suffix or the word itself
+    assert stem("os") == "os"
+    assert stem("jeux") == "jeu"
+    assert stem("bus") == "bus"
+
+
+def test_search_fields_include_words_and_stems():
+    fields = search_fields("Chaussures de Sport", "Très légères")
+    assert {"chaussures", "chaussur", "sport", "tres", "legeres", "leger"} <= set(fields[SEARCH_TERMS_FIELD])
+    assert set(fields[SEARCH_NAME_TERMS_FIELD]) == {"chaussures", "chaussur", "sport"}
+
+
+def test_empty_query_has_no_filter():
+    query = SearchQuery("  de la  ")
+    assert not query
+    assert query.filter() == {}
+
+
+def test_single_word_filter_is_not_wrapped():
+    query = SearchQuery("Vélo")
+    assert query.filter() == {SEARCH_TERMS_FIELD: {"$in": [re.compile("^velo"), "velo"]}}
+
+
+def test_every_query_word_must_match():
+    doc = search_fields("Chaussure de randonnée", "Cuir marron")[SEARCH_TERMS_FIELD]
+    assert _matches(doc, SearchQuery("chaussures cuir").filter())
+    assert _matches(doc, SearchQuery("rando").filter())
+    assert not _matches(doc, SearchQuery("chaussures noires").filter())
+
+
+def test_query_words_are_capped():
+    query = SearchQuery(" ".join(f"mot{i}" for i in range(20)))
+    assert len(query.words) == MAX_QUERY_TERMS
+    assert len(query.filter()["$and"]) == MAX_QUERY_TERMS
+
+
+def test_exact_terms_include_stems_once():
+    query = SearchQuery("chaussures chaussures")
+    assert query.words == ["chaussures"]
+    assert query.exact_terms == ["chaussures", "chaussur"]
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from benchmarks.template_render import CONTEXT, TEMPLATES, legacy_render
+from notifications.templates import TemplateCache, compile_template, render_compiled
+from utils.environment import is_production_env
+
+
+@pytest.mark.parametrize("template_name", TEMPLATES)
+def test_compiled_render_matches_previous_renderer(template_name):
+    cache = TemplateCache(hot_reload=False)
+    assert render_compiled(cache.get(template_name), CONTEXT) == legacy_render(template_name, CONTEXT)
+
+
+@pytest.mark.parametrize("template_name", TEMPLATES)
+def test_compiled_render_matches_with_sparse_context(template_name):
+    context = {"title": "Titre", "message": "", "details": None, "status": "false", "brand_name": "DownPricer"}
+    cache = TemplateCache(hot_reload=False)
+    assert render_compiled(cache.get(template_name), context) == legacy_render(template_name, context)
+
+
+def test_variables_are_escaped_except_html_vars():
+    segments = compile_template("<p>{{ message }}</p>{{details}}")
+    rendered = render_compiled(segments, {"message": "<b>\"x\" & 'y'</b>", "details": "<table></table>"})
+    assert rendered == "<p>&lt;b&gt;&quot;x&quot; &amp; &#x27;y&#x27;&lt;/b&gt;</p><table></table>"
+
+
+def test_missing_variables_keep_their_placeholder():
+    assert render_compiled(compile_template("A {{ absent }} B {{absent}}"), {}) == "A {{ absent }} B {{absent}}"
+
+
+@pytest.mark.parametrize("value, shown", [
+    ("oui", True), (1, True), ("", False), ("  ", False), ("false", False),
+    ("None", False), ("null", False), (None, False), (0, False),
+])
+def test_if_blocks(value, shown):
+    segments = compile_template("[{% if flag %}visible {{ flag }}{% endif %}]")
+    rendered = render_compiled(segments, {"flag": value})
+    assert rendered.startswith("[visible") is shown
+
+
+def test_unknown_template_returns_none(tmp_path):
+    assert TemplateCache(directory=tmp_path).get("absent.html") is None
+
+
+def test_hot_reload_recompiles_modified_template(tmp_path):
+    path = tmp_path / "t.html"
+    path.write_text("v1 {{ x }}", encoding="utf-8")
+    cache = TemplateCache(directory=tmp_path, hot_reload=True)
+    assert render_compiled(cache.get("t.html"), {"x": 1}) == "v1 1"
+
+    path.write_text("v2 {{ x }}", encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert render_compiled(cache.get("t.html"), {"x": 1}) == "v2 1"
+
+
+def test_cache_is_not_revalidated_without_hot_reload(tmp_path):
+    path = tmp_path / "t.html"
+    path.write_text("v1", encoding="utf-8")
+    cache = TemplateCache(directory=tmp_path, hot_reload=False)
+    assert cache.get("t.html") == ["v1"]
+
+    path.write_text("v2", encoding="utf-8")
+    assert cache.get("t.html") == ["v1"]
+    cache.clear()
+    assert cache.get("t.html") == ["v2"]
+
+
+@pytest.mark.parametrize("env, production", [
+    ({"APP_ENV": "production"}, True),
+    ({"ENV": "production"}, True),
+    ({"APP_ENV": "production", "ENV": "development"}, True),
+    ({"ENV": "development"}, False),
+    ({}, False),
+])
+def test_hot_reload_is_off_in_production(monkeypatch, env, production):
+    # EMAIL_TEMPLATES_RELOAD defaults to "not is_production_env()"
+    for name in ("APP_ENV", "ENV"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    assert is_production_env() is production
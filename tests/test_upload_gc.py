@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from upload_gc import QUARANTINE_DIRNAME, find_orphans, parent_filename, sweep_uploads
+
+OLD = time.time() - 30 * 24 * 3600
+
+
+def _write(upload_dir, name, size=10, mtime=OLD):
+    path = upload_dir / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _names(paths):
+    return sorted(path.name for path in paths)
+
+
+@pytest.mark.parametrize("filename, parent", [
+    ("abc_400.webp", "abc.webp"),
+    ("abc_160.webp", "abc.webp"),
+    ("abc_123.webp", None),   # not a variant width
+    ("abc_400.jpg", None),
+    ("abc.webp", None),
+])
+def test_parent_filename(filename, parent):
+    assert parent_filename(filename) == parent
+
+
+def test_recent_files_are_within_the_grace_period(tmp_path):
+    _write(tmp_path, "old.webp")
+    _write(tmp_path, "recent.webp", mtime=time.time() - 3600)
+    (tmp_path / QUARANTINE_DIRNAME).mkdir()
+
+    assert _names(find_orphans(tmp_path, set(), grace_hours=24)) == ["old.webp"]
+    assert _names(find_orphans(tmp_path, set(), grace_hours=0)) == ["old.webp", "recent.webp"]
+
+
+def test_variants_follow_their_parent(tmp_path):
+    for name in ("kept.webp", "kept_160.webp", "kept_400.webp", "gone.webp", "gone_160.webp", "gone_400.webp"):
+        _write(tmp_path, name)
+
+    orphans = find_orphans(tmp_path, {"kept.webp"}, grace_hours=24)
+
+    assert _names(orphans) == ["gone.webp", "gone_160.webp", "gone_400.webp"]
+
+
+def test_references_in_nested_fields_and_both_url_forms(db, tmp_path):
+    for name in ("photo.webp", "avatar.webp", "proof.png", "label.pdf", "orphan.webp"):
+        _write(tmp_path, name)
+
+    async def run():
+        await db.articles.insert_one({"photos": ["https://shop.test/api/uploads/photo.webp?v=2"]})
+        await db.users.insert_one({"avatar_url": "/uploads/avatar.webp"})
+        await db.seller_sales.insert_one({
+            "payment_proof": {"proof_url": "/api/uploads/proof.png", "uploaded_at": "2026-01-01"},
+            "shipping_label": "/uploads/label.pdf",
+        })
+        return await sweep_uploads(db, tmp_path, grace_hours=24, mode="delete")
+
+    report = asyncio.run(run())
+    assert report["referenced"] == 4
+    assert report["orphans"] == 1
+    assert _names(tmp_path.iterdir()) == ["avatar.webp", "label.pdf", "photo.webp", "proof.png"]
+
+
+async def _orphan_with_registry_row(db, upload_dir):
+    _write(upload_dir, "orphan.webp", size=100)
+    _write(upload_dir, "orphan_160.webp", size=20)
+    _write(upload_dir, "used.webp")
+    await db.articles.insert_one({"photos": ["/api/uploads/used.webp"]})
+    await db.uploads.insert_many([{"filename": "orphan.webp", "ref_count": 0}, {"filename": "used.webp", "ref_count": 1}])
+
+
+def test_dry_run_changes_nothing(db, tmp_path):
+    async def run():
+        await _orphan_with_registry_row(db, tmp_path)
+        report = await sweep_uploads(db, tmp_path, grace_hours=24, mode="dry-run")
+        return report, await db.uploads.count_documents({})
+
+    report, registry = asyncio.run(run())
+    assert (report["orphans"], report["bytes"], report["processed"]) == (2, 120, 0)
+    assert registry == 2
+    assert _names(tmp_path.iterdir()) == ["orphan.webp", "orphan_160.webp", "used.webp"]
+
+
+def test_delete_removes_files_and_registry_rows(db, tmp_path):
+    async def run():
+        await _orphan_with_registry_row(db, tmp_path)
+        report = await sweep_uploads(db, tmp_path, grace_hours=24, mode="delete")
+        return report, await db.uploads.distinct("filename")
+
+    report, registry = asyncio.run(run())
+    assert (report["processed"], report["bytes"], report["errors"]) == (2, 120, 0)
+    assert registry == ["used.webp"]
+    assert _names(tmp_path.iterdir()) == ["used.webp"]
+
+
+def test_quarantine_moves_files_and_removes_registry_rows(db, tmp_path):
+    async def run():
+        await _orphan_with_registry_row(db, tmp_path)
+        report = await sweep_uploads(db, tmp_path, grace_hours=24, mode="quarantine")
+        return report, await db.uploads.distinct("filename")
+
+    report, registry = asyncio.run(run())
+    assert report["processed"] == 2
+    assert registry == ["used.webp"]
+    assert _names(tmp_path.iterdir()) == [QUARANTINE_DIRNAME, "used.webp"]
+    (batch,) = (tmp_path / QUARANTINE_DIRNAME).iterdir()
+    assert _names(batch.iterdir()) == ["orphan.webp", "orphan_160.webp"]
+
+
+def test_unknown_mode_is_rejected(db, tmp_path):
+    with pytest.raises(ValueError):
+        asyncio.run(sweep_uploads(db, tmp_path, mode="purge"))
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+import upload_store
+from indexes import INDEX_REGISTRY, ensure_indexes
+from upload_store import ORIGINAL_PROCESSING, content_key, record_upload, store_upload
+
+SHA256 = "a" * 64
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "UPLOAD_DIR", tmp_path)
+    return tmp_path
+
+
+async def _uploads_with_indexes(db, monkeypatch):
+    monkeypatch.setattr("indexes.INDEX_REGISTRY", {"uploads": INDEX_REGISTRY["uploads"]})
+    await ensure_indexes(db)
+
+
+def test_content_key_index_is_rebuilt_as_unique(db, monkeypatch):
+    async def run():
+        await db.uploads.create_index([("content_key", 1)], name="content_key_1")
+        await _uploads_with_indexes(db, monkeypatch)
+        rerun = await ensure_indexes(db)
+        return rerun, await db.uploads.index_information()
+
+    rerun, indexes = asyncio.run(run())
+    assert indexes["content_key_1"]["unique"] is True
+    assert rerun["created"] == []
+
+
+def test_concurrent_upload_returns_the_first_record(db, monkeypatch):
+    key = content_key(SHA256, ORIGINAL_PROCESSING)
+
+    async def run():
+        await _uploads_with_indexes(db, monkeypatch)
+        first = await record_upload(db, "first.jpg", {"bytes": 10}, kind="original", key=key)
+        second = await record_upload(db, "second.jpg", {"bytes": 10}, kind="original", key=key)
+        return first, second, await db.uploads.count_documents({})
+
+    first, second, count = asyncio.run(run())
+    assert (first["filename"], second["filename"], count) == ("first.jpg", "first.jpg", 1)
+
+
+def test_losing_upload_removes_its_file(db, upload_dir, monkeypatch):
+    key = content_key(SHA256, ORIGINAL_PROCESSING)
+    (upload_dir / "first.jpg").write_bytes(b"jpeg")
+    source = upload_dir / ".spool.part"
+    source.write_bytes(b"jpeg")
+
+    lookups = []
+    find_by_content_key = upload_store.find_by_content_key
+
+    async def not_found_yet(db, key):
+        # The other upload is recorded after this one checked for it
+        lookups.append(key)
+        return None if len(lookups) == 1 else await find_by_content_key(db, key)
+
+    async def run():
+        await _uploads_with_indexes(db, monkeypatch)
+        await record_upload(db, "first.jpg", {"bytes": 4}, kind="original", key=key)
+        monkeypatch.setattr(upload_store, "find_by_content_key", not_found_yet)
+        stored = await store_upload(db, source, SHA256, "https://shop.test", original_ext="jpg")
+        return stored, await db.uploads.count_documents({})
+
+    stored, count = asyncio.run(run())
+    assert stored["url"] == "https://shop.test/api/uploads/first.jpg"
+    assert count == 1
+    assert sorted(path.name for path in upload_dir.iterdir()) == ["first.jpg"]
+
+
+def test_missing_file_is_stored_again(db, upload_dir, monkeypatch):
+    key = content_key(SHA256, ORIGINAL_PROCESSING)
+    source = upload_dir / ".spool.part"
+    source.write_bytes(b"jpeg")
+
+    async def run():
+        await _uploads_with_indexes(db, monkeypatch)
+        await record_upload(db, "gone.jpg", {"bytes": 4}, kind="original", key=key)
+        stored = await store_upload(db, source, SHA256, "https://shop.test", original_ext="jpg")
+        return stored, await db.uploads.find_one({"content_key": key})
+
+    stored, record = asyncio.run(run())
+    assert stored["filename"] != "gone.jpg"
+    assert record["filename"] == stored["filename"]
+    assert (upload_dir / stored["filename"]).exists()